@@ -3,9 +3,10 @@ AI助手配置管理API
 """
 from typing import List, Optional, Any
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
-from pydantic import BaseModel
+from sqlalchemy import select, update, insert, delete
+from pydantic import BaseModel, ConfigDict
 from uuid import UUID
 import uuid as uuid_lib
 
@@ -15,6 +16,9 @@ from app.models.assistant_config import AssistantConfig
 
 router = APIRouter()
 
+# 需要从字符串列表转换为UUID列表的字段
+_UUID_LIST_FIELDS = frozenset(("knowledge_base_ids", "datasource_ids", "interface_ids"))
+
 
 class AssistantConfigCreate(BaseModel):
     """创建助手配置"""
@@ -73,8 +77,42 @@ class AssistantConfigResponse(BaseModel):
     is_default: bool
     is_active: bool
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, frozen=True, revalidate_instances="never")
+
+
+def _assistant_to_dict(assistant: AssistantConfig) -> dict:
+    """将助手配置ORM对象转换为响应字典（跳过Pydantic校验，直接交给orjson序列化）"""
+    return {
+        "id": str(assistant.id),
+        "user_id": str(assistant.user_id),
+        "name": assistant.name,
+        "description": assistant.description,
+        "llm_config_id": str(assistant.llm_config_id) if assistant.llm_config_id else None,
+        "system_prompt": assistant.system_prompt,
+        "knowledge_base_ids": [str(kid) for kid in assistant.knowledge_base_ids] if assistant.knowledge_base_ids else [],
+        "datasource_ids": [str(did) for did in assistant.datasource_ids] if assistant.datasource_ids else [],
+        "interface_ids": [str(iid) for iid in assistant.interface_ids] if assistant.interface_ids else [],
+        "enable_knowledge_base": assistant.enable_knowledge_base,
+        "enable_datasource": assistant.enable_datasource,
+        "enable_interface": assistant.enable_interface,
+        "auto_route": assistant.auto_route,
+        "max_history": assistant.max_history,
+        "config": assistant.config,
+        "is_default": assistant.is_default,
+        "is_active": assistant.is_active,
+    }
+
+
+def _unset_default_cte(user_uuid: UUID, exclude_id: Optional[UUID] = None):
+    """构造取消用户其他默认助手的 UPDATE CTE，附加到写入语句上随之一次执行"""
+    stmt = (
+        update(AssistantConfig)
+        .where(AssistantConfig.user_id == user_uuid)
+        .where(AssistantConfig.is_default == True)
+    )
+    if exclude_id is not None:
+        stmt = stmt.where(AssistantConfig.id != exclude_id)
+    return stmt.values(is_default=False).cte("unset_default")
 
 
 @router.post("", response_model=AssistantConfigResponse, status_code=status.HTTP_201_CREATED)
@@ -84,65 +122,47 @@ async def create_assistant(
     db: AsyncSession = Depends(get_db)
 ) -> Any:
     """创建AI助手配置"""
-    # 如果设置为默认，先取消其他默认配置
-    if assistant_data.is_default:
-        await db.execute(
-            update(AssistantConfig)
-            .where(AssistantConfig.user_id == uuid_lib.UUID(current_user["user_id"]))
-            .where(AssistantConfig.is_default == True)
-            .values(is_default=False)
-        )
-    
     # 转换UUID列表
     knowledge_base_uuids = [UUID(kid) for kid in assistant_data.knowledge_base_ids] if assistant_data.knowledge_base_ids else []
     datasource_uuids = [UUID(did) for did in assistant_data.datasource_ids] if assistant_data.datasource_ids else []
     interface_uuids = [UUID(iid) for iid in assistant_data.interface_ids] if assistant_data.interface_ids else []
     
-    # 创建助手配置
-    assistant = AssistantConfig(
-        user_id=uuid_lib.UUID(current_user["user_id"]),
-        name=assistant_data.name,
-        description=assistant_data.description,
-        llm_config_id=UUID(assistant_data.llm_config_id) if assistant_data.llm_config_id else None,
-        system_prompt=assistant_data.system_prompt,
-        knowledge_base_ids=knowledge_base_uuids,
-        datasource_ids=datasource_uuids,
-        interface_ids=interface_uuids,
-        enable_knowledge_base=assistant_data.enable_knowledge_base,
-        enable_datasource=assistant_data.enable_datasource,
-        enable_interface=assistant_data.enable_interface,
-        auto_route=assistant_data.auto_route,
-        max_history=assistant_data.max_history,
-        config=assistant_data.config,
-        is_default=assistant_data.is_default
+    # 创建助手配置，通过 RETURNING 直接取回新行，无需再 refresh；
+    # 设为默认时在同一条语句中取消其他默认配置
+    stmt = (
+        insert(AssistantConfig).values(
+            user_id=current_user["user_uuid"],
+            name=assistant_data.name,
+            description=assistant_data.description,
+            llm_config_id=UUID(assistant_data.llm_config_id) if assistant_data.llm_config_id else None,
+            system_prompt=assistant_data.system_prompt,
+            knowledge_base_ids=knowledge_base_uuids,
+            datasource_ids=datasource_uuids,
+            interface_ids=interface_uuids,
+            enable_knowledge_base=assistant_data.enable_knowledge_base,
+            enable_datasource=assistant_data.enable_datasource,
+            enable_interface=assistant_data.enable_interface,
+            auto_route=assistant_data.auto_route,
+            max_history=assistant_data.max_history,
+            config=assistant_data.config,
+            is_default=assistant_data.is_default
+        ).returning(AssistantConfig)
     )
+    if assistant_data.is_default:
+        stmt = stmt.add_cte(_unset_default_cte(current_user["user_uuid"]))
     
-    db.add(assistant)
+    result = await db.execute(stmt)
+    assistant = result.scalar_one()
     await db.commit()
-    await db.refresh(assistant)
     
-    return AssistantConfigResponse(
-        id=str(assistant.id),
-        user_id=str(assistant.user_id),
-        name=assistant.name,
-        description=assistant.description,
-        llm_config_id=str(assistant.llm_config_id) if assistant.llm_config_id else None,
-        system_prompt=assistant.system_prompt,
-        knowledge_base_ids=[str(kid) for kid in assistant.knowledge_base_ids] if assistant.knowledge_base_ids else [],
-        datasource_ids=[str(did) for did in assistant.datasource_ids] if assistant.datasource_ids else [],
-        interface_ids=[str(iid) for iid in assistant.interface_ids] if assistant.interface_ids else [],
-        enable_knowledge_base=assistant.enable_knowledge_base,
-        enable_datasource=assistant.enable_datasource,
-        enable_interface=assistant.enable_interface,
-        auto_route=assistant.auto_route,
-        max_history=assistant.max_history,
-        config=assistant.config,
-        is_default=assistant.is_default,
-        is_active=assistant.is_active
+    return ORJSONResponse(
+        _assistant_to_dict(assistant),
+        status_code=status.HTTP_201_CREATED
     )
 
 
-@router.get("", response_model=List[AssistantConfigResponse])
+# 列表接口不声明 response_model，避免逐行校验；仅通过 responses 保留 OpenAPI 文档
+@router.get("", responses={200: {"model": List[AssistantConfigResponse]}})
 async def get_assistants(
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
@@ -150,33 +170,12 @@ async def get_assistants(
     """获取当前用户的所有助手配置"""
     result = await db.execute(
         select(AssistantConfig)
-        .where(AssistantConfig.user_id == uuid_lib.UUID(current_user["user_id"]))
+        .where(AssistantConfig.user_id == current_user["user_uuid"])
         .order_by(AssistantConfig.is_default.desc(), AssistantConfig.created_at.desc())
     )
     assistants = result.scalars().all()
     
-    return [
-        AssistantConfigResponse(
-            id=str(assistant.id),
-            user_id=str(assistant.user_id),
-            name=assistant.name,
-            description=assistant.description,
-            llm_config_id=str(assistant.llm_config_id) if assistant.llm_config_id else None,
-            system_prompt=assistant.system_prompt,
-            knowledge_base_ids=[str(kid) for kid in assistant.knowledge_base_ids] if assistant.knowledge_base_ids else [],
-            datasource_ids=[str(did) for did in assistant.datasource_ids] if assistant.datasource_ids else [],
-            interface_ids=[str(iid) for iid in assistant.interface_ids] if assistant.interface_ids else [],
-            enable_knowledge_base=assistant.enable_knowledge_base,
-            enable_datasource=assistant.enable_datasource,
-            enable_interface=assistant.enable_interface,
-            auto_route=assistant.auto_route,
-            max_history=assistant.max_history,
-            config=assistant.config,
-            is_default=assistant.is_default,
-            is_active=assistant.is_active
-        )
-        for assistant in assistants
-    ]
+    return ORJSONResponse([_assistant_to_dict(assistant) for assistant in assistants])
 
 
 @router.get("/{assistant_id}", response_model=AssistantConfigResponse)
@@ -189,7 +188,7 @@ async def get_assistant(
     result = await db.execute(
         select(AssistantConfig).where(
             AssistantConfig.id == uuid_lib.UUID(assistant_id),
-            AssistantConfig.user_id == uuid_lib.UUID(current_user["user_id"])
+            AssistantConfig.user_id == current_user["user_uuid"]
         )
     )
     assistant = result.scalar_one_or_none()
@@ -200,25 +199,7 @@ async def get_assistant(
             detail="助手配置不存在"
         )
     
-    return AssistantConfigResponse(
-        id=str(assistant.id),
-        user_id=str(assistant.user_id),
-        name=assistant.name,
-        description=assistant.description,
-        llm_config_id=str(assistant.llm_config_id) if assistant.llm_config_id else None,
-        system_prompt=assistant.system_prompt,
-        knowledge_base_ids=[str(kid) for kid in assistant.knowledge_base_ids] if assistant.knowledge_base_ids else [],
-        datasource_ids=[str(did) for did in assistant.datasource_ids] if assistant.datasource_ids else [],
-        interface_ids=[str(iid) for iid in assistant.interface_ids] if assistant.interface_ids else [],
-        enable_knowledge_base=assistant.enable_knowledge_base,
-        enable_datasource=assistant.enable_datasource,
-        enable_interface=assistant.enable_interface,
-        auto_route=assistant.auto_route,
-        max_history=assistant.max_history,
-        config=assistant.config,
-        is_default=assistant.is_default,
-        is_active=assistant.is_active
-    )
+    return ORJSONResponse(_assistant_to_dict(assistant))
 
 
 @router.put("/{assistant_id}", response_model=AssistantConfigResponse)
@@ -229,12 +210,36 @@ async def update_assistant(
     db: AsyncSession = Depends(get_db)
 ) -> Any:
     """更新助手配置"""
-    result = await db.execute(
-        select(AssistantConfig).where(
-            AssistantConfig.id == uuid_lib.UUID(assistant_id),
-            AssistantConfig.user_id == uuid_lib.UUID(current_user["user_id"])
-        )
+    assistant_uuid = uuid_lib.UUID(assistant_id)
+    
+    # 更新字段
+    update_dict = update_data.model_dump(exclude_unset=True)
+    
+    # 转换UUID列表
+    for field in _UUID_LIST_FIELDS & update_dict.keys():
+        if update_dict[field] is not None:
+            update_dict[field] = [UUID(item) for item in update_dict[field]]
+    if update_dict.get("llm_config_id") is not None:
+        update_dict["llm_config_id"] = UUID(update_dict["llm_config_id"])
+    
+    where_clause = (
+        AssistantConfig.id == assistant_uuid,
+        AssistantConfig.user_id == current_user["user_uuid"],
     )
+    if update_dict:
+        # 单条 UPDATE ... RETURNING 完成归属校验、更新与取回；
+        # 设为默认时在同一条语句中取消其他默认配置（助手不存在时抛出404，get_db 会回滚）
+        stmt = (
+            update(AssistantConfig)
+            .where(*where_clause)
+            .values(**update_dict)
+            .returning(AssistantConfig)
+        )
+        if update_data.is_default:
+            stmt = stmt.add_cte(_unset_default_cte(current_user["user_uuid"], assistant_uuid))
+        result = await db.execute(stmt)
+    else:
+        result = await db.execute(select(AssistantConfig).where(*where_clause))
     assistant = result.scalar_one_or_none()
     
     if not assistant:
@@ -243,54 +248,9 @@ async def update_assistant(
             detail="助手配置不存在"
         )
     
-    # 如果设置为默认，先取消其他默认配置
-    if update_data.is_default:
-        await db.execute(
-            update(AssistantConfig)
-            .where(AssistantConfig.user_id == uuid_lib.UUID(current_user["user_id"]))
-            .where(AssistantConfig.id != uuid_lib.UUID(assistant_id))
-            .where(AssistantConfig.is_default == True)
-            .values(is_default=False)
-        )
-    
-    # 更新字段
-    update_dict = update_data.dict(exclude_unset=True)
-    
-    # 转换UUID列表
-    if "knowledge_base_ids" in update_dict and update_dict["knowledge_base_ids"] is not None:
-        update_dict["knowledge_base_ids"] = [UUID(kid) for kid in update_dict["knowledge_base_ids"]]
-    if "datasource_ids" in update_dict and update_dict["datasource_ids"] is not None:
-        update_dict["datasource_ids"] = [UUID(did) for did in update_dict["datasource_ids"]]
-    if "interface_ids" in update_dict and update_dict["interface_ids"] is not None:
-        update_dict["interface_ids"] = [UUID(iid) for iid in update_dict["interface_ids"]]
-    if "llm_config_id" in update_dict and update_dict["llm_config_id"] is not None:
-        update_dict["llm_config_id"] = UUID(update_dict["llm_config_id"])
-    
-    for key, value in update_dict.items():
-        setattr(assistant, key, value)
-    
     await db.commit()
-    await db.refresh(assistant)
     
-    return AssistantConfigResponse(
-        id=str(assistant.id),
-        user_id=str(assistant.user_id),
-        name=assistant.name,
-        description=assistant.description,
-        llm_config_id=str(assistant.llm_config_id) if assistant.llm_config_id else None,
-        system_prompt=assistant.system_prompt,
-        knowledge_base_ids=[str(kid) for kid in assistant.knowledge_base_ids] if assistant.knowledge_base_ids else [],
-        datasource_ids=[str(did) for did in assistant.datasource_ids] if assistant.datasource_ids else [],
-        interface_ids=[str(iid) for iid in assistant.interface_ids] if assistant.interface_ids else [],
-        enable_knowledge_base=assistant.enable_knowledge_base,
-        enable_datasource=assistant.enable_datasource,
-        enable_interface=assistant.enable_interface,
-        auto_route=assistant.auto_route,
-        max_history=assistant.max_history,
-        config=assistant.config,
-        is_default=assistant.is_default,
-        is_active=assistant.is_active
-    )
+    return ORJSONResponse(_assistant_to_dict(assistant))
 
 
 @router.delete("/{assistant_id}")
@@ -300,21 +260,20 @@ async def delete_assistant(
     db: AsyncSession = Depends(get_db)
 ) -> Any:
     """删除助手配置"""
+    # 单条 DELETE 同时完成归属校验与删除
     result = await db.execute(
-        select(AssistantConfig).where(
+        delete(AssistantConfig).where(
             AssistantConfig.id == uuid_lib.UUID(assistant_id),
-            AssistantConfig.user_id == uuid_lib.UUID(current_user["user_id"])
+            AssistantConfig.user_id == current_user["user_uuid"]
         )
     )
-    assistant = result.scalar_one_or_none()
     
-    if not assistant:
+    if result.rowcount == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="助手配置不存在"
         )
     
-    await db.delete(assistant)
     await db.commit()
     
     return {"message": "删除成功"}
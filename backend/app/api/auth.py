@@ -6,13 +6,13 @@ from typing import Any
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from pydantic import BaseModel, EmailStr
+from sqlalchemy import select, bindparam, or_
+from pydantic import BaseModel, ConfigDict, EmailStr
 
 from app.core.database import get_db
 from app.core.security import (
-    verify_password,
-    get_password_hash,
+    verify_password_async,
+    get_password_hash_async,
     create_access_token,
     get_current_user,
 )
@@ -21,6 +21,13 @@ from app.models.user import User
 
 router = APIRouter()
 
+# 模块级预构建的查询语句，复用 SQLAlchemy 编译缓存
+_USER_BY_USERNAME = select(User).where(User.username == bindparam("username"))
+_USER_BY_ID = select(User).where(User.id == bindparam("user_id"))
+_USERNAME_OR_EMAIL_TAKEN = select(User.username, User.email).where(
+    or_(User.username == bindparam("username"), User.email == bindparam("email"))
+)
+
 
 class UserRegister(BaseModel):
     """用户注册模型"""
@@ -38,15 +45,13 @@ class UserResponse(BaseModel):
     full_name: str
     is_active: bool
     
-    class Config:
-        from_attributes = True
-        json_encoders = {
-            # 自定义序列化器
-        }
+    model_config = ConfigDict(from_attributes=True, frozen=True, revalidate_instances="never")
 
 
 class Token(BaseModel):
     """令牌响应"""
+    model_config = ConfigDict(frozen=True, revalidate_instances="never")
+    
     access_token: str
     token_type: str = "bearer"
 
@@ -58,21 +63,18 @@ async def register(
 ) -> Any:
     """用户注册"""
     
-    # 检查用户名是否已存在
+    # 一次查询同时检查用户名和邮箱是否已存在
     result = await db.execute(
-        select(User).where(User.username == user_data.username)
+        _USERNAME_OR_EMAIL_TAKEN,
+        {"username": user_data.username, "email": user_data.email}
     )
-    if result.scalar_one_or_none():
+    existing = result.all()
+    if any(row.username == user_data.username for row in existing):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="用户名已存在"
         )
-    
-    # 检查邮箱是否已存在
-    result = await db.execute(
-        select(User).where(User.email == user_data.email)
-    )
-    if result.scalar_one_or_none():
+    if existing:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="邮箱已存在"
@@ -82,7 +84,7 @@ async def register(
     user = User(
         username=user_data.username,
         email=user_data.email,
-        hashed_password=get_password_hash(user_data.password),
+        hashed_password=await get_password_hash_async(user_data.password),
         full_name=user_data.full_name,
     )
     
@@ -107,12 +109,10 @@ async def login(
     """用户登录"""
     
     # 查找用户
-    result = await db.execute(
-        select(User).where(User.username == form_data.username)
-    )
+    result = await db.execute(_USER_BY_USERNAME, {"username": form_data.username})
     user = result.scalar_one_or_none()
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="用户名或密码错误",
@@ -144,9 +144,7 @@ async def get_current_user_info(
 ) -> Any:
     """获取当前用户信息"""
     
-    result = await db.execute(
-        select(User).where(User.id == current_user["user_id"])
-    )
+    result = await db.execute(_USER_BY_ID, {"user_id": current_user["user_uuid"]})
     user = result.scalar_one_or_none()
     
     if not user:
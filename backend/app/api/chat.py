@@ -3,19 +3,22 @@
 """
 from typing import List, Any
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, ORJSONResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from pydantic import BaseModel
+from sqlalchemy import select, delete, func
+from pydantic import BaseModel, ConfigDict
 import uuid
-import json
+import orjson
 
-from app.core.database import get_db
+from app.core.database import get_db, async_session_maker
 from app.core.security import get_current_user
 from app.models.conversation import Conversation, Message
 from app.models.knowledge import KnowledgeBase
 from app.services.assistant import ChatEngine
-from app.services.knowledge import VectorStore
+from app.services.knowledge import get_vectorstore
+from app.utils.cache import conversation_owner_cache, knowledge_base_cache
+from app.utils.sse import DATA_PREFIX, SSE_SEP, DONE_EVENT, coalesce_chunks
 
 router = APIRouter()
 
@@ -32,6 +35,8 @@ class ConversationCreate(BaseModel):
 
 class ConversationResponse(BaseModel):
     """对话响应模型"""
+    model_config = ConfigDict(from_attributes=True, frozen=True, revalidate_instances="never")
+    
     id: str
     title: str
     knowledge_base_id: str = None
@@ -48,12 +53,59 @@ class ChatRequest(BaseModel):
 
 class MessageResponse(BaseModel):
     """消息响应"""
+    model_config = ConfigDict(from_attributes=True, frozen=True, revalidate_instances="never")
+    
     id: str
     role: str
     content: str
 
 
-@router.post("/conversations", response_model=ConversationResponse)
+async def _persist_assistant_reply(conversation_id: uuid.UUID, parts: List[str]) -> None:
+    """流式响应结束后保存助手消息（使用独立会话，请求会话此时可能已关闭）"""
+    async with async_session_maker() as session:
+        session.add(Message(
+            conversation_id=conversation_id,
+            role="assistant",
+            content="".join(parts),
+        ))
+        await session.commit()
+
+
+def _message_count_column():
+    """按对话统计消息数量的关联子查询（消息数量不再随每次写入维护，读取时实时统计）"""
+    return (
+        select(func.count())
+        .select_from(Message)
+        .where(Message.conversation_id == Conversation.id)
+        .correlate(Conversation)
+        .scalar_subquery()
+        .label("message_count")
+    )
+
+
+async def _conversation_exists(db: AsyncSession, conversation_id: uuid.UUID, user_id: uuid.UUID) -> bool:
+    """检查对话是否存在且属于指定用户"""
+    result = await db.execute(
+        select(Conversation.id).where(
+            Conversation.id == conversation_id,
+            Conversation.user_id == user_id
+        )
+    )
+    return result.scalar_one_or_none() is not None
+
+
+def _conversation_to_dict(conv: Conversation) -> dict:
+    """将对话ORM对象或查询行转换为响应字典，确保 UUID 转换为字符串"""
+    return {
+        "id": str(conv.id),
+        "title": conv.title,
+        "knowledge_base_id": str(conv.knowledge_base_id) if conv.knowledge_base_id else None,
+        "model": conv.model,
+        "message_count": conv.message_count or 0,
+    }
+
+
+@router.post("/conversations", responses={200: {"model": ConversationResponse}})
 async def create_conversation(
     conv_data: ConversationCreate,
     current_user: dict = Depends(get_current_user),
@@ -66,7 +118,7 @@ async def create_conversation(
         result = await db.execute(
             select(KnowledgeBase).where(
                 KnowledgeBase.id == uuid.UUID(conv_data.knowledge_base_id),
-                KnowledgeBase.user_id == uuid.UUID(current_user["user_id"])
+                KnowledgeBase.user_id == current_user["user_uuid"]
             )
         )
         kb = result.scalar_one_or_none()
@@ -78,7 +130,7 @@ async def create_conversation(
     
     # 创建对话
     conversation = Conversation(
-        user_id=uuid.UUID(current_user["user_id"]),
+        user_id=current_user["user_uuid"],
         knowledge_base_id=uuid.UUID(conv_data.knowledge_base_id) if conv_data.knowledge_base_id else None,
         title=conv_data.title,
         system_prompt=conv_data.system_prompt,
@@ -91,35 +143,32 @@ async def create_conversation(
     await db.commit()
     await db.refresh(conversation)
     
-    return conversation
+    # 数据来自数据库，已知合法，直接序列化返回，跳过响应模型校验
+    return ORJSONResponse(_conversation_to_dict(conversation))
 
 
-@router.get("/conversations", response_model=List[ConversationResponse])
+# 列表接口不声明 response_model，避免逐行校验；仅通过 responses 保留 OpenAPI 文档
+@router.get("/conversations", responses={200: {"model": List[ConversationResponse]}})
 async def list_conversations(
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ) -> Any:
     """获取对话列表"""
     
+    # 只查询响应需要的列，消息数量在同一条语句中统计
     result = await db.execute(
-        select(Conversation).where(
-            Conversation.user_id == uuid.UUID(current_user["user_id"])
+        select(
+            Conversation.id,
+            Conversation.title,
+            Conversation.knowledge_base_id,
+            Conversation.model,
+            _message_count_column(),
+        ).where(
+            Conversation.user_id == current_user["user_uuid"]
         ).order_by(Conversation.updated_at.desc())
     )
-    conversations = result.scalars().all()
-    
-    # 转换为响应模型，确保 UUID 转换为字符串
-    conv_list = []
-    for conv in conversations:
-        conv_list.append(ConversationResponse(
-            id=str(conv.id),
-            title=conv.title,
-            knowledge_base_id=str(conv.knowledge_base_id) if conv.knowledge_base_id else None,
-            model=conv.model,
-            message_count=conv.message_count or 0
-        ))
     
-    return conv_list
+    return ORJSONResponse([_conversation_to_dict(row) for row in result])
 
 
 @router.get("/conversations/{conversation_id}", response_model=ConversationResponse)
@@ -131,27 +180,26 @@ async def get_conversation(
     """获取对话详情"""
     
     result = await db.execute(
-        select(Conversation).where(
+        select(
+            Conversation.id,
+            Conversation.title,
+            Conversation.knowledge_base_id,
+            Conversation.model,
+            _message_count_column(),
+        ).where(
             Conversation.id == uuid.UUID(conversation_id),
-            Conversation.user_id == uuid.UUID(current_user["user_id"])
+            Conversation.user_id == current_user["user_uuid"]
         )
     )
-    conversation = result.scalar_one_or_none()
+    row = result.one_or_none()
     
-    if not conversation:
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="对话不存在"
         )
     
-    # 转换为响应模型，确保 UUID 转换为字符串
-    return ConversationResponse(
-        id=str(conversation.id),
-        title=conversation.title,
-        knowledge_base_id=str(conversation.knowledge_base_id) if conversation.knowledge_base_id else None,
-        model=conversation.model,
-        message_count=conversation.message_count or 0
-    )
+    return ORJSONResponse(_conversation_to_dict(row))
 
 
 @router.delete("/conversations/{conversation_id}")
@@ -161,28 +209,32 @@ async def delete_conversation(
     db: AsyncSession = Depends(get_db)
 ) -> Any:
     """删除对话"""
+    conv_uuid = uuid.UUID(conversation_id)
     
+    # 单条 DELETE 同时完成归属校验与删除，消息由外键 ON DELETE CASCADE 级联删除
     result = await db.execute(
-        select(Conversation).where(
-            Conversation.id == uuid.UUID(conversation_id),
-            Conversation.user_id == uuid.UUID(current_user["user_id"])
+        delete(Conversation).where(
+            Conversation.id == conv_uuid,
+            Conversation.user_id == current_user["user_uuid"]
         )
     )
-    conversation = result.scalar_one_or_none()
     
-    if not conversation:
+    if result.rowcount == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="对话不存在"
         )
     
-    await db.delete(conversation)
     await db.commit()
+    conversation_owner_cache.pop((conv_uuid, current_user["user_uuid"]))
     
     return {"message": "对话已删除"}
 
 
-@router.get("/conversations/{conversation_id}/messages", response_model=List[MessageResponse])
+@router.get(
+    "/conversations/{conversation_id}/messages",
+    responses={200: {"model": List[MessageResponse]}}
+)
 async def get_conversation_messages(
     conversation_id: str,
     current_user: dict = Depends(get_current_user),
@@ -190,30 +242,40 @@ async def get_conversation_messages(
 ) -> Any:
     """获取对话消息"""
     
-    # 验证对话存在
-    result = await db.execute(
-        select(Conversation).where(
-            Conversation.id == uuid.UUID(conversation_id),
-            Conversation.user_id == uuid.UUID(current_user["user_id"])
-        )
-    )
-    conversation = result.scalar_one_or_none()
+    conv_uuid = uuid.UUID(conversation_id)
+    owner_key = (conv_uuid, current_user["user_uuid"])
     
-    if not conversation:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="对话不存在"
-        )
+    # 验证对话存在（归属关系短时缓存，命中时跳过一次查询）
+    cache_hit = bool(conversation_owner_cache.get(owner_key))
+    if not cache_hit:
+        if not await _conversation_exists(db, conv_uuid, current_user["user_uuid"]):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="对话不存在"
+            )
+        conversation_owner_cache.set(owner_key, True)
     
-    # 获取消息
+    # 获取消息（只查询需要的列，不构造ORM对象与响应模型）
     result = await db.execute(
-        select(Message).where(
-            Message.conversation_id == uuid.UUID(conversation_id)
-        ).order_by(Message.created_at)
+        select(Message.id, Message.role, Message.content).where(
+            Message.conversation_id == conv_uuid
+        ).order_by(Message.created_at, Message.id)
     )
-    messages = result.scalars().all()
+    rows = result.all()
+    
+    # 缓存是进程内的，对话可能已在其他 worker 上被删除：命中缓存但没有消息时重新校验一次
+    if not rows and cache_hit:
+        if not await _conversation_exists(db, conv_uuid, current_user["user_uuid"]):
+            conversation_owner_cache.pop(owner_key)
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="对话不存在"
+            )
     
-    return messages
+    return ORJSONResponse([
+        {"id": str(row.id), "role": row.role, "content": row.content}
+        for row in rows
+    ])
 
 
 @router.post("/conversations/{conversation_id}/messages")
@@ -227,9 +289,10 @@ async def send_message(
     
     # 获取对话
     result = await db.execute(
-        select(Conversation).where(
+        select(Conversation)
+        .where(
             Conversation.id == uuid.UUID(conversation_id),
-            Conversation.user_id == uuid.UUID(current_user["user_id"])
+            Conversation.user_id == current_user["user_uuid"]
         )
     )
     conversation = result.scalar_one_or_none()
@@ -248,28 +311,32 @@ async def send_message(
         system_prompt=conversation.system_prompt,
     )
     
-    # 加载对话历史
+    # 加载对话历史：上下文只使用最近 max_history 条，因此只查询这部分并按时间正序回放
     result = await db.execute(
-        select(Message).where(
-            Message.conversation_id == uuid.UUID(conversation_id)
-        ).order_by(Message.created_at)
+        select(Message.role, Message.content)
+        .where(Message.conversation_id == conversation.id)
+        .order_by(Message.created_at.desc(), Message.id.desc())
+        .limit(chat_engine.max_history)
     )
-    messages = result.scalars().all()
+    for row in reversed(result.all()):
+        chat_engine.memory.add_message(row.role, row.content)
     
-    for msg in messages:
-        chat_engine.memory.add_message(msg.role, msg.content)
-    
-    # 设置知识库
+    # 设置知识库（知识库元信息很少变化，缓存5分钟）
     if conversation.knowledge_base_id and chat_data.use_knowledge_base:
-        result = await db.execute(
-            select(KnowledgeBase).where(
-                KnowledgeBase.id == conversation.knowledge_base_id
+        kb_meta = knowledge_base_cache.get(conversation.knowledge_base_id)
+        if kb_meta is None:
+            result = await db.execute(
+                select(KnowledgeBase.collection_name, KnowledgeBase.embedding_model).where(
+                    KnowledgeBase.id == conversation.knowledge_base_id
+                )
             )
-        )
-        kb = result.scalar_one_or_none()
+            row = result.one_or_none()
+            if row:
+                kb_meta = (row.collection_name, row.embedding_model)
+                knowledge_base_cache.set(conversation.knowledge_base_id, kb_meta)
         
-        if kb:
-            vectorstore = VectorStore(kb.collection_name, kb.embedding_model)
+        if kb_meta:
+            vectorstore = get_vectorstore(*kb_meta)
             chat_engine.set_knowledge_base(vectorstore)
     
     # 保存用户消息
@@ -282,33 +349,34 @@ async def send_message(
     
     # 如果是流式响应
     if chat_data.stream:
+        # 先提交用户消息，助手消息在响应发送完毕后由后台任务落库，不阻塞 done 事件
+        await db.commit()
+        
+        # 收集分片后一次性拼接，避免逐块字符串拼接的二次复杂度
+        parts: List[str] = []
+        
         async def generate():
-            full_response = ""
-            async for chunk in chat_engine.stream_chat(
+            stream = chat_engine.stream_chat(
                 chat_data.message,
                 use_knowledge_base=chat_data.use_knowledge_base
-            ):
-                full_response += chunk
-                yield f"data: {json.dumps({'content': chunk})}\n\n"
-            
-            # 保存助手消息
-            assistant_message = Message(
-                conversation_id=conversation.id,
-                role="assistant",
-                content=full_response,
             )
-            db.add(assistant_message)
-            
-            # 更新统计
-            conversation.message_count += 2
-            await db.commit()
+            async for chunk in coalesce_chunks(stream):
+                parts.append(chunk)
+                yield DATA_PREFIX + orjson.dumps({"content": chunk}) + SSE_SEP
             
-            yield f"data: {json.dumps({'done': True})}\n\n"
+            yield DONE_EVENT
         
-        return StreamingResponse(generate(), media_type="text/event-stream")
+        return StreamingResponse(
+            generate(),
+            media_type="text/event-stream",
+            background=BackgroundTask(_persist_assistant_reply, conversation.id, parts)
+        )
     
     # 非流式响应
     else:
+        # 先单独写入用户消息：与助手消息同批 INSERT 时两行的 clock_timestamp() 可能相同，顺序无法保证
+        await db.flush()
+        
         reply = await chat_engine.chat(
             chat_data.message,
             use_knowledge_base=chat_data.use_knowledge_base
@@ -321,9 +389,6 @@ async def send_message(
             content=reply,
         )
         db.add(assistant_message)
-        
-        # 更新统计
-        conversation.message_count += 2
         await db.commit()
         
         return {
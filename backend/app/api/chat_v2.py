@@ -2,21 +2,27 @@
 对话API V2 (支持助手配置和智能路由)
 """
 from typing import List, Any, Optional, Dict
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import StreamingResponse, ORJSONResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
-from pydantic import BaseModel
+from sqlalchemy import select, delete, func, and_, tuple_
+from sqlalchemy.orm import joinedload, contains_eager
+from pydantic import BaseModel, TypeAdapter
+import asyncio
 import uuid
-import json
-from datetime import datetime
+import orjson
 
-from app.core.database import get_db
+from app.core.database import get_db, async_session_maker
 from app.core.security import get_current_user
 from app.models import Conversation, Message, AssistantConfig, LLMConfig, KnowledgeBase
-from app.services.llm_service import LLMService
-from app.services.knowledge import VectorStore
+from app.services.llm_service import get_llm_service
+from app.services.knowledge import get_vectorstore
 from app.core.logging import setup_logging
+from app.utils.cache import conversation_owner_cache
+from app.utils.pagination import encode_cursor, decode_cursor
+from app.utils.tokens import count_tokens
+from app.utils.sse import DATA_PREFIX, SSE_SEP, DONE_EVENT, coalesce_chunks
 
 logger = setup_logging()
 router = APIRouter()
@@ -65,58 +71,126 @@ class MessageResponse(BaseModel):
         from_attributes = True
 
 
+# 列表序列化适配器，模块加载时构建一次，避免每个请求重新构建
+_CONVERSATION_LIST_ADAPTER = TypeAdapter(List[ConversationResponse])
+_MESSAGE_LIST_ADAPTER = TypeAdapter(List[MessageResponse])
+
+# 作为LLM上下文的历史消息角色
+_HISTORY_ROLES = frozenset(("user", "assistant"))
+
+# 助手未设置 max_history 时作为上下文的历史消息条数
+_DEFAULT_MAX_HISTORY = 10
+
+# LLM调用失败时返回给用户的提示
+_LLM_ERROR_TEMPLATE = "抱歉，LLM调用失败：{error}\n\n请检查：\n1. API密钥是否正确\n2. 网络连接是否正常\n3. LLM服务是否可用"
+
+
+def _build_assistant_message(
+    conversation_id: uuid.UUID,
+    content: str,
+    model: Optional[str],
+    knowledge_hits: List[Dict[str, Any]]
+) -> Message:
+    """构建助手消息"""
+    return Message(
+        conversation_id=conversation_id,
+        role="assistant",
+        content=content,
+        tokens=count_tokens(content, model),
+        msg_metadata={
+            "knowledge_hits": knowledge_hits,
+            "used_knowledge": bool(knowledge_hits)
+        } if knowledge_hits else None
+    )
+
+
+async def _save_streamed_reply(
+    conversation_id: uuid.UUID,
+    parts: List[str],
+    model: Optional[str],
+    knowledge_hits: List[Dict[str, Any]]
+) -> None:
+    """流式响应结束后保存助手消息（使用独立会话，请求会话此时可能已关闭）"""
+    async with async_session_maker() as session:
+        session.add(_build_assistant_message(conversation_id, "".join(parts), model, knowledge_hits))
+        await session.commit()
+
+
 # ========== 对话管理端点 ==========
 
 @router.get("/conversations", response_model=List[ConversationResponse])
 async def list_conversations_v2(
+    limit: Optional[int] = Query(None, ge=1, le=200, description="每页数量，不传则返回全部对话"),
+    cursor: Optional[str] = Query(None, description="游标：上一页响应头 X-Next-Cursor 的值"),
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ) -> Any:
-    """获取对话列表 V2"""
-    result = await db.execute(
-        select(Conversation).where(
-            Conversation.user_id == uuid.UUID(current_user["user_id"])
-        ).order_by(Conversation.created_at.desc())
+    """
+    获取对话列表 V2（按创建时间倒序）
+    
+    传入 limit 时按 (created_at, id) 做键集分页，还有更早的对话时在响应头 X-Next-Cursor 中返回下一页游标。
+    """
+    # 单条聚合查询同时取回消息数量与助手名称，避免逐个对话查询；只查询响应需要的列
+    query = (
+        select(
+            Conversation.id,
+            Conversation.title,
+            Conversation.assistant_id,
+            Conversation.knowledge_base_id,
+            Conversation.system_prompt,
+            Conversation.model,
+            Conversation.temperature,
+            Conversation.max_tokens,
+            Conversation.created_at,
+            AssistantConfig.name.label("assistant_name"),
+            func.count(Message.id).label("message_count"),
+        )
+        .select_from(Conversation)
+        .outerjoin(AssistantConfig, AssistantConfig.id == Conversation.assistant_id)
+        .outerjoin(Message, Message.conversation_id == Conversation.id)
+        .where(Conversation.user_id == current_user["user_uuid"])
     )
-    conversations = result.scalars().all()
+    if cursor is not None:
+        cursor_created_at, cursor_id = decode_cursor(cursor)
+        query = query.where(
+            tuple_(Conversation.created_at, Conversation.id) < tuple_(cursor_created_at, cursor_id)
+        )
+    query = (
+        query
+        .group_by(Conversation.id, AssistantConfig.name)
+        .order_by(Conversation.created_at.desc(), Conversation.id.desc())
+    )
+    if limit is not None:
+        # 多取一条用于判断是否还有下一页
+        query = query.limit(limit + 1)
+    rows = (await db.execute(query)).all()
     
-    conv_list = []
-    for conv in conversations:
-        # 获取消息数量
-        count_result = await db.execute(
-            select(func.count(Message.id)).where(
-                Message.conversation_id == conv.id
-            )
+    headers = {}
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(rows[-1].created_at, rows[-1].id)
+    
+    conv_list = [
+        ConversationResponse.model_construct(
+            id=str(row.id),
+            title=row.title,
+            assistant_id=str(row.assistant_id) if row.assistant_id else None,
+            assistant_name=row.assistant_name,
+            knowledge_base_id=str(row.knowledge_base_id) if row.knowledge_base_id else None,
+            system_prompt=row.system_prompt,
+            model=row.model,
+            temperature=row.temperature,
+            max_tokens=row.max_tokens,
+            message_count=row.message_count or 0,
+            created_at=row.created_at.isoformat()
         )
-        message_count = count_result.scalar() or 0
-        
-        # 获取助手名称
-        assistant_name = None
-        if conv.assistant_id:
-            assistant_result = await db.execute(
-                select(AssistantConfig).where(
-                    AssistantConfig.id == conv.assistant_id
-                )
-            )
-            assistant = assistant_result.scalar_one_or_none()
-            if assistant:
-                assistant_name = assistant.name
-        
-        conv_list.append(ConversationResponse(
-            id=str(conv.id),
-            title=conv.title,
-            assistant_id=str(conv.assistant_id) if conv.assistant_id else None,
-            assistant_name=assistant_name,
-            knowledge_base_id=str(conv.knowledge_base_id) if conv.knowledge_base_id else None,
-            system_prompt=conv.system_prompt,
-            model=conv.model,
-            temperature=conv.temperature,
-            max_tokens=conv.max_tokens,
-            message_count=message_count,
-            created_at=conv.created_at.isoformat()
-        ))
+        for row in rows
+    ]
     
-    return conv_list
+    return ORJSONResponse(
+        _CONVERSATION_LIST_ADAPTER.dump_python(conv_list, mode="json"),
+        headers=headers
+    )
 
 
 @router.post("/conversations", response_model=ConversationResponse)
@@ -126,40 +200,39 @@ async def create_conversation_v2(
     db: AsyncSession = Depends(get_db)
 ) -> Any:
     """创建对话 V2"""
-    # 验证助手配置
+    # 验证助手配置并获取LLM配置（一次查询）
     result = await db.execute(
-        select(AssistantConfig).where(
+        select(AssistantConfig, LLMConfig)
+        .outerjoin(
+            LLMConfig,
+            and_(
+                LLMConfig.id == AssistantConfig.llm_config_id,
+                LLMConfig.user_id == current_user["user_uuid"]
+            )
+        )
+        .where(
             AssistantConfig.id == uuid.UUID(conv_data.assistant_id),
-            AssistantConfig.user_id == uuid.UUID(current_user["user_id"])
+            AssistantConfig.user_id == current_user["user_uuid"]
         )
     )
-    assistant_config = result.scalar_one_or_none()
+    row = result.first()
+    assistant_config, llm_config = row if row else (None, None)
     if not assistant_config:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="助手配置不存在"
         )
     
-    # 获取LLM配置
-    llm_config = None
-    if assistant_config.llm_config_id:
-        result = await db.execute(
-            select(LLMConfig).where(
-                LLMConfig.id == assistant_config.llm_config_id,
-                LLMConfig.user_id == uuid.UUID(current_user["user_id"])
-            )
+    if assistant_config.llm_config_id and not llm_config:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="LLM配置不存在或已删除"
         )
-        llm_config = result.scalar_one_or_none()
-        if not llm_config:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="LLM配置不存在或已删除"
-            )
 
     # 创建对话
     conversation = Conversation(
-        user_id=uuid.UUID(current_user["user_id"]),
-        assistant_id=uuid.UUID(conv_data.assistant_id),
+        user_id=current_user["user_uuid"],
+        assistant_id=assistant_config.id,
         title=conv_data.title,
         system_prompt=conv_data.system_prompt or assistant_config.system_prompt or "你是一个有帮助的AI助手。",
         model=llm_config.model_name if llm_config else "default-model",
@@ -171,7 +244,7 @@ async def create_conversation_v2(
     await db.commit()
     await db.refresh(conversation)
     
-    return ConversationResponse(
+    return ConversationResponse.model_construct(
         id=str(conversation.id),
         title=conversation.title,
         assistant_id=str(conversation.assistant_id) if conversation.assistant_id else None,
@@ -193,37 +266,32 @@ async def get_conversation_v2(
     db: AsyncSession = Depends(get_db)
 ) -> Any:
     """获取对话详情 V2"""
+    # 消息数量通过关联子查询与对话在同一条语句中取回
+    message_count_subquery = (
+        select(func.count())
+        .select_from(Message)
+        .where(Message.conversation_id == Conversation.id)
+        .correlate(Conversation)
+        .scalar_subquery()
+        .label("message_count")
+    )
     result = await db.execute(
-        select(Conversation).where(
+        select(Conversation, message_count_subquery)
+        .options(joinedload(Conversation.assistant))
+        .where(
             Conversation.id == uuid.UUID(conversation_id),
-            Conversation.user_id == uuid.UUID(current_user["user_id"])
+            Conversation.user_id == current_user["user_uuid"]
         )
     )
-    conversation = result.scalar_one_or_none()
-    if not conversation:
+    row = result.one_or_none()
+    if not row:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="对话不存在")
+    conversation, message_count = row
     
-    # 获取消息数量
-    count_result = await db.execute(
-        select(func.count(Message.id)).where(
-            Message.conversation_id == conversation.id
-        )
-    )
-    message_count = count_result.scalar() or 0
-    
-    # 获取助手名称
-    assistant_name = None
-    if conversation.assistant_id:
-        assistant_result = await db.execute(
-            select(AssistantConfig).where(
-                AssistantConfig.id == conversation.assistant_id
-            )
-        )
-        assistant = assistant_result.scalar_one_or_none()
-        if assistant:
-            assistant_name = assistant.name
+    # 助手名称随对话一并加载
+    assistant_name = conversation.assistant.name if conversation.assistant else None
     
-    return ConversationResponse(
+    return ConversationResponse.model_construct(
         id=str(conversation.id),
         title=conversation.title,
         assistant_id=str(conversation.assistant_id) if conversation.assistant_id else None,
@@ -233,7 +301,7 @@ async def get_conversation_v2(
         model=conversation.model,
         temperature=conversation.temperature,
         max_tokens=conversation.max_tokens,
-        message_count=message_count,
+        message_count=message_count or 0,
         created_at=conversation.created_at.isoformat()
     )
 
@@ -245,18 +313,22 @@ async def delete_conversation_v2(
     db: AsyncSession = Depends(get_db)
 ) -> Any:
     """删除对话 V2"""
+    conv_uuid = uuid.UUID(conversation_id)
+    
+    # 单条 DELETE 同时完成归属校验与删除，消息由外键 ON DELETE CASCADE 级联删除
     result = await db.execute(
-        select(Conversation).where(
-            Conversation.id == uuid.UUID(conversation_id),
-            Conversation.user_id == uuid.UUID(current_user["user_id"])
+        delete(Conversation).where(
+            Conversation.id == conv_uuid,
+            Conversation.user_id == current_user["user_uuid"]
         )
     )
-    conversation = result.scalar_one_or_none()
-    if not conversation:
+    if result.rowcount == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="对话不存在")
     
-    await db.delete(conversation)
     await db.commit()
+    # 与 v1 删除一致，清除归属缓存，避免已删除的对话在缓存有效期内仍通过归属校验
+    conversation_owner_cache.pop((conv_uuid, current_user["user_uuid"]))
+    
     return {"message": "删除成功"}
 
 
@@ -265,27 +337,86 @@ async def delete_conversation_v2(
 @router.get("/conversations/{conversation_id}/messages", response_model=List[MessageResponse])
 async def get_conversation_messages_v2(
     conversation_id: str,
+    limit: Optional[int] = Query(None, ge=1, le=500, description="每页数量，不传则返回全部消息"),
+    cursor: Optional[str] = Query(None, description="游标：上一页响应头 X-Next-Cursor 的值"),
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ) -> Any:
-    """获取对话消息 V2"""
-    result = await db.execute(
-        select(Message)
-        .where(Message.conversation_id == uuid.UUID(conversation_id))
-        .order_by(Message.created_at)
+    """
+    获取对话消息 V2
+    
+    传入 limit 时按 (created_at, id) 做键集分页：每页返回游标之前最新的 limit 条消息（按时间正序），
+    还有更早的消息时在响应头 X-Next-Cursor 中返回下一页游标；
+    首页额外在响应头 X-Total-Count 中返回消息总数（窗口函数随分页查询一并计算，无需单独 COUNT）。
+    """
+    # 键集条件放在外连接条件里，保证对话存在但本页无消息时仍返回一行用于归属校验
+    message_join = Message.conversation_id == Conversation.id
+    if cursor is not None:
+        cursor_created_at, cursor_id = decode_cursor(cursor)
+        message_join = and_(
+            message_join,
+            tuple_(Message.created_at, Message.id) < tuple_(cursor_created_at, cursor_id)
+        )
+    
+    # 从对话外连接消息：一次查询同时完成归属校验并取出消息列，不加载 msg_metadata
+    query = (
+        select(
+            Message.id,
+            Message.role,
+            Message.content,
+            Message.tokens,
+            Message.created_at,
+        )
+        .select_from(Conversation)
+        .outerjoin(Message, message_join)
+        .where(
+            Conversation.id == uuid.UUID(conversation_id),
+            Conversation.user_id == current_user["user_uuid"]
+        )
     )
-    messages = result.scalars().all()
+    if limit is None:
+        query = query.order_by(Message.created_at, Message.id)
+    else:
+        if cursor is None:
+            # 窗口计数在 LIMIT 之前求值，得到的是整个对话的消息数
+            query = query.add_columns(func.count(Message.id).over().label("total"))
+        # 多取一条用于判断是否还有下一页
+        query = query.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit + 1)
+    result = await db.execute(query)
+    rows = result.all()
     
-    return [
-        MessageResponse(
-            id=str(msg.id),
-            role=msg.role,
-            content=msg.content,
-            tokens=msg.tokens or 0,
-            created_at=msg.created_at.isoformat()
+    if not rows:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="对话不存在"
         )
-        for msg in messages
+    
+    headers = {}
+    if limit is not None:
+        if cursor is None:
+            headers["X-Total-Count"] = str(rows[0].total)
+        if len(rows) > limit:
+            rows = rows[:limit]
+            headers["X-Next-Cursor"] = encode_cursor(rows[-1].created_at, rows[-1].id)
+        rows.reverse()
+    
+    message_list = [
+        MessageResponse.model_construct(
+            id=str(row.id),
+            role=row.role,
+            content=row.content,
+            tokens=row.tokens or 0,
+            created_at=row.created_at.isoformat()
+        )
+        for row in rows
+        # 对话没有消息时外连接会返回一行空消息
+        if row.id is not None
     ]
+    
+    return ORJSONResponse(
+        _MESSAGE_LIST_ADAPTER.dump_python(message_list, mode="json"),
+        headers=headers
+    )
 
 
 @router.post("/conversations/{conversation_id}/messages")
@@ -297,80 +428,53 @@ async def chat_with_assistant(
 ) -> Any:
     """与助手对话"""
     conv_uuid = uuid.UUID(conversation_id)
-    user_uuid = uuid.UUID(current_user["user_id"])
+    user_uuid = current_user["user_uuid"]
 
-    # 1. 获取对话和助手配置
+    # 1. 获取对话、助手配置与启用的LLM配置（一次查询）
     result = await db.execute(
-        select(Conversation).where(
+        select(Conversation, LLMConfig)
+        .outerjoin(Conversation.assistant)
+        .outerjoin(
+            LLMConfig,
+            and_(
+                LLMConfig.id == AssistantConfig.llm_config_id,
+                LLMConfig.user_id == user_uuid,
+                LLMConfig.is_active == True
+            )
+        )
+        .options(contains_eager(Conversation.assistant))
+        .where(
             Conversation.id == conv_uuid,
             Conversation.user_id == user_uuid
         )
     )
-    conversation = result.scalar_one_or_none()
+    row = result.first()
+    conversation, llm_config = row if row else (None, None)
     if not conversation:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="对话不存在")
 
-    result = await db.execute(
-        select(AssistantConfig).where(
-            AssistantConfig.id == conversation.assistant_id,
-            AssistantConfig.user_id == user_uuid
-        )
-    )
-    assistant_config = result.scalar_one_or_none()
-    if not assistant_config:
+    assistant_config = conversation.assistant
+    if not assistant_config or assistant_config.user_id != user_uuid:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="助手配置不存在")
 
-    # 2. 保存用户消息
-    user_message = Message(
-        conversation_id=conv_uuid,
-        role="user",
-        content=chat_request.message,
-        tokens=len(chat_request.message)  # 简化计算
-    )
-    db.add(user_message)
-    await db.commit()
-    await db.refresh(user_message)
-
-    # 3. 获取LLM配置并调用LLM服务
-    llm_config = None
-    if assistant_config.llm_config_id:
-        result = await db.execute(
-            select(LLMConfig).where(
-                LLMConfig.id == assistant_config.llm_config_id,
-                LLMConfig.user_id == user_uuid,
-                LLMConfig.is_active == True
-            )
-        )
-        llm_config = result.scalar_one_or_none()
-    
     if not llm_config:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="助手未配置LLM模型或LLM配置已禁用"
         )
-    
-    # 4. 获取历史消息（最近10条作为上下文）
-    history_result = await db.execute(
-        select(Message)
-        .where(Message.conversation_id == conv_uuid)
-        .order_by(Message.created_at.desc())
-        .limit(10)
+
+    # 2. 保存用户消息（在历史消息查询之后单独 flush，与助手消息在最后一次提交中一并提交）
+    user_message = Message(
+        conversation_id=conv_uuid,
+        role="user",
+        content=chat_request.message,
+        tokens=count_tokens(chat_request.message, conversation.model),
     )
-    history_messages = history_result.scalars().all()
-    history_messages.reverse()  # 按时间正序
-    
-    # 构建消息列表
-    llm_messages = []
-    for msg in history_messages:
-        if msg.role in ["user", "assistant"]:
-            llm_messages.append({
-                "role": msg.role,
-                "content": msg.content
-            })
+    db.add(user_message)
     
-    # 5. 知识库检索
-    knowledge_hits: List[Dict[str, Any]] = []
-    knowledge_context = ""
+    # 3. 知识库检索：查询知识库元信息后在后台并发检索，与下面的历史消息查询重叠执行
+    knowledge_bases: List[KnowledgeBase] = []
+    search_future: Optional[asyncio.Future] = None
     if assistant_config.enable_knowledge_base and assistant_config.knowledge_base_ids:
         kb_ids = [
             kb_id if isinstance(kb_id, uuid.UUID) else uuid.UUID(str(kb_id))
@@ -383,61 +487,123 @@ async def chat_with_assistant(
                 )
             )
             knowledge_bases = kb_result.scalars().all()
-            for kb in knowledge_bases:
-                try:
-                    vectorstore = VectorStore(kb.collection_name, kb.embedding_model)
-                    search_results = await vectorstore.search(chat_request.message, top_k=3)
-                    for item in search_results:
-                        hit = {
-                            "knowledge_base_id": str(kb.id),
-                            "knowledge_base_name": kb.name,
-                            "content": item.get("content", ""),
-                            "score": float(item.get("distance", 0.0)) if item.get("distance") is not None else None,
-                            "metadata": item.get("metadata", {})
-                        }
-                        knowledge_hits.append(hit)
-                except Exception as e:
-                    logger.error(f"知识库检索失败 ({kb.id}): {e}")
-            if knowledge_hits:
-                context_blocks = []
-                for idx, hit in enumerate(knowledge_hits, start=1):
-                    snippet = hit["content"]
-                    kb_name = hit["knowledge_base_name"]
-                    context_blocks.append(f"[来源 {idx} - {kb_name}]\n{snippet}")
-                knowledge_context = "\n\n".join(context_blocks)
-
-    # 6. 调用LLM服务生成回复
+            
+            async def _search_kb(kb: KnowledgeBase) -> List[Dict[str, Any]]:
+                vectorstore = get_vectorstore(kb.collection_name, kb.embedding_model)
+                return await vectorstore.search(
+                    chat_request.message,
+                    top_k=3,
+                    cache_version=(kb.updated_at, kb.total_chunks)
+                )
+            
+            # 多个知识库并发检索，总耗时取决于最慢的一个；gather 立即调度，此处不等待
+            search_future = asyncio.gather(
+                *(_search_kb(kb) for kb in knowledge_bases),
+                return_exceptions=True
+            )
+    
+    # 4. 获取历史消息（最近 max_history 条作为上下文，其中最后一条为当前尚未落库的用户消息）
+    max_history = assistant_config.max_history or _DEFAULT_MAX_HISTORY
     try:
-        llm_service = LLMService(llm_config)
-        base_system_prompt = conversation.system_prompt or assistant_config.system_prompt or "你是一个有帮助的AI助手。"
-        if knowledge_context:
-            system_prompt = (
-                f"{base_system_prompt}\n\n"
-                f"以下是与用户问题相关的知识库内容，请优先基于这些资料回答：\n"
-                f"{knowledge_context}\n\n"
-                "若资料不足以回答，请明确说明。"
+        history_result = await db.execute(
+            select(Message.role, Message.content)
+            .where(Message.conversation_id == conv_uuid)
+            .order_by(Message.created_at.desc(), Message.id.desc())
+            .limit(max(max_history - 1, 0))
+        )
+        # 用户消息单独 INSERT（须在历史查询之后，避免被查入历史）；
+        # 若与助手消息同批写入，两行的 clock_timestamp() 可能相同，顺序无法保证
+        await db.flush()
+    except BaseException:
+        # 查询失败或请求被取消时一并取消后台检索，避免向量化与检索脱离请求继续运行
+        if search_future is not None:
+            search_future.cancel()
+        raise
+    
+    # 构建消息列表（按时间正序，只保留用户与助手消息）
+    llm_messages = [
+        {"role": role, "content": content}
+        for role, content in reversed(history_result.all())
+        if role in _HISTORY_ROLES
+    ]
+    llm_messages.append({"role": "user", "content": chat_request.message})
+    
+    # 汇总知识库检索结果
+    knowledge_hits: List[Dict[str, Any]] = []
+    knowledge_context = ""
+    if search_future is not None:
+        results_per_kb = await search_future
+        for kb, search_results in zip(knowledge_bases, results_per_kb):
+            if isinstance(search_results, BaseException):
+                logger.error(f"知识库检索失败 ({kb.id}): {search_results}")
+                continue
+            for item in search_results:
+                hit = {
+                    "knowledge_base_id": str(kb.id),
+                    "knowledge_base_name": kb.name,
+                    "content": item.get("content", ""),
+                    "score": float(item.get("distance", 0.0)) if item.get("distance") is not None else None,
+                    "metadata": item.get("metadata", {})
+                }
+                knowledge_hits.append(hit)
+        if knowledge_hits:
+            context_blocks = []
+            for idx, hit in enumerate(knowledge_hits, start=1):
+                snippet = hit["content"]
+                kb_name = hit["knowledge_base_name"]
+                context_blocks.append(f"[来源 {idx} - {kb_name}]\n{snippet}")
+            knowledge_context = "\n\n".join(context_blocks)
+
+    # 5. 调用LLM服务生成回复
+    base_system_prompt = conversation.system_prompt or assistant_config.system_prompt or "你是一个有帮助的AI助手。"
+    if knowledge_context:
+        system_prompt = (
+            f"{base_system_prompt}\n\n"
+            f"以下是与用户问题相关的知识库内容，请优先基于这些资料回答：\n"
+            f"{knowledge_context}\n\n"
+            "若资料不足以回答，请明确说明。"
+        )
+    else:
+        system_prompt = base_system_prompt
+    
+    if chat_request.stream:
+        # 先提交用户消息，助手消息在响应发送完毕后由后台任务落库
+        await db.commit()
+        parts: List[str] = []
+        
+        async def generate():
+            try:
+                llm_service = get_llm_service(llm_config)
+                stream = llm_service.chat_stream(llm_messages, system_prompt)
+                async for chunk in coalesce_chunks(stream):
+                    parts.append(chunk)
+                    yield DATA_PREFIX + orjson.dumps({"content": chunk}) + SSE_SEP
+            except Exception as e:
+                logger.error(f"LLM调用失败: {e}")
+                error_content = _LLM_ERROR_TEMPLATE.format(error=str(e))
+                parts.append(error_content)
+                yield DATA_PREFIX + orjson.dumps({"content": error_content}) + SSE_SEP
+            
+            yield DONE_EVENT
+        
+        return StreamingResponse(
+            generate(),
+            media_type="text/event-stream",
+            background=BackgroundTask(
+                _save_streamed_reply, conv_uuid, parts, conversation.model, knowledge_hits
             )
-        else:
-            system_prompt = base_system_prompt
+        )
+    
+    try:
+        llm_service = get_llm_service(llm_config)
         response_content = await llm_service.chat(llm_messages, system_prompt)
     except Exception as e:
         logger.error(f"LLM调用失败: {e}")
         # 如果LLM调用失败，返回错误提示
-        response_content = f"抱歉，LLM调用失败：{str(e)}\n\n请检查：\n1. API密钥是否正确\n2. 网络连接是否正常\n3. LLM服务是否可用"
+        response_content = _LLM_ERROR_TEMPLATE.format(error=str(e))
 
-    # 7. 保存助手消息
-    assistant_message = Message(
-        conversation_id=conv_uuid,
-        role="assistant",
-        content=response_content,
-        tokens=len(response_content),  # 简化计算
-        msg_metadata={
-            "knowledge_hits": knowledge_hits,
-            "used_knowledge": bool(knowledge_hits)
-        } if knowledge_hits else None
-    )
-    db.add(assistant_message)
+    # 6. 保存助手消息
+    db.add(_build_assistant_message(conv_uuid, response_content, conversation.model, knowledge_hits))
     await db.commit()
-    await db.refresh(assistant_message)
     
     return {"role": "assistant", "content": response_content}
@@ -2,15 +2,19 @@
 数据源管理API
 """
 from typing import List, Any
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update, func
 from pydantic import BaseModel
+from loguru import logger
+from datetime import datetime, timedelta, timezone
+import asyncio
 import uuid
 
-from app.core.database import get_db
+from app.core.database import get_db, async_session_maker
 from app.core.security import get_current_user
 from app.models.datasource import DataSource, DataSourceType
+from app.models.assistant_config import AssistantConfig
 from app.services.datasource import (
     LocalFileDataSource,
     DatabaseDataSource,
@@ -20,6 +24,9 @@ from app.services.datasource import (
 
 router = APIRouter()
 
+# 同步状态停留在 running 超过该时长视为中断（如 worker 重启），允许重新发起同步
+_SYNC_STALE_AFTER = timedelta(minutes=30)
+
 
 class DataSourceCreate(BaseModel):
     """数据源创建模型"""
@@ -65,7 +72,7 @@ async def create_datasource(
     
     # 创建数据源
     datasource = DataSource(
-        user_id=uuid.UUID(current_user["user_id"]),
+        user_id=current_user["user_uuid"],
         name=datasource_data.name,
         description=datasource_data.description,
         type=datasource_data.type,
@@ -91,7 +98,7 @@ async def list_datasources(
     """获取数据源列表"""
     
     result = await db.execute(
-        select(DataSource).where(DataSource.user_id == uuid.UUID(current_user["user_id"]))
+        select(DataSource).where(DataSource.user_id == current_user["user_uuid"])
     )
     datasources = result.scalars().all()
     
@@ -109,7 +116,7 @@ async def get_datasource(
     result = await db.execute(
         select(DataSource).where(
             DataSource.id == uuid.UUID(datasource_id),
-            DataSource.user_id == uuid.UUID(current_user["user_id"])
+            DataSource.user_id == current_user["user_uuid"]
         )
     )
     datasource = result.scalar_one_or_none()
@@ -134,7 +141,7 @@ async def delete_datasource(
     result = await db.execute(
         select(DataSource).where(
             DataSource.id == uuid.UUID(datasource_id),
-            DataSource.user_id == uuid.UUID(current_user["user_id"])
+            DataSource.user_id == current_user["user_uuid"]
         )
     )
     datasource = result.scalar_one_or_none()
@@ -145,24 +152,34 @@ async def delete_datasource(
             detail="数据源不存在"
         )
     
+    # 从引用它的助手中移除该ID（@> 走 datasource_ids 上的 GIN 索引）
+    await db.execute(
+        update(AssistantConfig)
+        .where(
+            AssistantConfig.user_id == current_user["user_uuid"],
+            AssistantConfig.datasource_ids.contains([datasource.id])
+        )
+        .values(datasource_ids=func.array_remove(AssistantConfig.datasource_ids, datasource.id))
+    )
     await db.delete(datasource)
     await db.commit()
     
     return {"message": "数据源已删除"}
 
 
-@router.post("/{datasource_id}/sync")
+@router.post("/{datasource_id}/sync", status_code=status.HTTP_202_ACCEPTED)
 async def sync_datasource(
     datasource_id: str,
+    background_tasks: BackgroundTasks,
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ) -> Any:
-    """同步数据源"""
+    """同步数据源（后台执行，立即返回，可通过查询数据源的 sync_status 获取进度）"""
     
     result = await db.execute(
         select(DataSource).where(
             DataSource.id == uuid.UUID(datasource_id),
-            DataSource.user_id == uuid.UUID(current_user["user_id"])
+            DataSource.user_id == current_user["user_uuid"]
         )
     )
     datasource = result.scalar_one_or_none()
@@ -173,34 +190,83 @@ async def sync_datasource(
             detail="数据源不存在"
         )
     
-    # 执行同步（这里应该使用异步任务队列）
-    try:
-        # 根据类型创建数据源实例
-        ds_instance = _create_datasource_instance(datasource.type, datasource.config)
-        
-        # 获取数据
-        documents = await ds_instance.fetch_data()
-        
-        # 更新状态
-        datasource.sync_status = "success"
-        datasource.total_documents = len(documents)
-        
-        await db.commit()
-        
-        return {
-            "message": "数据源同步成功",
-            "total_documents": len(documents)
-        }
-        
-    except Exception as e:
-        datasource.sync_status = "failed"
-        datasource.sync_error = str(e)
-        await db.commit()
-        
+    if (
+        datasource.sync_status == "running"
+        and datasource.updated_at > datetime.now(timezone.utc) - _SYNC_STALE_AFTER
+    ):
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"数据源同步失败: {str(e)}"
+            status_code=status.HTTP_409_CONFLICT,
+            detail="数据源正在同步中"
         )
+    
+    datasource.sync_status = "running"
+    datasource.sync_error = None
+    # 后台任务在响应发送后执行，需先提交状态，避免与后台会话的更新冲突
+    await db.commit()
+    
+    background_tasks.add_task(_run_datasource_sync, datasource.id)
+    
+    return {
+        "message": "数据源同步已开始",
+        "datasource_id": str(datasource.id),
+        "sync_status": "running"
+    }
+
+
+async def _run_datasource_sync(datasource_id: uuid.UUID) -> None:
+    """
+    在后台拉取数据源数据并更新同步状态（使用独立会话，请求会话此时可能已关闭）
+    
+    任何异常（包括取得会话、提交失败与任务被取消）都会写入 failed 状态，保证状态不会停留在 running。
+    """
+    try:
+        async with async_session_maker() as session:
+            datasource = await session.get(DataSource, datasource_id)
+            if datasource is None:
+                return
+            
+            try:
+                # 根据类型创建数据源实例
+                ds_instance = _create_datasource_instance(datasource.type, datasource.config)
+                
+                # 获取数据，结束后释放数据源持有的连接
+                try:
+                    documents = await ds_instance.fetch_data()
+                finally:
+                    await ds_instance.disconnect()
+                
+                datasource.sync_status = "success"
+                datasource.total_documents = len(documents)
+                datasource.last_sync_at = func.now()
+            except Exception as e:
+                logger.error(f"数据源同步失败 {datasource_id}: {e}")
+                datasource.sync_status = "failed"
+                datasource.sync_error = str(e)
+            
+            await session.commit()
+    except asyncio.CancelledError:
+        await _mark_sync_failed(datasource_id, "同步被中断")
+        raise
+    except Exception as e:
+        logger.error(f"数据源同步失败 {datasource_id}: {e}")
+        await _mark_sync_failed(datasource_id, str(e))
+
+
+async def _mark_sync_failed(datasource_id: uuid.UUID, error: str) -> None:
+    """用新会话把仍处于 running 的同步状态置为 failed"""
+    try:
+        async with async_session_maker() as session:
+            await session.execute(
+                update(DataSource)
+                .where(
+                    DataSource.id == datasource_id,
+                    DataSource.sync_status == "running"
+                )
+                .values(sync_status="failed", sync_error=error)
+            )
+            await session.commit()
+    except Exception as e:
+        logger.error(f"写入数据源同步失败状态失败 {datasource_id}: {e}")
 
 
 async def _validate_datasource_config(ds_type: DataSourceType, config: dict) -> bool:
@@ -213,16 +279,19 @@ async def _validate_datasource_config(ds_type: DataSourceType, config: dict) ->
         return False
 
 
-def _create_datasource_instance(ds_type: DataSourceType, config: dict):
-    """创建数据源实例"""
-    if ds_type == DataSourceType.LOCAL_FILE:
-        return LocalFileDataSource(config)
-    elif ds_type == DataSourceType.DATABASE:
-        return DatabaseDataSource(config)
-    elif ds_type == DataSourceType.API:
-        return APIDataSource(config)
-    elif ds_type == DataSourceType.WEB_CRAWLER:
-        return WebCrawlerDataSource(config)
-    else:
+# 数据源类型与实现类的映射
+_DATASOURCE_CLASSES = {
+    DataSourceType.LOCAL_FILE: LocalFileDataSource,
+    DataSourceType.DATABASE: DatabaseDataSource,
+    DataSourceType.API: APIDataSource,
+    DataSourceType.WEB_CRAWLER: WebCrawlerDataSource,
+}
+
+
+def _create_datasource_instance(ds_type: str, config: dict):
+    """创建数据源实例（ds_type 为数据库中存储的类型取值）"""
+    ds_class = _DATASOURCE_CLASSES.get(DataSourceType(ds_type))
+    if ds_class is None:
         raise ValueError(f"不支持的数据源类型: {ds_type}")
+    return ds_class(config)
 
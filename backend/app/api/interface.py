@@ -4,17 +4,21 @@
 from typing import List, Any
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update, func
 from pydantic import BaseModel
 import uuid
 
 from app.core.database import get_db
 from app.core.security import get_current_user
 from app.models.interface import CustomInterface, InterfaceType
+from app.models.assistant_config import AssistantConfig
 from app.services.interface import InterfaceExecutor
 
 router = APIRouter()
 
+# 接口执行器无状态，进程内共享一个实例
+_EXECUTOR = InterfaceExecutor()
+
 
 class InterfaceCreate(BaseModel):
     """接口创建模型"""
@@ -53,7 +57,7 @@ async def create_interface(
     
     # 创建接口
     interface = CustomInterface(
-        user_id=uuid.UUID(current_user["user_id"]),
+        user_id=current_user["user_uuid"],
         name=interface_data.name,
         description=interface_data.description,
         type=interface_data.type,
@@ -78,7 +82,7 @@ async def list_interfaces(
     
     result = await db.execute(
         select(CustomInterface).where(
-            CustomInterface.user_id == uuid.UUID(current_user["user_id"])
+            CustomInterface.user_id == current_user["user_uuid"]
         )
     )
     interfaces = result.scalars().all()
@@ -97,7 +101,7 @@ async def get_interface(
     result = await db.execute(
         select(CustomInterface).where(
             CustomInterface.id == uuid.UUID(interface_id),
-            CustomInterface.user_id == uuid.UUID(current_user["user_id"])
+            CustomInterface.user_id == current_user["user_uuid"]
         )
     )
     interface = result.scalar_one_or_none()
@@ -122,7 +126,7 @@ async def delete_interface(
     result = await db.execute(
         select(CustomInterface).where(
             CustomInterface.id == uuid.UUID(interface_id),
-            CustomInterface.user_id == uuid.UUID(current_user["user_id"])
+            CustomInterface.user_id == current_user["user_uuid"]
         )
     )
     interface = result.scalar_one_or_none()
@@ -133,6 +137,15 @@ async def delete_interface(
             detail="接口不存在"
         )
     
+    # 从引用它的助手中移除该ID（@> 走 interface_ids 上的 GIN 索引）
+    await db.execute(
+        update(AssistantConfig)
+        .where(
+            AssistantConfig.user_id == current_user["user_uuid"],
+            AssistantConfig.interface_ids.contains([interface.id])
+        )
+        .values(interface_ids=func.array_remove(AssistantConfig.interface_ids, interface.id))
+    )
     await db.delete(interface)
     await db.commit()
     
@@ -151,7 +164,7 @@ async def execute_interface(
     result = await db.execute(
         select(CustomInterface).where(
             CustomInterface.id == uuid.UUID(interface_id),
-            CustomInterface.user_id == uuid.UUID(current_user["user_id"])
+            CustomInterface.user_id == current_user["user_uuid"]
         )
     )
     interface = result.scalar_one_or_none()
@@ -163,10 +176,10 @@ async def execute_interface(
         )
     
     # 执行接口
-    executor = InterfaceExecutor()
+    executor = _EXECUTOR
     
     config = {
-        "type": interface.type.value,
+        "type": interface.type,
         "url": interface.config.get("url"),
         "method": interface.config.get("method"),
         "headers": interface.config.get("headers"),
@@ -178,8 +191,7 @@ async def execute_interface(
     
     # 更新执行统计
     interface.execution_count += 1
-    from datetime import datetime
-    interface.last_executed_at = datetime.utcnow()
+    interface.last_executed_at = func.now()
     await db.commit()
     
     return result
@@ -3,22 +3,34 @@
 """
 from typing import List, Any
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, insert, delete, exists
 from pydantic import BaseModel
+from operator import itemgetter
+import aiofiles
+import asyncio
 import uuid
 import os
 
 from app.core.database import get_db
 from app.core.security import get_current_user
 from app.core.config import settings
+from app.core.ids import uuid7
 from app.models.knowledge import KnowledgeBase, Document, DocumentChunk
 from app.models.assistant_config import AssistantConfig
-from app.services.knowledge import VectorStore, TextSplitterService
+from app.services.knowledge import VectorStore, get_vectorstore, drop_collection, TextSplitterService
 from app.utils.file_parser import FileParser
+from app.utils.cache import knowledge_base_cache
 
 router = APIRouter()
 
+# 上传文件每次读取的字节数
+_UPLOAD_READ_SIZE = 1 << 20
+
+# 删除知识库被拒绝时，错误信息中最多列出的引用助手数量
+_REFERENCING_ASSISTANT_NAMES_LIMIT = 5
+
 
 class KnowledgeBaseCreate(BaseModel):
     """知识库创建模型"""
@@ -53,7 +65,32 @@ class SearchResult(BaseModel):
     distance: float
 
 
-@router.post("", response_model=KnowledgeBaseResponse)
+# 列表接口只查询响应需要的列，跳过ORM实例化
+_KNOWLEDGE_BASE_LIST_COLUMNS = (
+    KnowledgeBase.id,
+    KnowledgeBase.name,
+    KnowledgeBase.description,
+    KnowledgeBase.embedding_model,
+    KnowledgeBase.total_documents,
+    KnowledgeBase.total_chunks,
+    KnowledgeBase.is_active,
+)
+
+
+def _knowledge_base_to_dict(kb) -> dict:
+    """将知识库ORM对象或查询行转换为响应字典"""
+    return {
+        "id": str(kb.id),
+        "name": kb.name,
+        "description": kb.description or "",
+        "embedding_model": kb.embedding_model,
+        "total_documents": kb.total_documents,
+        "total_chunks": kb.total_chunks,
+        "is_active": kb.is_active,
+    }
+
+
+@router.post("", responses={200: {"model": KnowledgeBaseResponse}})
 async def create_knowledge_base(
     kb_data: KnowledgeBaseCreate,
     current_user: dict = Depends(get_current_user),
@@ -66,7 +103,7 @@ async def create_knowledge_base(
     
     # 创建知识库
     kb = KnowledgeBase(
-        user_id=uuid.UUID(current_user["user_id"]),
+        user_id=current_user["user_uuid"],
         name=kb_data.name,
         description=kb_data.description,
         embedding_model=kb_data.embedding_model,
@@ -80,20 +117,13 @@ async def create_knowledge_base(
     await db.refresh(kb)
     
     # 初始化向量存储
-    vectorstore = VectorStore(collection_name, kb_data.embedding_model)
+    vectorstore = get_vectorstore(collection_name, kb_data.embedding_model)
     
-    return KnowledgeBaseResponse(
-        id=str(kb.id),
-        name=kb.name,
-        description=kb.description or "",
-        embedding_model=kb.embedding_model,
-        total_documents=kb.total_documents,
-        total_chunks=kb.total_chunks,
-        is_active=kb.is_active,
-    )
+    return ORJSONResponse(_knowledge_base_to_dict(kb))
 
 
-@router.get("", response_model=List[KnowledgeBaseResponse])
+# 列表接口不声明 response_model，避免逐行校验；仅通过 responses 保留 OpenAPI 文档
+@router.get("", responses={200: {"model": List[KnowledgeBaseResponse]}})
 async def list_knowledge_bases(
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
@@ -101,27 +131,15 @@ async def list_knowledge_bases(
     """获取知识库列表"""
     
     result = await db.execute(
-        select(KnowledgeBase).where(
-            KnowledgeBase.user_id == uuid.UUID(current_user["user_id"])
+        select(*_KNOWLEDGE_BASE_LIST_COLUMNS).where(
+            KnowledgeBase.user_id == current_user["user_uuid"]
         )
     )
-    knowledge_bases = result.scalars().all()
     
-    return [
-        KnowledgeBaseResponse(
-            id=str(kb.id),
-            name=kb.name,
-            description=kb.description or "",
-            embedding_model=kb.embedding_model,
-            total_documents=kb.total_documents,
-            total_chunks=kb.total_chunks,
-            is_active=kb.is_active,
-        )
-        for kb in knowledge_bases
-    ]
+    return ORJSONResponse([_knowledge_base_to_dict(row) for row in result])
 
 
-@router.get("/{kb_id}", response_model=KnowledgeBaseResponse)
+@router.get("/{kb_id}", responses={200: {"model": KnowledgeBaseResponse}})
 async def get_knowledge_base(
     kb_id: str,
     current_user: dict = Depends(get_current_user),
@@ -132,7 +150,7 @@ async def get_knowledge_base(
     result = await db.execute(
         select(KnowledgeBase).where(
             KnowledgeBase.id == uuid.UUID(kb_id),
-            KnowledgeBase.user_id == uuid.UUID(current_user["user_id"])
+            KnowledgeBase.user_id == current_user["user_uuid"]
         )
     )
     kb = result.scalar_one_or_none()
@@ -143,15 +161,7 @@ async def get_knowledge_base(
             detail="知识库不存在"
         )
     
-    return KnowledgeBaseResponse(
-        id=str(kb.id),
-        name=kb.name,
-        description=kb.description or "",
-        embedding_model=kb.embedding_model,
-        total_documents=kb.total_documents,
-        total_chunks=kb.total_chunks,
-        is_active=kb.is_active,
-    )
+    return ORJSONResponse(_knowledge_base_to_dict(kb))
 
 
 @router.delete("/{kb_id}")
@@ -161,42 +171,49 @@ async def delete_knowledge_base(
     db: AsyncSession = Depends(get_db)
 ) -> Any:
     """删除知识库"""
+    kb_uuid = uuid.UUID(kb_id)
     
+    # 单条 DELETE 完成归属校验、引用检查与删除（仍被助手引用时不删除）
     result = await db.execute(
-        select(KnowledgeBase).where(
-            KnowledgeBase.id == uuid.UUID(kb_id),
-            KnowledgeBase.user_id == uuid.UUID(current_user["user_id"])
+        delete(KnowledgeBase)
+        .where(
+            KnowledgeBase.id == kb_uuid,
+            KnowledgeBase.user_id == current_user["user_uuid"],
+            ~exists().where(AssistantConfig.knowledge_base_ids.contains([kb_uuid]))
         )
+        .returning(KnowledgeBase.collection_name)
     )
-    kb = result.scalar_one_or_none()
+    collection_name = result.scalar_one_or_none()
     
-    if not kb:
+    if collection_name is None:
+        # 未删除时再区分原因：知识库不存在，或仍被助手引用（只查询少量助手名称用于提示）
+        ref_result = await db.execute(
+            select(AssistantConfig.name)
+            .where(
+                AssistantConfig.knowledge_base_ids.contains([kb_uuid]),
+                exists().where(
+                    KnowledgeBase.id == kb_uuid,
+                    KnowledgeBase.user_id == current_user["user_uuid"]
+                )
+            )
+            .limit(_REFERENCING_ASSISTANT_NAMES_LIMIT)
+        )
+        assistant_names = ref_result.scalars().all()
+        if assistant_names:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"知识库仍被以下助手引用：{', '.join(assistant_names)}。请先在助手配置中移除该知识库。"
+            )
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="知识库不存在"
         )
     
-    # 检查是否有助手正在引用该知识库
-    ref_result = await db.execute(
-        select(AssistantConfig).where(
-            AssistantConfig.knowledge_base_ids.any(kb.id)
-        )
-    )
-    referencing_assistants = ref_result.scalars().all()
-    if referencing_assistants:
-        assistant_names = [assistant.name for assistant in referencing_assistants]
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"知识库仍被以下助手引用：{', '.join(assistant_names)}。请先在助手配置中移除该知识库。"
-        )
-    
-    # 删除向量存储
-    vectorstore = VectorStore(kb.collection_name, kb.embedding_model)
-    await vectorstore.delete_collection()
-    
-    # 删除数据库记录
-    await db.delete(kb)
     await db.commit()
+    knowledge_base_cache.pop(kb_uuid)
+    
+    # 数据库记录删除成功后再删除向量存储
+    drop_collection(collection_name)
     
     return {"message": "知识库已删除"}
 
@@ -214,7 +231,7 @@ async def upload_document(
     result = await db.execute(
         select(KnowledgeBase).where(
             KnowledgeBase.id == uuid.UUID(kb_id),
-            KnowledgeBase.user_id == uuid.UUID(current_user["user_id"])
+            KnowledgeBase.user_id == current_user["user_uuid"]
         )
     )
     kb = result.scalar_one_or_none()
@@ -232,9 +249,12 @@ async def upload_document(
         
         file_path = os.path.join(upload_dir, f"{uuid.uuid4().hex}_{file.filename}")
         
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+        # 分块流式写入磁盘，避免整个文件驻留内存并阻塞事件循环
+        file_size = 0
+        async with aiofiles.open(file_path, "wb") as f:
+            while chunk := await file.read(_UPLOAD_READ_SIZE):
+                await f.write(chunk)
+                file_size += len(chunk)
         
         # 解析文件
         parser = FileParser()
@@ -253,7 +273,7 @@ async def upload_document(
             content=text_content,
             file_path=file_path,
             file_type=os.path.splitext(file.filename)[1],
-            file_size=len(content),
+            file_size=file_size,
         )
         
         db.add(doc)
@@ -275,20 +295,9 @@ async def upload_document(
                 }
             })
         
-        # 添加到向量存储
-        vectorstore = VectorStore(kb.collection_name, kb.embedding_model)
-        vector_ids = await vectorstore.add_documents(documents)
-        
-        # 创建切片记录
-        for i, vector_id in enumerate(vector_ids):
-            chunk = DocumentChunk(
-                document_id=doc.id,
-                knowledge_base_id=kb.id,
-                content=chunks[i],
-                chunk_index=i,
-                vector_id=vector_id,
-            )
-            db.add(chunk)
+        # 向量化并写入切片记录（两者流水线重叠进行）
+        vectorstore = get_vectorstore(kb.collection_name, kb.embedding_model)
+        await _embed_and_store_chunks(db, vectorstore, doc.id, kb.id, documents)
         
         # 更新统计
         doc.chunk_count = len(chunks)
@@ -312,6 +321,114 @@ async def upload_document(
         )
 
 
+# 切片数量达到该值时改用 COPY 批量写入
+_CHUNK_COPY_THRESHOLD = 100
+
+
+async def _bulk_insert_chunks(db: AsyncSession, rows: List[dict]) -> None:
+    """
+    批量写入文档切片记录（数量较多且驱动为 asyncpg 时使用 COPY，否则使用 executemany）
+    
+    Args:
+        db: 数据库会话
+        rows: 切片记录列表，需包含 DocumentChunk 除 created_at 外的全部列
+              （COPY 不会应用模型的 Python 端默认值，created_at 使用数据库默认值）
+    """
+    if not rows:
+        return
+    
+    conn = await db.connection()
+    if len(rows) < _CHUNK_COPY_THRESHOLD or conn.dialect.driver != "asyncpg":
+        await db.execute(insert(DocumentChunk), rows)
+        return
+    
+    columns = list(rows[0].keys())
+    # itemgetter 在 C 层按列顺序取值组成元组，避免逐行执行生成器表达式
+    to_record = itemgetter(*columns)
+    raw_conn = await conn.get_raw_connection()
+    await raw_conn.driver_connection.copy_records_to_table(
+        DocumentChunk.__tablename__,
+        records=[to_record(row) for row in rows],
+        columns=columns
+    )
+
+
+async def _embed_and_store_chunks(
+    db: AsyncSession,
+    vectorstore: VectorStore,
+    document_id: uuid.UUID,
+    knowledge_base_id: uuid.UUID,
+    documents: List[dict],
+    batch_size: int = 64,
+    max_concurrency: int = 8
+) -> None:
+    """
+    按长度分桶、分批并发向量化文档切片，并在批次完成后随即写入切片记录
+    
+    向量化批次并发执行，数据库写入在当前协程中按完成顺序进行，
+    使等待嵌入接口与写库相互重叠；切片记录携带 chunk_index，不依赖写入顺序。
+    
+    Args:
+        db: 数据库会话
+        vectorstore: 向量存储实例
+        document_id: 文档ID
+        knowledge_base_id: 知识库ID
+        documents: 文档切片列表（下标即 chunk_index）
+        batch_size: 每批切片数量
+        max_concurrency: 同时进行的批次数上限
+    """
+    if not documents:
+        return
+    
+    # 按内容长度排序后再分批，使同一批次内切片长度相近，减少嵌入时的填充浪费
+    order = sorted(range(len(documents)), key=lambda i: len(documents[i]["content"]))
+    semaphore = asyncio.Semaphore(max_concurrency)
+    
+    async def _embed_batch(indices: List[int]):
+        async with semaphore:
+            vector_ids = await vectorstore.add_documents([documents[i] for i in indices])
+        return indices, vector_ids
+    
+    tasks = [
+        asyncio.ensure_future(_embed_batch(order[start:start + batch_size]))
+        for start in range(0, len(order), batch_size)
+    ]
+    
+    pending_rows: List[dict] = []
+    try:
+        for next_batch in asyncio.as_completed(tasks):
+            indices, vector_ids = await next_batch
+            pending_rows.extend(
+                {
+                    "id": uuid7(),
+                    "document_id": document_id,
+                    "knowledge_base_id": knowledge_base_id,
+                    "content": documents[i]["content"],
+                    "chunk_index": i,
+                    "vector_id": vector_id,
+                }
+                for i, vector_id in zip(indices, vector_ids)
+            )
+            # 攒够一批再写入，使大文档仍能走 COPY
+            if len(pending_rows) >= _CHUNK_COPY_THRESHOLD:
+                await _bulk_insert_chunks(db, pending_rows)
+                pending_rows = []
+        await _bulk_insert_chunks(db, pending_rows)
+    except Exception:
+        # 等待其余批次结束（执行器中的嵌入无法中途取消），
+        # 再清理已写入的向量，避免留下没有切片记录的孤立向量
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        written_ids = [
+            vector_id
+            for result in results
+            if not isinstance(result, BaseException)
+            for vector_id in result[1]
+        ]
+        if written_ids:
+            await vectorstore.delete_by_ids(written_ids)
+        raise
+
+
 @router.post("/{kb_id}/search", response_model=List[SearchResult])
 async def search_knowledge_base(
     kb_id: str,
@@ -325,7 +442,7 @@ async def search_knowledge_base(
     result = await db.execute(
         select(KnowledgeBase).where(
             KnowledgeBase.id == uuid.UUID(kb_id),
-            KnowledgeBase.user_id == uuid.UUID(current_user["user_id"])
+            KnowledgeBase.user_id == current_user["user_uuid"]
         )
     )
     kb = result.scalar_one_or_none()
@@ -337,8 +454,12 @@ async def search_knowledge_base(
         )
     
     # 搜索
-    vectorstore = VectorStore(kb.collection_name, kb.embedding_model)
-    results = await vectorstore.search(search_data.query, search_data.top_k)
+    vectorstore = get_vectorstore(kb.collection_name, kb.embedding_model)
+    results = await vectorstore.search(
+        search_data.query,
+        search_data.top_k,
+        cache_version=(kb.updated_at, kb.total_chunks)
+    )
     
     return results
 
@@ -2,11 +2,14 @@
 LLM配置管理API
 """
 from typing import List, Optional, Any
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
+from sqlalchemy import select, insert, update, delete, func
 from pydantic import BaseModel
+import hashlib
 import uuid
+import orjson
 
 from app.core.database import get_db
 from app.core.security import get_current_user
@@ -68,7 +71,66 @@ class LLMConfigResponse(BaseModel):
         protected_namespaces = ()
 
 
-@router.post("", response_model=LLMConfigResponse, status_code=status.HTTP_201_CREATED)
+# 提供商取值到枚举的映射，校验时直接查表
+_PROVIDER_MAP = {provider.value: provider for provider in LLMProvider}
+
+# 列表接口只查询响应需要的列，跳过ORM实例化
+_LLM_CONFIG_LIST_COLUMNS = (
+    LLMConfig.id,
+    LLMConfig.user_id,
+    LLMConfig.name,
+    LLMConfig.provider,
+    LLMConfig.model_name,
+    LLMConfig.api_base,
+    LLMConfig.config,
+    LLMConfig.temperature,
+    LLMConfig.max_tokens,
+    LLMConfig.is_default,
+    LLMConfig.is_active,
+    # 只在数据库端判断是否配置了密钥，不取回密钥密文
+    (func.coalesce(LLMConfig.api_key, "") != "").label("has_api_key"),
+)
+
+
+def _llm_config_to_dict(config, has_api_key: Optional[bool] = None) -> dict:
+    """
+    将LLM配置ORM对象或查询行转换为响应字典（不包含密钥）
+    
+    查询行不含 api_key 列，需传入查询得到的 has_api_key；ORM对象则由 api_key 判断。
+    """
+    return {
+        "id": str(config.id),
+        "user_id": str(config.user_id),
+        "name": config.name,
+        "provider": config.provider,
+        "model_name": config.model_name,
+        "api_base": config.api_base,
+        "config": config.config,
+        "temperature": config.temperature,
+        "max_tokens": config.max_tokens,
+        "is_default": config.is_default,
+        "is_active": config.is_active,
+        "has_api_key": bool(config.api_key) if has_api_key is None else has_api_key,
+    }
+
+
+def _unset_default_cte(user_uuid: uuid.UUID, exclude_id: Optional[uuid.UUID] = None):
+    """构造取消用户其他默认配置的 UPDATE CTE，附加到写入语句上随之一次执行"""
+    stmt = (
+        update(LLMConfig)
+        .where(LLMConfig.user_id == user_uuid)
+        .where(LLMConfig.is_default == True)
+    )
+    if exclude_id is not None:
+        stmt = stmt.where(LLMConfig.id != exclude_id)
+    return stmt.values(is_default=False).cte("unset_default")
+
+
+@router.post(
+    "",
+    status_code=status.HTTP_201_CREATED,
+    responses={201: {"model": LLMConfigResponse}}
+)
 async def create_llm_config(
     config_data: LLMConfigCreate,
     current_user: dict = Depends(get_current_user),
@@ -76,31 +138,21 @@ async def create_llm_config(
 ) -> Any:
     """创建LLM配置"""
     # 验证provider
-    try:
-        provider_enum = LLMProvider(config_data.provider)
-    except ValueError:
+    provider_enum = _PROVIDER_MAP.get(config_data.provider)
+    if provider_enum is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"不支持的提供商: {config_data.provider}"
         )
     
-    # 如果设置为默认，先取消其他默认配置
-    if config_data.is_default:
-        await db.execute(
-            update(LLMConfig)
-            .where(LLMConfig.user_id == uuid.UUID(current_user["user_id"]))
-            .where(LLMConfig.is_default == True)
-            .values(is_default=False)
-        )
-    
     # 加密API密钥
     encrypted_key = encrypt_text(config_data.api_key) if config_data.api_key else None
     
-    # 创建配置
-    llm_config = LLMConfig(
-        user_id=uuid.UUID(current_user["user_id"]),
+    # 创建配置，通过 RETURNING 直接取回新行；设为默认时在同一条语句中取消其他默认配置
+    stmt = insert(LLMConfig).values(
+        user_id=current_user["user_uuid"],
         name=config_data.name,
-        provider=provider_enum,
+        provider=provider_enum.value,
         model_name=config_data.model_name,
         api_key=encrypted_key,
         api_base=config_data.api_base,
@@ -108,61 +160,37 @@ async def create_llm_config(
         temperature=config_data.temperature,
         max_tokens=config_data.max_tokens,
         is_default=config_data.is_default
-    )
+    ).returning(LLMConfig)
+    if config_data.is_default:
+        stmt = stmt.add_cte(_unset_default_cte(current_user["user_uuid"]))
     
-    db.add(llm_config)
+    result = await db.execute(stmt)
+    llm_config = result.scalar_one()
     await db.commit()
-    await db.refresh(llm_config)
     
-    return LLMConfigResponse(
-        id=str(llm_config.id),
-        user_id=str(llm_config.user_id),
-        name=llm_config.name,
-        provider=llm_config.provider.value,
-        model_name=llm_config.model_name,
-        api_base=llm_config.api_base,
-        config=llm_config.config,
-        temperature=llm_config.temperature,
-        max_tokens=llm_config.max_tokens,
-        is_default=llm_config.is_default,
-        is_active=llm_config.is_active,
-        has_api_key=bool(llm_config.api_key)
+    return ORJSONResponse(
+        _llm_config_to_dict(llm_config),
+        status_code=status.HTTP_201_CREATED
     )
 
 
-@router.get("", response_model=List[LLMConfigResponse])
+# 列表接口不声明 response_model，避免逐行校验；仅通过 responses 保留 OpenAPI 文档
+@router.get("", responses={200: {"model": List[LLMConfigResponse]}})
 async def get_llm_configs(
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ) -> Any:
     """获取当前用户的所有LLM配置"""
     result = await db.execute(
-        select(LLMConfig)
-        .where(LLMConfig.user_id == uuid.UUID(current_user["user_id"]))
+        select(*_LLM_CONFIG_LIST_COLUMNS)
+        .where(LLMConfig.user_id == current_user["user_uuid"])
         .order_by(LLMConfig.is_default.desc(), LLMConfig.created_at.desc())
     )
-    configs = result.scalars().all()
     
-    return [
-        LLMConfigResponse(
-            id=str(config.id),
-            user_id=str(config.user_id),
-            name=config.name,
-            provider=config.provider.value,
-            model_name=config.model_name,
-            api_base=config.api_base,
-            config=config.config,
-            temperature=config.temperature,
-            max_tokens=config.max_tokens,
-            is_default=config.is_default,
-            is_active=config.is_active,
-            has_api_key=bool(config.api_key)
-        )
-        for config in configs
-    ]
+    return ORJSONResponse([_llm_config_to_dict(row, row.has_api_key) for row in result])
 
 
-@router.get("/{config_id}", response_model=LLMConfigResponse)
+@router.get("/{config_id}", responses={200: {"model": LLMConfigResponse}})
 async def get_llm_config(
     config_id: str,
     current_user: dict = Depends(get_current_user),
@@ -172,7 +200,7 @@ async def get_llm_config(
     result = await db.execute(
         select(LLMConfig).where(
             LLMConfig.id == uuid.UUID(config_id),
-            LLMConfig.user_id == uuid.UUID(current_user["user_id"])
+            LLMConfig.user_id == current_user["user_uuid"]
         )
     )
     config = result.scalar_one_or_none()
@@ -183,23 +211,10 @@ async def get_llm_config(
             detail="配置不存在"
         )
     
-    return LLMConfigResponse(
-        id=str(config.id),
-        user_id=str(config.user_id),
-        name=config.name,
-        provider=config.provider.value,
-        model_name=config.model_name,
-        api_base=config.api_base,
-        config=config.config,
-        temperature=config.temperature,
-        max_tokens=config.max_tokens,
-        is_default=config.is_default,
-        is_active=config.is_active,
-        has_api_key=bool(config.api_key)
-    )
+    return ORJSONResponse(_llm_config_to_dict(config))
 
 
-@router.put("/{config_id}", response_model=LLMConfigResponse)
+@router.put("/{config_id}", responses={200: {"model": LLMConfigResponse}})
 async def update_llm_config(
     config_id: str,
     update_data: LLMConfigUpdate,
@@ -207,12 +222,33 @@ async def update_llm_config(
     db: AsyncSession = Depends(get_db)
 ) -> Any:
     """更新LLM配置"""
-    result = await db.execute(
-        select(LLMConfig).where(
-            LLMConfig.id == uuid.UUID(config_id),
-            LLMConfig.user_id == uuid.UUID(current_user["user_id"])
-        )
+    config_uuid = uuid.UUID(config_id)
+    
+    # 更新字段
+    update_dict = update_data.model_dump(exclude_unset=True)
+    
+    # 如果更新API密钥，需要加密
+    if "api_key" in update_dict and update_dict["api_key"]:
+        update_dict["api_key"] = encrypt_text(update_dict["api_key"])
+    
+    where_clause = (
+        LLMConfig.id == config_uuid,
+        LLMConfig.user_id == current_user["user_uuid"],
     )
+    if update_dict:
+        # 单条 UPDATE ... RETURNING 完成归属校验、更新与取回；
+        # 设为默认时在同一条语句中取消其他默认配置
+        stmt = (
+            update(LLMConfig)
+            .where(*where_clause)
+            .values(**update_dict)
+            .returning(LLMConfig)
+        )
+        if update_data.is_default:
+            stmt = stmt.add_cte(_unset_default_cte(current_user["user_uuid"], config_uuid))
+        result = await db.execute(stmt)
+    else:
+        result = await db.execute(select(LLMConfig).where(*where_clause))
     config = result.scalar_one_or_none()
     
     if not config:
@@ -221,43 +257,9 @@ async def update_llm_config(
             detail="配置不存在"
         )
     
-    # 如果设置为默认，先取消其他默认配置
-    if update_data.is_default:
-        await db.execute(
-            update(LLMConfig)
-            .where(LLMConfig.user_id == uuid.UUID(current_user["user_id"]))
-            .where(LLMConfig.id != uuid.UUID(config_id))
-            .where(LLMConfig.is_default == True)
-            .values(is_default=False)
-        )
-    
-    # 更新字段
-    update_dict = update_data.dict(exclude_unset=True)
-    
-    # 如果更新API密钥，需要加密
-    if "api_key" in update_dict and update_dict["api_key"]:
-        update_dict["api_key"] = encrypt_text(update_dict["api_key"])
-    
-    for key, value in update_dict.items():
-        setattr(config, key, value)
-    
     await db.commit()
-    await db.refresh(config)
     
-    return LLMConfigResponse(
-        id=str(config.id),
-        user_id=str(config.user_id),
-        name=config.name,
-        provider=config.provider.value,
-        model_name=config.model_name,
-        api_base=config.api_base,
-        config=config.config,
-        temperature=config.temperature,
-        max_tokens=config.max_tokens,
-        is_default=config.is_default,
-        is_active=config.is_active,
-        has_api_key=bool(config.api_key)
-    )
+    return ORJSONResponse(_llm_config_to_dict(config))
 
 
 @router.delete("/{config_id}")
@@ -267,153 +269,168 @@ async def delete_llm_config(
     db: AsyncSession = Depends(get_db)
 ) -> Any:
     """删除LLM配置"""
+    # 单条 DELETE 完成归属校验与删除
     result = await db.execute(
-        select(LLMConfig).where(
+        delete(LLMConfig).where(
             LLMConfig.id == uuid.UUID(config_id),
-            LLMConfig.user_id == uuid.UUID(current_user["user_id"])
+            LLMConfig.user_id == current_user["user_uuid"]
         )
     )
-    config = result.scalar_one_or_none()
     
-    if not config:
+    if result.rowcount == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="配置不存在"
         )
     
-    await db.delete(config)
     await db.commit()
     
     return {"message": "删除成功"}
 
 
+# 支持的LLM提供商列表（静态数据，模块加载时序列化一次）
+_PROVIDERS = [
+    {
+        "value": "openai",
+        "label": "OpenAI (GPT-3.5/4)",
+        "models": [
+            "gpt-4o",
+            "gpt-4o-mini", 
+            "gpt-4-turbo",
+            "gpt-4-turbo-preview",
+            "gpt-4",
+            "gpt-4-32k",
+            "gpt-3.5-turbo",
+            "gpt-3.5-turbo-16k",
+            "o1-preview",
+            "o1-mini"
+        ],
+        "default_base": "https://api.openai.com/v1"
+    },
+    {
+        "value": "azure_openai",
+        "label": "Azure OpenAI",
+        "models": ["gpt-35-turbo", "gpt-4", "gpt-4-32k"],
+        "default_base": ""
+    },
+    {
+        "value": "deepseek",
+        "label": "DeepSeek",
+        "models": [
+            "deepseek-chat",
+            "deepseek-coder",
+            "deepseek-reasoner"
+        ],
+        "default_base": "https://api.deepseek.com/v1"
+    },
+    {
+        "value": "alibaba_qwen",
+        "label": "阿里云通义千问",
+        "models": [
+            "qwen-max",
+            "qwen-max-longcontext",
+            "qwen-plus",
+            "qwen-turbo",
+            "qwen-vl-plus",
+            "qwen-vl-max"
+        ],
+        "default_base": "https://dashscope.aliyuncs.com/compatible-mode/v1"
+    },
+    {
+        "value": "zhipu_ai",
+        "label": "智谱AI (ChatGLM)",
+        "models": [
+            "glm-4-plus",
+            "glm-4-0520", 
+            "glm-4",
+            "glm-4-air",
+            "glm-4-airx",
+            "glm-4-flash",
+            "glm-3-turbo"
+        ],
+        "default_base": "https://open.bigmodel.cn/api/paas/v4"
+    },
+    {
+        "value": "baidu_wenxin",
+        "label": "百度文心一言",
+        "models": ["ernie-bot", "ernie-bot-turbo", "ernie-bot-4"],
+        "default_base": "https://aip.baidubce.com"
+    },
+    {
+        "value": "moonshot",
+        "label": "月之暗面 (Kimi)",
+        "models": ["moonshot-v1-8k", "moonshot-v1-32k", "moonshot-v1-128k"],
+        "default_base": "https://api.moonshot.cn/v1"
+    },
+    {
+        "value": "anthropic",
+        "label": "Anthropic (Claude)",
+        "models": [
+            "claude-3-5-sonnet-20241022",
+            "claude-3-5-sonnet-20240620",
+            "claude-3-5-haiku-20241022",
+            "claude-3-opus-20240229",
+            "claude-3-sonnet-20240229",
+            "claude-3-haiku-20240307"
+        ],
+        "default_base": "https://api.anthropic.com"
+    },
+    {
+        "value": "google_gemini",
+        "label": "Google Gemini",
+        "models": [
+            "gemini-2.0-flash-exp",
+            "gemini-1.5-pro",
+            "gemini-1.5-flash",
+            "gemini-1.5-flash-8b",
+            "gemini-pro",
+            "gemini-pro-vision"
+        ],
+        "default_base": "https://generativelanguage.googleapis.com/v1"
+    },
+    {
+        "value": "ollama",
+        "label": "Ollama (本地部署)",
+        "models": [
+            "llama3.3",
+            "llama3.2",
+            "llama3.1",
+            "llama2",
+            "mistral",
+            "mixtral",
+            "qwen2.5",
+            "qwen",
+            "codellama",
+            "deepseek-coder-v2",
+            "phi3",
+            "gemma2"
+        ],
+        "default_base": "http://localhost:11434"
+    },
+    {
+        "value": "custom",
+        "label": "自定义",
+        "models": [],
+        "default_base": ""
+    }
+]
+
+_PROVIDERS_JSON = orjson.dumps({"providers": _PROVIDERS})
+_PROVIDERS_ETAG = f'"{hashlib.md5(_PROVIDERS_JSON).hexdigest()}"'
+_PROVIDERS_HEADERS = {
+    "ETag": _PROVIDERS_ETAG,
+    "Cache-Control": "public, max-age=3600",
+}
+
+
 @router.get("/providers/list")
-async def get_providers():
+async def get_providers(request: Request):
     """获取支持的LLM提供商列表"""
-    providers = [
-        {
-            "value": "openai",
-            "label": "OpenAI (GPT-3.5/4)",
-            "models": [
-                "gpt-4o",
-                "gpt-4o-mini", 
-                "gpt-4-turbo",
-                "gpt-4-turbo-preview",
-                "gpt-4",
-                "gpt-4-32k",
-                "gpt-3.5-turbo",
-                "gpt-3.5-turbo-16k",
-                "o1-preview",
-                "o1-mini"
-            ],
-            "default_base": "https://api.openai.com/v1"
-        },
-        {
-            "value": "azure_openai",
-            "label": "Azure OpenAI",
-            "models": ["gpt-35-turbo", "gpt-4", "gpt-4-32k"],
-            "default_base": ""
-        },
-        {
-            "value": "deepseek",
-            "label": "DeepSeek",
-            "models": [
-                "deepseek-chat",
-                "deepseek-coder",
-                "deepseek-reasoner"
-            ],
-            "default_base": "https://api.deepseek.com/v1"
-        },
-        {
-            "value": "alibaba_qwen",
-            "label": "阿里云通义千问",
-            "models": [
-                "qwen-max",
-                "qwen-max-longcontext",
-                "qwen-plus",
-                "qwen-turbo",
-                "qwen-vl-plus",
-                "qwen-vl-max"
-            ],
-            "default_base": "https://dashscope.aliyuncs.com/compatible-mode/v1"
-        },
-        {
-            "value": "zhipu_ai",
-            "label": "智谱AI (ChatGLM)",
-            "models": [
-                "glm-4-plus",
-                "glm-4-0520", 
-                "glm-4",
-                "glm-4-air",
-                "glm-4-airx",
-                "glm-4-flash",
-                "glm-3-turbo"
-            ],
-            "default_base": "https://open.bigmodel.cn/api/paas/v4"
-        },
-        {
-            "value": "baidu_wenxin",
-            "label": "百度文心一言",
-            "models": ["ernie-bot", "ernie-bot-turbo", "ernie-bot-4"],
-            "default_base": "https://aip.baidubce.com"
-        },
-        {
-            "value": "moonshot",
-            "label": "月之暗面 (Kimi)",
-            "models": ["moonshot-v1-8k", "moonshot-v1-32k", "moonshot-v1-128k"],
-            "default_base": "https://api.moonshot.cn/v1"
-        },
-        {
-            "value": "anthropic",
-            "label": "Anthropic (Claude)",
-            "models": [
-                "claude-3-5-sonnet-20241022",
-                "claude-3-5-sonnet-20240620",
-                "claude-3-5-haiku-20241022",
-                "claude-3-opus-20240229",
-                "claude-3-sonnet-20240229",
-                "claude-3-haiku-20240307"
-            ],
-            "default_base": "https://api.anthropic.com"
-        },
-        {
-            "value": "google_gemini",
-            "label": "Google Gemini",
-            "models": [
-                "gemini-2.0-flash-exp",
-                "gemini-1.5-pro",
-                "gemini-1.5-flash",
-                "gemini-1.5-flash-8b",
-                "gemini-pro",
-                "gemini-pro-vision"
-            ],
-            "default_base": "https://generativelanguage.googleapis.com/v1"
-        },
-        {
-            "value": "ollama",
-            "label": "Ollama (本地部署)",
-            "models": [
-                "llama3.3",
-                "llama3.2",
-                "llama3.1",
-                "llama2",
-                "mistral",
-                "mixtral",
-                "qwen2.5",
-                "qwen",
-                "codellama",
-                "deepseek-coder-v2",
-                "phi3",
-                "gemma2"
-            ],
-            "default_base": "http://localhost:11434"
-        },
-        {
-            "value": "custom",
-            "label": "自定义",
-            "models": [],
-            "default_base": ""
-        }
-    ]
+    if request.headers.get("if-none-match") == _PROVIDERS_ETAG:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=_PROVIDERS_HEADERS)
     
-    return {"providers": providers}
+    return Response(
+        content=_PROVIDERS_JSON,
+        media_type="application/json",
+        headers=_PROVIDERS_HEADERS
+    )
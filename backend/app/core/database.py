@@ -8,15 +8,36 @@ from sqlalchemy.ext.asyncio import (
     async_sessionmaker,
 )
 from sqlalchemy.orm import declarative_base
-from sqlalchemy.pool import NullPool
+import orjson
 
 from app.core.config import settings
 
-# 创建异步引擎
+# asyncpg 连接参数：缓存频繁重复执行的预编译语句
+connect_args = {}
+if "asyncpg" in settings.DATABASE_URL:
+    connect_args["statement_cache_size"] = settings.DB_STATEMENT_CACHE_SIZE
+
+
+def _json_serializer(value) -> str:
+    """使用 orjson 序列化 JSON 列的值（驱动需要 str）"""
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+# 创建异步引擎（使用连接池复用连接，pre_ping 剔除失效连接）
 engine = create_async_engine(
     settings.DATABASE_URL,
-    echo=settings.DEBUG,
-    poolclass=NullPool,
+    connect_args=connect_args,
+    echo=settings.SQL_ECHO,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=True,
+    # 优先复用最近归还的连接，低峰期多余的空闲连接可按 pool_recycle 自然淘汰
+    pool_use_lifo=True,
+    # JSON/JSONB 列使用 orjson 序列化与反序列化
+    json_serializer=_json_serializer,
+    json_deserializer=orjson.loads,
     future=True,
 )
 
@@ -29,16 +50,22 @@ async_session_maker = async_sessionmaker(
     autoflush=False,
 )
 
+class _ModelBase:
+    """所有模型的公共映射配置"""
+    # 时间列由数据库生成（server_default / onupdate=func.now()），
+    # INSERT/UPDATE 时通过 RETURNING 一并取回，提交后访问无需再查询（异步会话下也不会触发懒加载）
+    __mapper_args__ = {"eager_defaults": True}
+
+
 # 创建Base类
-Base = declarative_base()
+Base = declarative_base(cls=_ModelBase)
 
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
-    """获取数据库会话"""
+    """获取数据库会话（不自动提交，写操作需在接口内显式调用 commit）"""
     async with async_session_maker() as session:
         try:
             yield session
-            await session.commit()
         except Exception:
             await session.rollback()
             raise
@@ -0,0 +1,27 @@
+"""
+主键 ID 生成
+"""
+import os
+import time
+import uuid
+
+
+def uuid7() -> uuid.UUID:
+    """
+    生成按时间有序的 UUIDv7（RFC 9562）
+
+    高 48 位为毫秒时间戳，其余为版本号、变体位与随机数。
+    新插入的主键大致单调递增，B-tree 索引只在右侧追加，减少页分裂。
+
+    Returns:
+        UUID 对象
+    """
+    timestamp_ms = time.time_ns() // 1_000_000
+    rand = int.from_bytes(os.urandom(10), "big")
+
+    value = (timestamp_ms & 0xFFFF_FFFF_FFFF) << 80
+    value |= 0x7 << 76                           # 版本号 7
+    value |= ((rand >> 62) & 0xFFF) << 64        # rand_a，12 位
+    value |= 0b10 << 62                          # RFC 4122 变体
+    value |= rand & 0x3FFF_FFFF_FFFF_FFFF        # rand_b，62 位
+    return uuid.UUID(int=value)
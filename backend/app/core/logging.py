@@ -6,8 +6,16 @@ from loguru import logger
 from app.core.config import settings
 
 
+# 多个模块都会调用 setup_logging，只在首次调用时配置处理器
+_configured = False
+
+
 def setup_logging():
-    """配置日志系统"""
+    """配置日志系统（重复调用时直接返回已配置的 logger）"""
+    global _configured
+    if _configured:
+        return logger
+    _configured = True
     
     # 移除默认处理器
     logger.remove()
@@ -18,26 +26,33 @@ def setup_logging():
         format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
         level=settings.LOG_LEVEL,
         colorize=True,
+        enqueue=True,  # 由后台线程写出，不阻塞请求处理
     )
     
     # 添加文件输出
     logger.add(
         "logs/coremind_{time:YYYY-MM-DD}.log",
-        rotation="00:00",  # 每天午夜轮转
+        rotation="100 MB",  # 按大小轮转，避免午夜集中轮转
         retention="30 days",  # 保留30天
-        compression="zip",  # 压缩旧日志
+        compression="zip",  # 压缩旧日志（在后台线程中进行）
         format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}",
         level=settings.LOG_LEVEL,
+        enqueue=True,
+        backtrace=False,
+        diagnose=False,
     )
     
     # 添加错误日志文件
     logger.add(
         "logs/error_{time:YYYY-MM-DD}.log",
-        rotation="00:00",
+        rotation="100 MB",
         retention="90 days",
         compression="zip",
         format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}",
         level="ERROR",
+        enqueue=True,
+        backtrace=False,
+        diagnose=False,
     )
     
     return logger
@@ -1,7 +1,8 @@
 """
 Redis连接管理
 """
-from typing import Optional
+from typing import Any, Optional
+import orjson
 import redis.asyncio as redis
 from app.core.config import settings
 
@@ -11,24 +12,33 @@ class RedisClient:
     
     def __init__(self):
         self.redis: Optional[redis.Redis] = None
+        # 存取序列化对象使用的二进制客户端（不做响应解码）
+        self._bin: Optional[redis.Redis] = None
     
     async def connect(self):
-        """连接到Redis"""
+        """连接到Redis（应用启动时调用，客户端内部维护连接池）"""
         self.redis = await redis.from_url(
             settings.REDIS_URL,
             encoding="utf-8",
             decode_responses=True,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            health_check_interval=30,
+        )
+        self._bin = await redis.from_url(
+            settings.REDIS_URL,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            health_check_interval=30,
         )
     
     async def disconnect(self):
         """断开Redis连接"""
         if self.redis:
             await self.redis.close()
+        if self._bin:
+            await self._bin.close()
     
     async def get(self, key: str) -> Optional[str]:
         """获取值"""
-        if not self.redis:
-            await self.connect()
         return await self.redis.get(key)
     
     async def set(
@@ -38,22 +48,31 @@ class RedisClient:
         expire: Optional[int] = None
     ) -> bool:
         """设置值"""
-        if not self.redis:
-            await self.connect()
         return await self.redis.set(key, value, ex=expire)
     
     async def delete(self, key: str) -> int:
         """删除键"""
-        if not self.redis:
-            await self.connect()
         return await self.redis.delete(key)
     
     async def exists(self, key: str) -> bool:
         """检查键是否存在"""
-        if not self.redis:
-            await self.connect()
         return await self.redis.exists(key) > 0
 
+    
+    async def get_obj(self, key: str) -> Any:
+        """获取对象（orjson 反序列化），不存在时返回 None"""
+        raw = await self._bin.get(key)
+        return orjson.loads(raw) if raw is not None else None
+    
+    async def set_obj(
+        self,
+        key: str,
+        obj: Any,
+        expire: Optional[int] = None
+    ) -> bool:
+        """设置对象（orjson 序列化为字节存储）"""
+        return await self._bin.set(key, orjson.dumps(obj), ex=expire)
+
 
 # 创建全局Redis客户端实例
 redis_client = RedisClient()
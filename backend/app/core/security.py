@@ -3,6 +3,8 @@
 """
 from datetime import datetime, timedelta
 from typing import Optional
+import asyncio
+import uuid
 from jose import JWTError, jwt
 import bcrypt
 from fastapi import Depends, HTTPException, status
@@ -29,6 +31,16 @@ def get_password_hash(password: str) -> str:
     return hashed.decode('utf-8')
 
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """在线程池中验证密码，避免 bcrypt 计算阻塞事件循环"""
+    return await asyncio.to_thread(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """在线程池中计算密码哈希，避免 bcrypt 计算阻塞事件循环"""
+    return await asyncio.to_thread(get_password_hash, password)
+
+
 def create_access_token(
     data: dict,
     expires_delta: Optional[timedelta] = None
@@ -66,21 +78,30 @@ def decode_access_token(token: str) -> Optional[dict]:
         return None
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
-    """获取当前用户"""
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    """构造凭据校验失败异常（仅在失败路径上创建）"""
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="无法验证凭据",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
+    """获取当前用户（async 依赖，由事件循环直接执行，不经过线程池）"""
     payload = decode_access_token(token)
     if payload is None:
-        raise credentials_exception
+        raise _credentials_exception()
     
     user_id: str = payload.get("sub")
     if user_id is None:
-        raise credentials_exception
+        raise _credentials_exception()
+    
+    # 在依赖中解析一次UUID，下游路由直接复用 user_uuid，避免重复解析
+    try:
+        user_uuid = uuid.UUID(user_id)
+    except ValueError:
+        raise _credentials_exception()
     
-    return {"user_id": user_id}
+    return {"user_id": user_id, "user_uuid": user_uuid}
 
@@ -1,25 +1,58 @@
 """
 AI助手配置
 """
-from datetime import datetime
 from sqlalchemy import (
     Column, String, DateTime, JSON,
-    ForeignKey, Boolean, Text, Integer
+    ForeignKey, Boolean, Text, Integer, Index, desc, func, text
 )
-from sqlalchemy.dialects.postgresql import UUID, ARRAY
-import uuid
+from sqlalchemy.dialects.postgresql import UUID, ARRAY, ExcludeConstraint
 
 from app.core.database import Base
+from app.core.ids import uuid7
 
 
 class AssistantConfig(Base):
     """AI助手配置表"""
     __tablename__ = "assistant_configs"
+    __table_args__ = (
+        # 每个用户至多一个默认助手；延迟到提交时检查，
+        # 允许同一条语句中先设置新默认、再由 CTE 取消旧默认
+        ExcludeConstraint(
+            ("user_id", "="),
+            name="ex_assistant_configs_one_default_per_user",
+            using="btree",
+            where=text("is_default"),
+            deferrable=True,
+            initially="DEFERRED",
+        ),
+        # 支撑助手列表按 user_id 过滤并按 (is_default, created_at) 倒序排序
+        Index(
+            "ix_assistant_configs_user_default_created",
+            "user_id", desc("is_default"), desc("created_at")
+        ),
+        # 支撑按知识库反查引用它的助手（knowledge_base_ids @> ARRAY[...]）
+        Index(
+            "ix_assistant_configs_knowledge_base_ids",
+            "knowledge_base_ids",
+            postgresql_using="gin"
+        ),
+        # 删除数据源/接口时按 @> ARRAY[...] 反查并清理引用
+        Index(
+            "ix_assistant_configs_datasource_ids",
+            "datasource_ids",
+            postgresql_using="gin"
+        ),
+        Index(
+            "ix_assistant_configs_interface_ids",
+            "interface_ids",
+            postgresql_using="gin"
+        ),
+    )
     
     id = Column(
         UUID(as_uuid=True),
         primary_key=True,
-        default=uuid.uuid4,
+        default=uuid7,
         comment="配置ID"
     )
     user_id = Column(
@@ -102,15 +135,15 @@ class AssistantConfig(Base):
         comment="是否启用"
     )
     created_at = Column(
-        DateTime,
-        default=datetime.utcnow,
+        DateTime(timezone=True),
+        server_default=func.now(),
         nullable=False,
         comment="创建时间"
     )
     updated_at = Column(
-        DateTime,
-        default=datetime.utcnow,
-        onupdate=datetime.utcnow,
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
         nullable=False,
         comment="更新时间"
     )
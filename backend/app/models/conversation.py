@@ -1,24 +1,30 @@
 """
 对话模型
 """
-from datetime import datetime
 from sqlalchemy import (
-    Column, String, DateTime, ForeignKey, Text, Integer, Float
+    Column, String, DateTime, ForeignKey, Text, Integer, Float, Index, desc, text, func
 )
-from sqlalchemy.dialects.postgresql import UUID, JSON
-import uuid
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.orm import relationship
 
 from app.core.database import Base
+from app.core.ids import uuid7
 
 
 class Conversation(Base):
     """对话会话表"""
     __tablename__ = "conversations"
+    __table_args__ = (
+        # 支撑对话列表按 user_id 过滤并按 updated_at 倒序排序
+        Index("ix_conversations_user_updated", "user_id", desc("updated_at")),
+        # 支撑 v2 对话列表按 user_id 过滤、按 created_at 倒序的游标分页
+        Index("ix_conversations_user_created", "user_id", desc("created_at")),
+    )
     
     id = Column(
         UUID(as_uuid=True),
         primary_key=True,
-        default=uuid.uuid4,
+        default=uuid7,
         comment="会话ID"
     )
     user_id = Column(
@@ -72,19 +78,31 @@ class Conversation(Base):
         comment="消息数量"
     )
     created_at = Column(
-        DateTime,
-        default=datetime.utcnow,
+        DateTime(timezone=True),
+        server_default=func.now(),
         nullable=False,
         comment="创建时间"
     )
     updated_at = Column(
-        DateTime,
-        default=datetime.utcnow,
-        onupdate=datetime.utcnow,
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
         nullable=False,
         comment="更新时间"
     )
     
+    # 关联关系（异步会话下需通过 selectinload/joinedload 显式加载）
+    # lazy="raise"：必须显式预加载，防止异步会话中意外触发懒加载查询或在列表中产生 N+1 查询
+    messages = relationship(
+        "Message",
+        order_by="Message.created_at",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        lazy="raise",
+    )
+    knowledge_base = relationship("KnowledgeBase", lazy="raise")
+    assistant = relationship("AssistantConfig", lazy="raise")
+    
     def __repr__(self):
         return f"<Conversation(id={self.id}, title={self.title})>"
 
@@ -92,18 +110,35 @@ class Conversation(Base):
 class Message(Base):
     """消息表"""
     __tablename__ = "messages"
+    __table_args__ = (
+        # 支撑按会话获取消息并按 (created_at, id) 排序/键集分页；
+        # INCLUDE 角色与token数，只需这些列的统计类查询可走仅索引扫描（content 过宽不放入）
+        Index(
+            "ix_messages_conversation_covering",
+            "conversation_id", "created_at", "id",
+            postgresql_include=["role", "tokens"]
+        ),
+        # 只有引用了知识库的助手消息带元数据，部分索引只收录这些行，支撑按引用内容做包含查询
+        Index(
+            "ix_messages_msg_metadata",
+            "msg_metadata",
+            postgresql_using="gin",
+            postgresql_ops={"msg_metadata": "jsonb_path_ops"},
+            postgresql_where=text("msg_metadata IS NOT NULL")
+        ),
+    )
     
     id = Column(
         UUID(as_uuid=True),
         primary_key=True,
-        default=uuid.uuid4,
+        default=uuid7,
         comment="消息ID"
     )
+    # 由复合索引 ix_messages_conversation_covering 的前缀列覆盖，不再单独建索引
     conversation_id = Column(
         UUID(as_uuid=True),
         ForeignKey("conversations.id", ondelete="CASCADE"),
         nullable=False,
-        index=True,
         comment="会话ID"
     )
     role = Column(
@@ -117,16 +152,18 @@ class Message(Base):
         comment="消息内容"
     )
     msg_metadata = Column(
-        JSON,
+        JSONB,
         comment="元数据（如工具调用、知识库引用等）"
     )
     tokens = Column(
         Integer,
         comment="token数量"
     )
+    # 同一事务内写入的用户消息与助手消息需按写入先后排序，使用逐行求值的 clock_timestamp()，
+    # 而不是整个事务返回同一时间的 now()
     created_at = Column(
-        DateTime,
-        default=datetime.utcnow,
+        DateTime(timezone=True),
+        server_default=func.clock_timestamp(),
         nullable=False,
         comment="创建时间"
     )
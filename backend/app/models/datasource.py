@@ -1,16 +1,16 @@
 """
 数据源模型
 """
-from datetime import datetime
 from enum import Enum as PyEnum
 from sqlalchemy import (
-    Column, String, DateTime, Enum, JSON, 
-    ForeignKey, Boolean, Text, Integer
+    Column, String, DateTime, JSON, 
+    ForeignKey, Boolean, Text, Integer, func
 )
 from sqlalchemy.dialects.postgresql import UUID
-import uuid
+from sqlalchemy.orm import validates
 
 from app.core.database import Base
+from app.core.ids import uuid7
 
 
 class DataSourceType(PyEnum):
@@ -29,7 +29,7 @@ class DataSource(Base):
     id = Column(
         UUID(as_uuid=True),
         primary_key=True,
-        default=uuid.uuid4,
+        default=uuid7,
         comment="数据源ID"
     )
     user_id = Column(
@@ -48,8 +48,9 @@ class DataSource(Base):
         Text,
         comment="数据源描述"
     )
+    # 以字符串存储枚举取值，新增类型无需 ALTER TYPE，读取时也不做枚举转换
     type = Column(
-        Enum(DataSourceType),
+        String(32),
         nullable=False,
         comment="数据源类型"
     )
@@ -80,7 +81,7 @@ class DataSource(Base):
         comment="同步频率（分钟）"
     )
     last_sync_at = Column(
-        DateTime,
+        DateTime(timezone=True),
         comment="最后同步时间"
     )
     sync_status = Column(
@@ -98,19 +99,24 @@ class DataSource(Base):
         comment="文档总数"
     )
     created_at = Column(
-        DateTime,
-        default=datetime.utcnow,
+        DateTime(timezone=True),
+        server_default=func.now(),
         nullable=False,
         comment="创建时间"
     )
     updated_at = Column(
-        DateTime,
-        default=datetime.utcnow,
-        onupdate=datetime.utcnow,
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
         nullable=False,
         comment="更新时间"
     )
     
+    @validates("type")
+    def _validate_type(self, key, value):
+        """写入时校验数据源类型，统一存储为枚举取值"""
+        return DataSourceType(value).value
+    
     def __repr__(self):
         return f"<DataSource(id={self.id}, name={self.name}, type={self.type})>"
 
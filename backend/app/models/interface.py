@@ -1,16 +1,16 @@
 """
 自定义接口模型
 """
-from datetime import datetime
 from enum import Enum as PyEnum
 from sqlalchemy import (
-    Column, String, DateTime, Enum, JSON,
-    ForeignKey, Boolean, Text, Integer
+    Column, String, DateTime, JSON,
+    ForeignKey, Boolean, Text, Integer, func
 )
 from sqlalchemy.dialects.postgresql import UUID
-import uuid
+from sqlalchemy.orm import validates
 
 from app.core.database import Base
+from app.core.ids import uuid7
 
 
 class InterfaceType(PyEnum):
@@ -28,7 +28,7 @@ class CustomInterface(Base):
     id = Column(
         UUID(as_uuid=True),
         primary_key=True,
-        default=uuid.uuid4,
+        default=uuid7,
         comment="接口ID"
     )
     user_id = Column(
@@ -47,8 +47,9 @@ class CustomInterface(Base):
         Text,
         comment="接口描述"
     )
+    # 以字符串存储枚举取值，新增类型无需 ALTER TYPE，读取时也不做枚举转换
     type = Column(
-        Enum(InterfaceType),
+        String(32),
         nullable=False,
         comment="接口类型"
     )
@@ -80,23 +81,28 @@ class CustomInterface(Base):
         comment="执行次数"
     )
     last_executed_at = Column(
-        DateTime,
+        DateTime(timezone=True),
         comment="最后执行时间"
     )
     created_at = Column(
-        DateTime,
-        default=datetime.utcnow,
+        DateTime(timezone=True),
+        server_default=func.now(),
         nullable=False,
         comment="创建时间"
     )
     updated_at = Column(
-        DateTime,
-        default=datetime.utcnow,
-        onupdate=datetime.utcnow,
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
         nullable=False,
         comment="更新时间"
     )
     
+    @validates("type")
+    def _validate_type(self, key, value):
+        """写入时校验接口类型，统一存储为枚举取值"""
+        return InterfaceType(value).value
+    
     def __repr__(self):
         return f"<CustomInterface(id={self.id}, name={self.name}, type={self.type})>"
 
@@ -1,15 +1,14 @@
 """
 知识库模型
 """
-from datetime import datetime
 from sqlalchemy import (
     Column, String, DateTime, ForeignKey, 
-    Boolean, Text, Integer, Float
+    Boolean, Text, Integer, Float, Index, func
 )
-from sqlalchemy.dialects.postgresql import UUID, ARRAY
-import uuid
+from sqlalchemy.dialects.postgresql import UUID, ARRAY, JSONB
 
 from app.core.database import Base
+from app.core.ids import uuid7
 
 
 class KnowledgeBase(Base):
@@ -19,7 +18,7 @@ class KnowledgeBase(Base):
     id = Column(
         UUID(as_uuid=True),
         primary_key=True,
-        default=uuid.uuid4,
+        default=uuid7,
         comment="知识库ID"
     )
     user_id = Column(
@@ -76,15 +75,15 @@ class KnowledgeBase(Base):
         comment="是否启用"
     )
     created_at = Column(
-        DateTime,
-        default=datetime.utcnow,
+        DateTime(timezone=True),
+        server_default=func.now(),
         nullable=False,
         comment="创建时间"
     )
     updated_at = Column(
-        DateTime,
-        default=datetime.utcnow,
-        onupdate=datetime.utcnow,
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
         nullable=False,
         comment="更新时间"
     )
@@ -96,11 +95,20 @@ class KnowledgeBase(Base):
 class Document(Base):
     """文档表"""
     __tablename__ = "documents"
+    __table_args__ = (
+        # 支撑按元数据键值包含查询（doc_metadata @> '{...}'）
+        Index(
+            "ix_documents_doc_metadata",
+            "doc_metadata",
+            postgresql_using="gin",
+            postgresql_ops={"doc_metadata": "jsonb_path_ops"}
+        ),
+    )
     
     id = Column(
         UUID(as_uuid=True),
         primary_key=True,
-        default=uuid.uuid4,
+        default=uuid7,
         comment="文档ID"
     )
     knowledge_base_id = Column(
@@ -140,8 +148,8 @@ class Document(Base):
         comment="文件大小（字节）"
     )
     doc_metadata = Column(
-        Text,
-        comment="元数据（JSON字符串）"
+        JSONB,
+        comment="元数据"
     )
     chunk_count = Column(
         Integer,
@@ -154,15 +162,15 @@ class Document(Base):
         comment="是否已处理"
     )
     created_at = Column(
-        DateTime,
-        default=datetime.utcnow,
+        DateTime(timezone=True),
+        server_default=func.now(),
         nullable=False,
         comment="创建时间"
     )
     updated_at = Column(
-        DateTime,
-        default=datetime.utcnow,
-        onupdate=datetime.utcnow,
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
         nullable=False,
         comment="更新时间"
     )
@@ -178,7 +186,7 @@ class DocumentChunk(Base):
     id = Column(
         UUID(as_uuid=True),
         primary_key=True,
-        default=uuid.uuid4,
+        default=uuid7,
         comment="切片ID"
     )
     document_id = Column(
@@ -210,8 +218,8 @@ class DocumentChunk(Base):
         comment="向量数据库中的ID"
     )
     created_at = Column(
-        DateTime,
-        default=datetime.utcnow,
+        DateTime(timezone=True),
+        server_default=func.now(),
         nullable=False,
         comment="创建时间"
     )
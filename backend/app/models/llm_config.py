@@ -1,16 +1,16 @@
 """
 LLM模型配置
 """
-from datetime import datetime
 from enum import Enum as PyEnum
 from sqlalchemy import (
-    Column, String, DateTime, Enum, JSON,
-    ForeignKey, Boolean, Text, Float, Integer
+    Column, String, DateTime, JSON,
+    ForeignKey, Boolean, Text, Float, Integer, func, text
 )
-from sqlalchemy.dialects.postgresql import UUID
-import uuid
+from sqlalchemy.dialects.postgresql import UUID, ExcludeConstraint
+from sqlalchemy.orm import validates
 
 from app.core.database import Base
+from app.core.ids import uuid7
 
 
 class LLMProvider(PyEnum):
@@ -31,11 +31,22 @@ class LLMProvider(PyEnum):
 class LLMConfig(Base):
     """LLM配置表"""
     __tablename__ = "llm_configs"
+    __table_args__ = (
+        # 每个用户至多一个默认LLM配置（提交时检查，见 AssistantConfig 同名约束）
+        ExcludeConstraint(
+            ("user_id", "="),
+            name="ex_llm_configs_one_default_per_user",
+            using="btree",
+            where=text("is_default"),
+            deferrable=True,
+            initially="DEFERRED",
+        ),
+    )
     
     id = Column(
         UUID(as_uuid=True),
         primary_key=True,
-        default=uuid.uuid4,
+        default=uuid7,
         comment="配置ID"
     )
     user_id = Column(
@@ -50,8 +61,9 @@ class LLMConfig(Base):
         nullable=False,
         comment="配置名称"
     )
+    # 以字符串存储枚举取值，新增类型无需 ALTER TYPE，读取时也不做枚举转换
     provider = Column(
-        Enum(LLMProvider),
+        String(32),
         nullable=False,
         comment="提供商"
     )
@@ -93,19 +105,24 @@ class LLMConfig(Base):
         comment="是否启用"
     )
     created_at = Column(
-        DateTime,
-        default=datetime.utcnow,
+        DateTime(timezone=True),
+        server_default=func.now(),
         nullable=False,
         comment="创建时间"
     )
     updated_at = Column(
-        DateTime,
-        default=datetime.utcnow,
-        onupdate=datetime.utcnow,
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
         nullable=False,
         comment="更新时间"
     )
     
+    @validates("provider")
+    def _validate_provider(self, key, value):
+        """写入时校验提供商，统一存储为枚举取值"""
+        return LLMProvider(value).value
+    
     def __repr__(self):
         return f"<LLMConfig(id={self.id}, name={self.name}, provider={self.provider})>"
 
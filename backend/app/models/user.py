@@ -1,12 +1,11 @@
 """
 用户模型
 """
-from datetime import datetime
-from sqlalchemy import Column, String, Boolean, DateTime, Integer
+from sqlalchemy import Column, String, Boolean, DateTime, Integer, func
 from sqlalchemy.dialects.postgresql import UUID
-import uuid
 
 from app.core.database import Base
+from app.core.ids import uuid7
 
 
 class User(Base):
@@ -16,7 +15,7 @@ class User(Base):
     id = Column(
         UUID(as_uuid=True),
         primary_key=True,
-        default=uuid.uuid4,
+        default=uuid7,
         comment="用户ID"
     )
     username = Column(
@@ -57,15 +56,15 @@ class User(Base):
         comment="头像URL"
     )
     created_at = Column(
-        DateTime,
-        default=datetime.utcnow,
+        DateTime(timezone=True),
+        server_default=func.now(),
         nullable=False,
         comment="创建时间"
     )
     updated_at = Column(
-        DateTime,
-        default=datetime.utcnow,
-        onupdate=datetime.utcnow,
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
         nullable=False,
         comment="更新时间"
     )
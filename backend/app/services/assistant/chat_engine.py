@@ -2,14 +2,33 @@
 对话引擎
 """
 from typing import Dict, Any, Optional, List, AsyncGenerator
+from langchain.schema import BaseMessage, HumanMessage, AIMessage, SystemMessage
 from loguru import logger
 
 from app.core.config import settings
 from app.services.assistant.memory import ConversationMemory
+from app.services.assistant.llm_factory import get_llm, resolve_llm_provider
 from app.services.knowledge.vectorstore import VectorStore
 from app.services.interface.tool_manager import ToolManager
 
 
+# 角色到LangChain消息类型的映射，未知角色的消息不发送给模型
+_ROLE_TO_MESSAGE = {
+    "system": SystemMessage,
+    "user": HumanMessage,
+    "assistant": AIMessage,
+}
+
+
+def _to_langchain_messages(messages: List[Dict[str, str]]) -> List[BaseMessage]:
+    """将消息字典列表转换为LangChain消息对象"""
+    return [
+        _ROLE_TO_MESSAGE[m["role"]](content=m["content"])
+        for m in messages
+        if m["role"] in _ROLE_TO_MESSAGE
+    ]
+
+
 class ChatEngine:
     """对话引擎"""
     
@@ -19,6 +38,7 @@ class ChatEngine:
         temperature: float = 0.7,
         max_tokens: int = 2000,
         system_prompt: Optional[str] = None,
+        max_history: int = 10,
     ):
         """
         初始化对话引擎
@@ -28,13 +48,16 @@ class ChatEngine:
             temperature: 温度参数
             max_tokens: 最大token数
             system_prompt: 系统提示词
+            max_history: 作为上下文的最大历史消息数
         """
         self.model = model
         self.temperature = temperature
         self.max_tokens = max_tokens
-        self.memory = ConversationMemory()
+        self.max_history = max_history
+        # 记忆只需容纳最近若干轮对话，超出部分由定长队列自动丢弃
+        self.memory = ConversationMemory(max_messages=max_history * 2)
         self.vectorstore: Optional[VectorStore] = None
-        self.tool_manager = ToolManager()
+        self._tool_manager: Optional[ToolManager] = None
         self.llm = None
         
         # 设置系统提示词
@@ -46,43 +69,20 @@ class ChatEngine:
         
         self._initialize_llm()
     
+    @property
+    def tool_manager(self) -> ToolManager:
+        """工具管理器（多数对话不注册工具，首次使用时再创建）"""
+        if self._tool_manager is None:
+            self._tool_manager = ToolManager()
+        return self._tool_manager
+    
     def _initialize_llm(self):
-        """初始化LLM"""
+        """初始化LLM（客户端在进程内按参数复用）"""
         try:
-            if settings.OPENAI_API_KEY:
-                from langchain_openai import ChatOpenAI
-                
-                self.llm = ChatOpenAI(
-                    model=self.model,
-                    temperature=self.temperature,
-                    max_tokens=self.max_tokens,
-                    openai_api_key=settings.OPENAI_API_KEY,
-                )
-                logger.info(f"使用OpenAI模型: {self.model}")
-            
-            elif settings.AZURE_OPENAI_API_KEY:
-                from langchain_openai import AzureChatOpenAI
-                
-                self.llm = AzureChatOpenAI(
-                    azure_deployment=settings.AZURE_OPENAI_DEPLOYMENT_NAME,
-                    openai_api_key=settings.AZURE_OPENAI_API_KEY,
-                    azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
-                    openai_api_version=settings.AZURE_OPENAI_API_VERSION,
-                    temperature=self.temperature,
-                    max_tokens=self.max_tokens,
-                )
-                logger.info("使用Azure OpenAI模型")
-            
-            else:
-                # 使用本地模型（Ollama）
-                from langchain.llms import Ollama
-                
-                self.llm = Ollama(
-                    base_url=settings.OLLAMA_BASE_URL,
-                    model=settings.OLLAMA_MODEL,
-                    temperature=self.temperature,
-                )
-                logger.info(f"使用Ollama本地模型: {settings.OLLAMA_MODEL}")
+            provider, api_base = resolve_llm_provider()
+            # Ollama 使用配置中的本地模型
+            model = settings.OLLAMA_MODEL if provider == "ollama" else self.model
+            self.llm = get_llm(provider, model, self.temperature, self.max_tokens, api_base)
         
         except Exception as e:
             logger.error(f"初始化LLM失败: {str(e)}")
@@ -136,7 +136,7 @@ class ChatEngine:
                 context = await self._retrieve_knowledge(message)
             
             # 构建提示
-            messages = self.memory.get_messages()
+            messages = self.memory.get_recent_messages(self.max_history)
             
             # 如果有知识库上下文，添加到最后一条用户消息
             if context:
@@ -144,16 +144,7 @@ class ChatEngine:
                 messages[-1]["content"] = enhanced_message
             
             # 转换为LangChain消息格式
-            from langchain.schema import HumanMessage, AIMessage, SystemMessage
-            
-            lc_messages = []
-            for msg in messages:
-                if msg["role"] == "system":
-                    lc_messages.append(SystemMessage(content=msg["content"]))
-                elif msg["role"] == "user":
-                    lc_messages.append(HumanMessage(content=msg["content"]))
-                elif msg["role"] == "assistant":
-                    lc_messages.append(AIMessage(content=msg["content"]))
+            lc_messages = _to_langchain_messages(messages)
             
             # 调用LLM
             response = await self.llm.ainvoke(lc_messages)
@@ -199,37 +190,28 @@ class ChatEngine:
                 context = await self._retrieve_knowledge(message)
             
             # 构建提示
-            messages = self.memory.get_messages()
+            messages = self.memory.get_recent_messages(self.max_history)
             
             if context:
                 enhanced_message = f"相关知识：\n{context}\n\n用户问题：{message}"
                 messages[-1]["content"] = enhanced_message
             
             # 转换为LangChain消息格式
-            from langchain.schema import HumanMessage, AIMessage, SystemMessage
-            
-            lc_messages = []
-            for msg in messages:
-                if msg["role"] == "system":
-                    lc_messages.append(SystemMessage(content=msg["content"]))
-                elif msg["role"] == "user":
-                    lc_messages.append(HumanMessage(content=msg["content"]))
-                elif msg["role"] == "assistant":
-                    lc_messages.append(AIMessage(content=msg["content"]))
+            lc_messages = _to_langchain_messages(messages)
             
-            # 流式调用
-            full_response = ""
+            # 流式调用（收集分片后一次性拼接，避免逐块字符串拼接的二次复杂度）
+            parts: List[str] = []
             async for chunk in self.llm.astream(lc_messages):
                 if hasattr(chunk, "content"):
                     content = chunk.content
                 else:
                     content = str(chunk)
                 
-                full_response += content
+                parts.append(content)
                 yield content
             
             # 添加完整回复到记忆
-            self.memory.add_message("assistant", full_response)
+            self.memory.add_message("assistant", "".join(parts))
             
             logger.info("流式对话完成")
             
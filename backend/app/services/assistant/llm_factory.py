@@ -0,0 +1,86 @@
+"""
+LangChain LLM 客户端工厂
+"""
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from loguru import logger
+
+from app.core.config import settings
+
+
+def resolve_llm_provider() -> Tuple[str, Optional[str]]:
+    """
+    根据配置选择 LLM 提供商
+
+    Returns:
+        (提供商, 接口地址)，提供商为 openai / azure / ollama
+    """
+    if settings.OPENAI_API_KEY:
+        return "openai", None
+    if settings.AZURE_OPENAI_API_KEY:
+        return "azure", settings.AZURE_OPENAI_ENDPOINT
+    return "ollama", settings.OLLAMA_BASE_URL
+
+
+@lru_cache(maxsize=64)
+def get_llm(
+    provider: str,
+    model: str,
+    temperature: float,
+    max_tokens: int,
+    api_base: Optional[str] = None,
+):
+    """
+    获取 LangChain LLM 客户端（进程内按参数缓存，复用底层 HTTP 连接池）
+
+    API 密钥直接读取配置，不参与缓存键。
+
+    Args:
+        provider: 提供商（openai / azure / ollama）
+        model: 模型名称
+        temperature: 温度参数
+        max_tokens: 最大token数
+        api_base: 接口地址
+
+    Returns:
+        LLM 客户端
+    """
+    if provider == "openai":
+        from langchain_openai import ChatOpenAI
+
+        llm = ChatOpenAI(
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            openai_api_key=settings.OPENAI_API_KEY,
+        )
+        logger.info(f"使用OpenAI模型: {model}")
+
+    elif provider == "azure":
+        from langchain_openai import AzureChatOpenAI
+
+        llm = AzureChatOpenAI(
+            azure_deployment=settings.AZURE_OPENAI_DEPLOYMENT_NAME,
+            openai_api_key=settings.AZURE_OPENAI_API_KEY,
+            azure_endpoint=api_base,
+            openai_api_version=settings.AZURE_OPENAI_API_VERSION,
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+        logger.info("使用Azure OpenAI模型")
+
+    elif provider == "ollama":
+        from langchain.llms import Ollama
+
+        llm = Ollama(
+            base_url=api_base,
+            model=model,
+            temperature=temperature,
+        )
+        logger.info(f"使用Ollama本地模型: {model}")
+
+    else:
+        raise ValueError(f"不支持的LLM提供商: {provider}")
+
+    return llm
@@ -1,7 +1,9 @@
 """
 对话记忆管理
 """
-from typing import List, Dict, Any, Optional
+from collections import deque
+from itertools import islice
+from typing import Deque, List, Dict, Optional
 from loguru import logger
 
 
@@ -17,12 +19,23 @@ class ConversationMemory:
         初始化对话记忆
         
         Args:
-            max_messages: 最大消息数量
+            max_messages: 最大消息数量（含系统消息）
             max_tokens: 最大token数量（近似）
         """
         self.max_messages = max_messages
         self.max_tokens = max_tokens
-        self.messages: List[Dict[str, str]] = []
+        self._system_message: Optional[Dict[str, str]] = None
+        # 对话消息使用定长队列，超出时自动丢弃最早的消息
+        self._buffer: Deque[Dict[str, str]] = deque(maxlen=max(max_messages - 1, 1))
+        # 全部消息（含系统消息）的总字符数，随增删消息增量维护
+        self._char_total = 0
+    
+    @property
+    def messages(self) -> List[Dict[str, str]]:
+        """全部消息（系统消息在前，其余按时间正序）"""
+        if self._system_message is None:
+            return list(self._buffer)
+        return [self._system_message, *self._buffer]
     
     def add_message(self, role: str, content: str):
         """
@@ -32,23 +45,21 @@ class ConversationMemory:
             role: 角色（user/assistant/system）
             content: 消息内容
         """
-        self.messages.append({
+        if role == "system":
+            self.set_system_message(content)
+            return
+        
+        # 队列已满时 append 会挤掉最早的一条，先扣除其字符数
+        if len(self._buffer) == self._buffer.maxlen:
+            self._char_total -= len(self._buffer[0]["content"])
+        
+        self._buffer.append({
             "role": role,
             "content": content
         })
+        self._char_total += len(content)
         
-        # 限制消息数量
-        if len(self.messages) > self.max_messages:
-            # 保留system消息，删除最早的对话
-            system_messages = [m for m in self.messages if m["role"] == "system"]
-            other_messages = [m for m in self.messages if m["role"] != "system"]
-            
-            # 保留最新的消息
-            other_messages = other_messages[-(self.max_messages - len(system_messages)):]
-            
-            self.messages = system_messages + other_messages
-        
-        logger.debug(f"添加消息: {role}, 当前消息数: {len(self.messages)}")
+        logger.debug(f"添加消息: {role}, 当前消息数: {len(self)}")
     
     def get_messages(self) -> List[Dict[str, str]]:
         """
@@ -57,11 +68,13 @@ class ConversationMemory:
         Returns:
             消息列表
         """
-        return self.messages.copy()
+        return self.messages
     
     def clear(self):
         """清空消息"""
-        self.messages.clear()
+        self._system_message = None
+        self._buffer.clear()
+        self._char_total = 0
         logger.info("清空对话记忆")
     
     def set_system_message(self, content: str):
@@ -71,17 +84,34 @@ class ConversationMemory:
         Args:
             content: 系统消息内容
         """
-        # 移除旧的系统消息
-        self.messages = [m for m in self.messages if m["role"] != "system"]
-        
-        # 添加新的系统消息到开头
-        self.messages.insert(0, {
+        # 只保留一条系统消息，新的替换旧的
+        if self._system_message:
+            self._char_total -= len(self._system_message["content"])
+        self._char_total += len(content)
+        self._system_message = {
             "role": "system",
             "content": content
-        })
+        }
         
         logger.info("设置系统消息")
     
+    def get_recent_messages(self, n: int) -> List[Dict[str, str]]:
+        """
+        获取系统消息与最近N条对话消息
+        
+        Args:
+            n: 对话消息数量
+            
+        Returns:
+            消息列表（系统消息在前，其余按时间正序）
+        """
+        system_messages = [self._system_message.copy()] if self._system_message else []
+        if n <= 0:
+            return system_messages
+        
+        start = max(len(self._buffer) - n, 0)
+        return system_messages + [m.copy() for m in islice(self._buffer, start, None)]
+    
     def get_last_messages(self, n: int) -> List[Dict[str, str]]:
         """
         获取最后N条消息
@@ -92,7 +122,14 @@ class ConversationMemory:
         Returns:
             消息列表
         """
-        return self.messages[-n:] if n > 0 else []
+        if n <= 0:
+            return []
+        if n <= len(self._buffer):
+            return list(islice(self._buffer, len(self._buffer) - n, None))
+        return self.messages
+    
+    def __len__(self) -> int:
+        return len(self._buffer) + (1 if self._system_message else 0)
     
     def count_tokens(self) -> int:
         """
@@ -101,7 +138,6 @@ class ConversationMemory:
         Returns:
             token数量
         """
-        total_chars = sum(len(m["content"]) for m in self.messages)
         # 粗略估算：英文约4个字符1个token，中文约1.5个字符1个token
-        return int(total_chars / 3)
+        return self._char_total // 3
 
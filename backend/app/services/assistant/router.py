@@ -3,13 +3,29 @@
 根据用户问题自动判断应该使用知识库、数据库查询还是接口调用
 """
 import re
+from collections import defaultdict
 from typing import Dict, List, Optional
+from sqlalchemy import func, literal, select, union_all
 from sqlalchemy.orm import Session
 
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
 from app.models.assistant_config import AssistantConfig
 from app.models.datasource import DataSource
 from app.models.knowledge import KnowledgeBase
 from app.models.interface import CustomInterface
+from app.utils.cache import assistant_services_cache, route_cache
+
+
+# 服务类型 -> 助手配置中对应的服务id字段
+_SERVICE_ID_FIELDS = {
+    "knowledge_base": "knowledge_base_ids",
+    "datasource": "datasource_ids",
+    "interface": "interface_ids",
+}
 
 
 class QueryRouter:
@@ -62,6 +78,38 @@ class QueryRouter:
                 "reason": "路由原因"
             }
         """
+        # 相同问题（忽略大小写与首尾空白）在助手配置不变时路由结果相同，命中缓存时跳过打分与服务查询
+        cache_key = self._route_cache_key(query, assistant_config)
+        cached = route_cache.get(cache_key)
+        if cached is None:
+            cached = self._route(query, assistant_config)
+            route_cache.set(cache_key, cached)
+        
+        # 返回副本，调用方修改结果不会影响缓存
+        return {**cached, "services": [dict(service) for service in cached["services"]]}
+    
+    @staticmethod
+    def _route_cache_key(query: str, assistant_config: AssistantConfig) -> tuple:
+        """路由缓存键：规范化的问题 + 影响路由结果的助手配置"""
+        return (
+            query.strip().lower(),
+            assistant_config.id,
+            assistant_config.updated_at,
+            assistant_config.auto_route,
+            assistant_config.enable_knowledge_base,
+            assistant_config.enable_datasource,
+            assistant_config.enable_interface,
+            tuple(assistant_config.knowledge_base_ids or ()),
+            tuple(assistant_config.datasource_ids or ()),
+            tuple(assistant_config.interface_ids or ()),
+        )
+    
+    def _route(
+        self,
+        query: str,
+        assistant_config: AssistantConfig
+    ) -> Dict[str, any]:
+        """计算路由结果（不经过缓存）"""
         # 如果未启用自动路由，返回所有可用服务
         if not assistant_config.auto_route:
             return {
@@ -71,10 +119,11 @@ class QueryRouter:
                 "reason": "自动路由未启用，使用所有可用服务"
             }
         
-        # 计算各类型的匹配分数
-        knowledge_score = self._calculate_score(query, self.KNOWLEDGE_KEYWORDS)
-        data_score = self._calculate_score(query, self.DATA_KEYWORDS)
-        interface_score = self._calculate_score(query, self.INTERFACE_KEYWORDS)
+        # 计算各类型的匹配分数（一次扫描得到三类命中数）
+        matches = self._score_all(query)
+        knowledge_score = self._calculate_score(matches["knowledge"], self.KNOWLEDGE_KEYWORDS)
+        data_score = self._calculate_score(matches["data"], self.DATA_KEYWORDS)
+        interface_score = self._calculate_score(matches["interface"], self.INTERFACE_KEYWORDS)
         
         # 获取最高分数及对应类型
         max_score = max(knowledge_score, data_score, interface_score)
@@ -119,11 +168,29 @@ class QueryRouter:
                 "reason": "首选服务未启用，使用其他可用服务"
             }
     
-    def _calculate_score(self, query: str, keywords: List[str]) -> float:
-        """计算查询与关键词的匹配分数"""
-        query_lower = query.lower()
-        matches = sum(1 for keyword in keywords if keyword in query_lower)
+    def _score_all(self, query: str) -> Dict[str, int]:
+        """
+        统计查询命中的各类关键词数量（同一关键词重复出现只计一次）
         
+        Returns:
+            {"knowledge": 命中数, "data": 命中数, "interface": 命中数}
+        """
+        hits = defaultdict(set)
+        
+        if _KEYWORD_AUTOMATON is not None:
+            # Aho-Corasick 自动机一次线性扫描找出全部关键词
+            for _, (keyword, categories) in _KEYWORD_AUTOMATON.iter(query.lower()):
+                for category in categories:
+                    hits[category].add(keyword)
+        else:
+            # 未安装 pyahocorasick 时每类用一个预编译的正则扫描
+            for category, pattern in _KEYWORD_PATTERNS.items():
+                hits[category].update(match.lower() for match in pattern.findall(query))
+        
+        return {category: len(hits[category]) for category in ("knowledge", "data", "interface")}
+    
+    def _calculate_score(self, matches: int, keywords: List[str]) -> float:
+        """根据关键词命中数计算匹配分数"""
         # 基础分数
         score = matches / len(keywords)
         
@@ -135,84 +202,154 @@ class QueryRouter:
     
     def _get_knowledge_bases(self, assistant_config: AssistantConfig) -> List[Dict]:
         """获取可用的知识库"""
-        if not assistant_config.knowledge_base_ids:
-            return []
-        
-        knowledge_bases = self.db.query(KnowledgeBase).filter(
-            KnowledgeBase.id.in_(assistant_config.knowledge_base_ids),
-            KnowledgeBase.is_active == True
-        ).all()
-        
-        return [
-            {
-                "type": "knowledge_base",
-                "id": str(kb.id),
-                "name": kb.name,
-                "description": kb.description
-            }
-            for kb in knowledge_bases
-        ]
+        return self._get_services(assistant_config, ("knowledge_base",))
     
     def _get_datasources(self, assistant_config: AssistantConfig) -> List[Dict]:
         """获取可用的数据源"""
-        if not assistant_config.datasource_ids:
-            return []
-        
-        datasources = self.db.query(DataSource).filter(
-            DataSource.id.in_(assistant_config.datasource_ids),
-            DataSource.is_active == True
-        ).all()
-        
-        return [
-            {
-                "type": "datasource",
-                "id": str(ds.id),
-                "name": ds.name,
-                "description": ds.description,
-                "datasource_type": ds.type.value,
-                "usage_doc": ds.usage_doc,
-                "schema_info": ds.schema_info,
-                "examples": ds.examples
-            }
-            for ds in datasources
-        ]
+        return self._get_services(assistant_config, ("datasource",))
     
     def _get_interfaces(self, assistant_config: AssistantConfig) -> List[Dict]:
         """获取可用的接口"""
-        if not assistant_config.interface_ids:
-            return []
-        
-        interfaces = self.db.query(CustomInterface).filter(
-            CustomInterface.id.in_(assistant_config.interface_ids),
-            CustomInterface.is_active == True
-        ).all()
-        
-        return [
-            {
-                "type": "interface",
-                "id": str(intf.id),
-                "name": intf.name,
-                "description": intf.description,
-                "interface_type": intf.type.value
-            }
-            for intf in interfaces
-        ]
+        return self._get_services(assistant_config, ("interface",))
     
     def _get_all_services(self, assistant_config: AssistantConfig) -> List[Dict]:
         """获取所有可用服务"""
-        services = []
+        kinds = []
         
         if assistant_config.enable_knowledge_base:
-            services.extend(self._get_knowledge_bases(assistant_config))
+            kinds.append("knowledge_base")
         
         if assistant_config.enable_datasource:
-            services.extend(self._get_datasources(assistant_config))
+            kinds.append("datasource")
         
         if assistant_config.enable_interface:
-            services.extend(self._get_interfaces(assistant_config))
+            kinds.append("interface")
+        
+        return self._get_services(assistant_config, kinds)
+    
+    def _get_services(self, assistant_config: AssistantConfig, kinds) -> List[Dict]:
+        """
+        按服务类型获取助手可用的服务描述
+        
+        先按助手配置读缓存，同一配置的多轮对话不再重复查询数据库；
+        未命中的类型合并为一条 UNION ALL 查询，一次往返取回。
+        缓存键包含 updated_at 与服务id，助手配置修改后自动失效；
+        被引用的服务本身（名称、启用状态等）的修改最多延迟缓存 TTL 生效。
+        
+        Args:
+            assistant_config: 助手配置
+            kinds: 服务类型（knowledge_base / datasource / interface），按此顺序返回
+            
+        Returns:
+            服务描述列表
+        """
+        results: Dict[str, List[Dict]] = {}
+        missing: Dict[str, tuple] = {}
+        
+        for kind in kinds:
+            ids = tuple(getattr(assistant_config, _SERVICE_ID_FIELDS[kind]) or ())
+            if not ids:
+                results[kind] = []
+                continue
+            
+            cached = assistant_services_cache.get(
+                (assistant_config.id, assistant_config.updated_at, kind, ids)
+            )
+            if cached is None:
+                missing[kind] = ids
+            else:
+                results[kind] = cached
         
+        if missing:
+            loaded = self._load_services(missing)
+            for kind, ids in missing.items():
+                results[kind] = loaded[kind]
+                assistant_services_cache.set(
+                    (assistant_config.id, assistant_config.updated_at, kind, ids),
+                    loaded[kind]
+                )
+        
+        services = []
+        for kind in kinds:
+            services.extend(results[kind])
         return services
     
+    def _load_services(self, ids_by_kind: Dict[str, tuple]) -> Dict[str, List[Dict]]:
+        """
+        从数据库加载多种服务描述（一条 UNION ALL 查询）
+        
+        各类服务的字段不同，类型特有字段打包到 extra 列（json 对象）中再按 kind 拆分。
+        
+        Args:
+            ids_by_kind: 服务类型 -> 服务id
+            
+        Returns:
+            服务类型 -> 服务描述列表
+        """
+        statements = []
+        
+        if "knowledge_base" in ids_by_kind:
+            statements.append(
+                select(
+                    literal("knowledge_base").label("kind"),
+                    KnowledgeBase.id,
+                    KnowledgeBase.name,
+                    KnowledgeBase.description,
+                    func.json_build_object().label("extra"),
+                ).where(
+                    KnowledgeBase.id.in_(ids_by_kind["knowledge_base"]),
+                    KnowledgeBase.is_active == True
+                )
+            )
+        
+        if "datasource" in ids_by_kind:
+            statements.append(
+                select(
+                    literal("datasource").label("kind"),
+                    DataSource.id,
+                    DataSource.name,
+                    DataSource.description,
+                    func.json_build_object(
+                        "datasource_type", DataSource.type,
+                        "usage_doc", DataSource.usage_doc,
+                        "schema_info", DataSource.schema_info,
+                        "examples", DataSource.examples,
+                    ).label("extra"),
+                ).where(
+                    DataSource.id.in_(ids_by_kind["datasource"]),
+                    DataSource.is_active == True
+                )
+            )
+        
+        if "interface" in ids_by_kind:
+            statements.append(
+                select(
+                    literal("interface").label("kind"),
+                    CustomInterface.id,
+                    CustomInterface.name,
+                    CustomInterface.description,
+                    func.json_build_object(
+                        "interface_type", CustomInterface.type,
+                    ).label("extra"),
+                ).where(
+                    CustomInterface.id.in_(ids_by_kind["interface"]),
+                    CustomInterface.is_active == True
+                )
+            )
+        
+        stmt = statements[0] if len(statements) == 1 else union_all(*statements)
+        
+        loaded: Dict[str, List[Dict]] = {kind: [] for kind in ids_by_kind}
+        for row in self.db.execute(stmt):
+            loaded[row.kind].append({
+                "type": row.kind,
+                "id": str(row.id),
+                "name": row.name,
+                "description": row.description,
+                **(row.extra or {})
+            })
+        return loaded
+    
     def enhance_prompt_with_context(
         self,
         query: str,
@@ -265,3 +402,47 @@ class QueryRouter:
         
         return base_prompt + route_info + f"\n\n【用户问题】\n{query}"
 
+
+def _category_keywords() -> Dict[str, List[str]]:
+    """路由类别 -> 关键词列表"""
+    return {
+        "knowledge": QueryRouter.KNOWLEDGE_KEYWORDS,
+        "data": QueryRouter.DATA_KEYWORDS,
+        "interface": QueryRouter.INTERFACE_KEYWORDS,
+    }
+
+
+def _build_keyword_automaton():
+    """将三类关键词合并构建为一个 Aho-Corasick 自动机，未安装 pyahocorasick 时返回 None"""
+    if ahocorasick is None:
+        return None
+    
+    # 同一关键词可能属于多个类别（如“信息”）
+    keyword_categories = defaultdict(list)
+    for category, keywords in _category_keywords().items():
+        for keyword in keywords:
+            keyword_categories[keyword.lower()].append(category)
+    
+    automaton = ahocorasick.Automaton()
+    for keyword, categories in keyword_categories.items():
+        automaton.add_word(keyword, (keyword, tuple(categories)))
+    automaton.make_automaton()
+    return automaton
+
+
+def _build_keyword_patterns() -> Dict[str, "re.Pattern"]:
+    """
+    每类关键词编译为一个忽略大小写的正则
+    
+    关键词之间可能重叠（一个关键词是另一个的前缀或首尾相接），
+    用零宽前瞻在每个位置尝试匹配，长关键词优先，避免漏计。
+    """
+    patterns = {}
+    for category, keywords in _category_keywords().items():
+        alternation = "|".join(map(re.escape, sorted(keywords, key=len, reverse=True)))
+        patterns[category] = re.compile(f"(?=({alternation}))", re.IGNORECASE)
+    return patterns
+
+
+_KEYWORD_AUTOMATON = _build_keyword_automaton()
+_KEYWORD_PATTERNS = _build_keyword_patterns()
@@ -2,7 +2,6 @@
 API数据源
 """
 from typing import List, Dict, Any
-import httpx
 from loguru import logger
 
 from app.services.datasource.base import BaseDataSource
@@ -19,13 +18,13 @@ class APIDataSource(BaseDataSource):
                 raise ValueError("未指定API URL")
             
             # 测试连接
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    url,
-                    headers=self.config.get("headers", {}),
-                    timeout=10.0
-                )
-                response.raise_for_status()
+            client = self._get_http_client()
+            response = await client.get(
+                url,
+                headers=self.config.get("headers", {}),
+                timeout=10.0
+            )
+            response.raise_for_status()
             
             self.connected = True
             logger.info(f"成功连接到API: {url}")
@@ -49,26 +48,26 @@ class APIDataSource(BaseDataSource):
             params = self.config.get("params", {})
             body = self.config.get("body", {})
             
-            async with httpx.AsyncClient() as client:
-                if method == "GET":
-                    response = await client.get(
-                        url,
-                        headers=headers,
-                        params=params,
-                        timeout=30.0
-                    )
-                elif method == "POST":
-                    response = await client.post(
-                        url,
-                        headers=headers,
-                        json=body,
-                        timeout=30.0
-                    )
-                else:
-                    raise ValueError(f"不支持的HTTP方法: {method}")
-                
-                response.raise_for_status()
-                data = response.json()
+            client = self._get_http_client()
+            if method == "GET":
+                response = await client.get(
+                    url,
+                    headers=headers,
+                    params=params,
+                    timeout=30.0
+                )
+            elif method == "POST":
+                response = await client.post(
+                    url,
+                    headers=headers,
+                    json=body,
+                    timeout=30.0
+                )
+            else:
+                raise ValueError(f"不支持的HTTP方法: {method}")
+            
+            response.raise_for_status()
+            data = response.json()
             
             # 解析响应数据
             results = self._parse_response(data)
@@ -128,6 +127,7 @@ class APIDataSource(BaseDataSource):
     
     async def disconnect(self) -> bool:
         """断开连接"""
+        await self._close_http_client()
         self.connected = False
         return True
 
@@ -1,10 +1,16 @@
 """
 数据源基类
 """
+import re
 from abc import ABC, abstractmethod
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 
+import httpx
+
+# 连续空白字符（与 str.split() 的空白定义一致）
+_WS_RE = re.compile(r"\s+")
+
 
 class BaseDataSource(ABC):
     """数据源基类"""
@@ -18,6 +24,7 @@ class BaseDataSource(ABC):
         """
         self.config = config
         self.connected = False
+        self._client: Optional[httpx.AsyncClient] = None
     
     @abstractmethod
     async def connect(self) -> bool:
@@ -64,12 +71,40 @@ class BaseDataSource(ABC):
         try:
             connected = await self.connect()
             if connected:
-                await self.disconnect()
                 return {"valid": True, "message": "配置验证成功"}
             else:
                 return {"valid": False, "message": "无法连接到数据源"}
         except Exception as e:
             return {"valid": False, "message": f"配置验证失败: {str(e)}"}
+        finally:
+            # 连接失败时也可能已创建客户端，统一释放
+            await self.disconnect()
+    
+    def _get_http_client(self, headers: Optional[Dict[str, str]] = None) -> httpx.AsyncClient:
+        """
+        获取实例内共享的 HTTP 客户端（首次调用时创建，disconnect 时关闭）
+        
+        同一数据源的多次请求复用 keep-alive 连接，省去重复的 TCP/TLS 握手。
+        
+        Args:
+            headers: 客户端默认请求头，仅在创建时生效
+            
+        Returns:
+            HTTP 客户端
+        """
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=True,
+                limits=httpx.Limits(max_keepalive_connections=50, max_connections=100),
+                headers=headers,
+            )
+        return self._client
+    
+    async def _close_http_client(self) -> None:
+        """关闭共享的 HTTP 客户端"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
     
     def preprocess_content(self, content: str) -> str:
         """
@@ -81,11 +116,9 @@ class BaseDataSource(ABC):
         Returns:
             处理后的内容
         """
-        # 移除多余空白
-        content = " ".join(content.split())
+        # 移除多余空白（一次正则替换，不再拆分出逐词的列表）
+        content = _WS_RE.sub(" ", content).strip()
         # 限制长度（可配置）
         max_length = self.config.get("max_content_length", 1000000)
-        if len(content) > max_length:
-            content = content[:max_length]
-        return content
+        return content[:max_length] if len(content) > max_length else content
 
@@ -4,8 +4,7 @@
 from typing import List, Dict, Any, Set
 from urllib.parse import urljoin, urlparse
 import asyncio
-import httpx
-from bs4 import BeautifulSoup
+from selectolax.lexbor import LexborHTMLParser
 from loguru import logger
 
 from app.services.datasource.base import BaseDataSource
@@ -19,6 +18,7 @@ class WebCrawlerDataSource(BaseDataSource):
         self.visited_urls: Set[str] = set()
         self.max_depth = config.get("max_depth", 3)
         self.delay = config.get("delay", 1)  # 秒
+        self.concurrency = max(int(config.get("concurrency", 10)), 1)
         self.user_agent = config.get("user_agent", "CoreMind Bot 1.0")
     
     async def connect(self) -> bool:
@@ -29,14 +29,13 @@ class WebCrawlerDataSource(BaseDataSource):
                 raise ValueError("未指定起始URL")
             
             # 测试连接
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    start_url,
-                    headers={"User-Agent": self.user_agent},
-                    timeout=10.0,
-                    follow_redirects=True
-                )
-                response.raise_for_status()
+            client = self._get_http_client(headers={"User-Agent": self.user_agent})
+            response = await client.get(
+                start_url,
+                timeout=10.0,
+                follow_redirects=True
+            )
+            response.raise_for_status()
             
             self.connected = True
             logger.info(f"成功连接到网页: {start_url}")
@@ -55,8 +54,21 @@ class WebCrawlerDataSource(BaseDataSource):
         start_url = self.config.get("start_url")
         
         try:
-            # 开始爬取
-            await self._crawl_recursive(start_url, 0, results)
+            # 广度优先爬取：多个工作协程并发消费同一个待爬队列
+            queue: asyncio.Queue = asyncio.Queue()
+            self.visited_urls.add(start_url)
+            queue.put_nowait((start_url, 0))
+            
+            workers = [
+                asyncio.create_task(self._crawl_worker(queue, results))
+                for _ in range(self.concurrency)
+            ]
+            try:
+                await queue.join()
+            finally:
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
             
             logger.info(f"爬取了 {len(results)} 个网页")
             return results
@@ -65,46 +77,52 @@ class WebCrawlerDataSource(BaseDataSource):
             logger.error(f"爬取网页失败: {str(e)}")
             return []
     
-    async def _crawl_recursive(
+    async def _crawl_worker(
+        self,
+        queue: asyncio.Queue,
+        results: List[Dict[str, Any]]
+    ):
+        """爬取工作协程：不断从队列取出 URL 抓取，每个协程两次抓取之间间隔 delay 秒"""
+        fetched = False
+        while True:
+            url, depth = await queue.get()
+            try:
+                # 延迟
+                if fetched and self.delay > 0:
+                    await asyncio.sleep(self.delay)
+                fetched = True
+                
+                await self._crawl_page(url, depth, queue, results)
+            finally:
+                queue.task_done()
+    
+    async def _crawl_page(
         self,
         url: str,
         depth: int,
+        queue: asyncio.Queue,
         results: List[Dict[str, Any]]
     ):
-        """递归爬取"""
-        # 检查深度限制
-        if depth > self.max_depth:
-            return
-        
-        # 检查是否已访问
-        if url in self.visited_urls:
-            return
-        
-        self.visited_urls.add(url)
-        
+        """抓取单个页面，并将未访问的链接加入待爬队列"""
         try:
-            # 延迟
-            if self.delay > 0 and len(self.visited_urls) > 1:
-                await asyncio.sleep(self.delay)
-            
-            # 获取网页内容
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    url,
-                    headers={"User-Agent": self.user_agent},
-                    timeout=30.0,
-                    follow_redirects=True
-                )
-                response.raise_for_status()
-            
-            # 解析HTML
-            soup = BeautifulSoup(response.text, "html.parser")
+            # 获取网页内容（复用同一客户端，同站点页面共享 keep-alive 连接）
+            client = self._get_http_client(headers={"User-Agent": self.user_agent})
+            response = await client.get(
+                url,
+                timeout=30.0,
+                follow_redirects=True
+            )
+            response.raise_for_status()
+            
+            # 解析HTML（Lexbor C 解析器）
+            tree = LexborHTMLParser(response.text)
             
             # 提取标题
-            title = soup.title.string if soup.title else url
+            title_node = tree.css_first("title")
+            title = (title_node.text(strip=True) if title_node else "") or url
             
             # 提取正文内容
-            content = self._extract_content(soup)
+            content = self._extract_content(tree)
             
             if content:
                 results.append({
@@ -116,38 +134,39 @@ class WebCrawlerDataSource(BaseDataSource):
                     }
                 })
             
-            # 提取链接并继续爬取
+            # 提取链接加入队列（检查与标记之间没有 await，协程间无需加锁）
             if depth < self.max_depth:
-                links = self._extract_links(soup, url)
-                for link in links:
-                    await self._crawl_recursive(link, depth + 1, results)
+                for link in self._extract_links(tree, url):
+                    if link not in self.visited_urls:
+                        self.visited_urls.add(link)
+                        queue.put_nowait((link, depth + 1))
             
         except Exception as e:
             logger.warning(f"爬取URL失败 {url}: {str(e)}")
     
-    def _extract_content(self, soup: BeautifulSoup) -> str:
+    def _extract_content(self, tree: LexborHTMLParser) -> str:
         """提取网页正文内容"""
         # 移除脚本和样式
-        for script in soup(["script", "style"]):
-            script.decompose()
+        for node in tree.css("script, style"):
+            node.decompose()
         
         # 尝试找到主要内容区域
         main_content = (
-            soup.find("main") or
-            soup.find("article") or
-            soup.find("div", class_="content") or
-            soup.find("div", id="content") or
-            soup.body
+            tree.css_first("main") or
+            tree.css_first("article") or
+            tree.css_first("div.content") or
+            tree.css_first("div#content") or
+            tree.body
         )
         
         if main_content:
             # 提取文本
-            text = main_content.get_text(separator=" ", strip=True)
+            text = main_content.text(separator=" ", strip=True)
             return text
         
         return ""
     
-    def _extract_links(self, soup: BeautifulSoup, base_url: str) -> List[str]:
+    def _extract_links(self, tree: LexborHTMLParser, base_url: str) -> List[str]:
         """提取页面中的链接"""
         links = []
         base_domain = urlparse(base_url).netloc
@@ -157,8 +176,10 @@ class WebCrawlerDataSource(BaseDataSource):
         exclude_patterns = self.config.get("exclude_patterns", [])
         same_domain_only = self.config.get("same_domain_only", True)
         
-        for link in soup.find_all("a", href=True):
-            href = link["href"]
+        for link in tree.css("a[href]"):
+            href = link.attributes.get("href")
+            if not href:
+                continue
             
             # 构建完整URL
             full_url = urljoin(base_url, href)
@@ -189,6 +210,7 @@ class WebCrawlerDataSource(BaseDataSource):
     
     async def disconnect(self) -> bool:
         """断开连接"""
+        await self._close_http_client()
         self.visited_urls.clear()
         self.connected = False
         return True
@@ -1,13 +1,22 @@
 """
 知识库管理服务
 """
-from app.services.knowledge.vectorstore import VectorStore
-from app.services.knowledge.embeddings import EmbeddingService
+from app.services.knowledge.vectorstore import (
+    VectorStore,
+    get_vectorstore,
+    evict_vectorstore,
+    drop_collection,
+)
+from app.services.knowledge.embeddings import EmbeddingService, get_embedding_service
 from app.services.knowledge.text_splitter import TextSplitterService
 
 __all__ = [
     "VectorStore",
+    "get_vectorstore",
+    "evict_vectorstore",
+    "drop_collection",
     "EmbeddingService",
+    "get_embedding_service",
     "TextSplitterService",
 ]
 
@@ -2,6 +2,7 @@
 嵌入向量服务
 """
 from typing import List, Optional
+from functools import lru_cache
 from loguru import logger
 from urllib.parse import urlparse
 
@@ -280,6 +281,23 @@ class EmbeddingService:
                             self.model = SentenceTransformer(local_default_model)
                         else:
                             raise
+                
+                if settings.LOCAL_EMBEDDING_QUANTIZE:
+                    self._quantize()
+
+            def _quantize(self):
+                """对CPU上的模型做int8动态量化（仅量化Linear层，失败时保持FP32）"""
+                try:
+                    import torch
+                    
+                    if self.model.device.type != "cpu":
+                        return
+                    self.model = torch.quantization.quantize_dynamic(
+                        self.model, {torch.nn.Linear}, dtype=torch.qint8
+                    )
+                    logger.info("本地嵌入模型已启用int8动态量化")
+                except Exception as e:
+                    logger.warning(f"嵌入模型量化失败，继续使用FP32: {str(e)}")
 
             def embed_query(self, text: str):
                 vector = self.model.encode([text], convert_to_numpy=True)[0]
@@ -339,3 +357,16 @@ class EmbeddingService:
             logger.error(f"批量生成嵌入向量失败: {str(e)}")
             raise
 
+
+@lru_cache(maxsize=16)
+def get_embedding_service(model_name: Optional[str] = None) -> EmbeddingService:
+    """
+    获取共享的嵌入服务实例（按模型名缓存，模型在进程内只加载一次）
+    
+    Args:
+        model_name: 模型名称
+        
+    Returns:
+        嵌入服务实例
+    """
+    return EmbeddingService(model_name)
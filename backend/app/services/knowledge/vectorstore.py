@@ -1,7 +1,11 @@
 """
 向量存储服务
 """
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Hashable, Optional
+from collections import OrderedDict
+from functools import lru_cache, partial
+import asyncio
+import hashlib
 import os
 import chromadb
 from chromadb.config import Settings
@@ -18,7 +22,35 @@ except (ImportError, AttributeError):
     pass
 
 from app.core.config import settings
-from app.services.knowledge.embeddings import EmbeddingService
+from app.services.knowledge.embeddings import EmbeddingService, get_embedding_service
+from app.utils.cache import retrieval_cache
+
+
+# 进程内最多缓存的向量存储实例数量
+_VECTORSTORE_CACHE_SIZE = 16
+_vectorstore_cache: "OrderedDict[tuple, VectorStore]" = OrderedDict()
+
+# 本进程内的集合写入版本号：参与检索缓存键，使本进程的写入立即生效；
+# 其他 worker 的写入由调用方传入的 cache_version（来自数据库）体现
+_collection_versions: Dict[str, int] = {}
+
+
+def _bump_collection_version(collection_name: str) -> None:
+    """集合内容变更时递增版本号"""
+    _collection_versions[collection_name] = _collection_versions.get(collection_name, 0) + 1
+
+
+@lru_cache(maxsize=1)
+def _get_chroma_client():
+    """获取进程内共享的ChromaDB持久化客户端"""
+    # 注意：遥测已在 main.py 启动时通过环境变量禁用
+    return chromadb.PersistentClient(
+        path=settings.CHROMA_PERSIST_DIRECTORY,
+        settings=Settings(
+            anonymized_telemetry=False,
+            allow_reset=True
+        )
+    )
 
 
 class VectorStore:
@@ -46,15 +78,8 @@ class VectorStore:
     def _initialize_client(self):
         """初始化ChromaDB客户端"""
         try:
-            # 创建持久化客户端
-            # 注意：遥测已在 main.py 启动时通过环境变量禁用
-            self.client = chromadb.PersistentClient(
-                path=settings.CHROMA_PERSIST_DIRECTORY,
-                settings=Settings(
-                    anonymized_telemetry=False,
-                    allow_reset=True
-                )
-            )
+            # 复用共享的持久化客户端
+            self.client = _get_chroma_client()
             
             # 获取或创建集合
             self.collection = self.client.get_or_create_collection(
@@ -71,7 +96,7 @@ class VectorStore:
     def _get_embedding_service(self) -> EmbeddingService:
         """懒加载嵌入服务"""
         if self._embedding_service is None:
-            self._embedding_service = EmbeddingService(self.embedding_model)
+            self._embedding_service = get_embedding_service(self.embedding_model)
         return self._embedding_service
 
     async def add_documents(
@@ -110,6 +135,7 @@ class VectorStore:
                 metadatas=metadatas,
                 ids=ids
             )
+            _bump_collection_version(self.collection_name)
             
             logger.info(f"成功添加 {len(documents)} 个文档到向量存储")
             return ids
@@ -122,7 +148,8 @@ class VectorStore:
         self,
         query: str,
         top_k: int = 5,
-        filter_dict: Optional[Dict[str, Any]] = None
+        filter_dict: Optional[Dict[str, Any]] = None,
+        cache_version: Optional[Hashable] = None
     ) -> List[Dict[str, Any]]:
         """
         搜索相似文档
@@ -131,20 +158,44 @@ class VectorStore:
             query: 查询文本
             top_k: 返回结果数量
             filter_dict: 元数据过滤条件
+            cache_version: 集合内容版本（如知识库记录的 updated_at 与切片数），
+                所有 worker 都能从数据库读到同一个值；不传则不使用检索缓存
             
         Returns:
             搜索结果列表，每个结果包含content, metadata, distance
         """
+        # 相同查询（忽略大小写与首尾空白）命中缓存时跳过向量化与检索；
+        # 检索缓存是进程内的，必须由调用方提供跨进程可见的版本才能保证其他 worker 写入后失效；带过滤条件的查询不缓存
+        cache_key = None
+        if cache_version is not None and filter_dict is None:
+            digest = hashlib.blake2b(query.strip().lower().encode(), digest_size=16).hexdigest()
+            cache_key = (
+                self.collection_name,
+                self.embedding_model,
+                cache_version,
+                _collection_versions.get(self.collection_name, 0),
+                digest,
+                top_k,
+            )
+            cached = retrieval_cache.get(cache_key)
+            if cached is not None:
+                return list(cached)
+        
         try:
             # 生成查询向量
             embedding_service = self._get_embedding_service()
             query_embedding = await embedding_service.embed_text(query)
             
-            # 搜索
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=top_k,
-                where=filter_dict,
+            # 搜索（Chroma 查询是同步的，放到线程池执行，避免阻塞事件循环上的其他请求与并发检索）
+            loop = asyncio.get_running_loop()
+            results = await loop.run_in_executor(
+                None,
+                partial(
+                    self.collection.query,
+                    query_embeddings=[query_embedding],
+                    n_results=top_k,
+                    where=filter_dict,
+                )
             )
             
             # 格式化结果
@@ -159,7 +210,9 @@ class VectorStore:
                     })
             
             logger.info(f"搜索完成，找到 {len(formatted_results)} 个结果")
-            return formatted_results
+            if cache_key is not None:
+                retrieval_cache.set(cache_key, formatted_results)
+            return list(formatted_results)
             
         except Exception as e:
             logger.error(f"搜索失败: {str(e)}")
@@ -177,6 +230,7 @@ class VectorStore:
         """
         try:
             self.collection.delete(ids=ids)
+            _bump_collection_version(self.collection_name)
             logger.info(f"成功删除 {len(ids)} 个文档")
             return True
         except Exception as e:
@@ -192,6 +246,7 @@ class VectorStore:
         """
         try:
             self.client.delete_collection(name=self.collection_name)
+            _bump_collection_version(self.collection_name)
             logger.info(f"成功删除集合: {self.collection_name}")
             return True
         except Exception as e:
@@ -215,3 +270,58 @@ class VectorStore:
             logger.error(f"获取集合统计信息失败: {str(e)}")
             return {}
 
+
+def get_vectorstore(collection_name: str, embedding_model: Optional[str] = None) -> VectorStore:
+    """
+    获取共享的向量存储实例（按集合名与嵌入模型做LRU缓存，复用客户端与已加载的嵌入模型）
+    
+    Args:
+        collection_name: 集合名称
+        embedding_model: 嵌入模型名称
+        
+    Returns:
+        向量存储实例
+    """
+    key = (collection_name, embedding_model)
+    vectorstore = _vectorstore_cache.get(key)
+    if vectorstore is None:
+        # 初始化是同步的，事件循环内不会出现并发重复初始化，无需加锁
+        vectorstore = VectorStore(collection_name, embedding_model)
+        _vectorstore_cache[key] = vectorstore
+        if len(_vectorstore_cache) > _VECTORSTORE_CACHE_SIZE:
+            _vectorstore_cache.popitem(last=False)
+    else:
+        _vectorstore_cache.move_to_end(key)
+    return vectorstore
+
+
+def evict_vectorstore(collection_name: str) -> None:
+    """
+    从缓存中移除指定集合的向量存储实例（集合被删除时调用）
+    
+    Args:
+        collection_name: 集合名称
+    """
+    for key in [key for key in _vectorstore_cache if key[0] == collection_name]:
+        del _vectorstore_cache[key]
+
+
+def drop_collection(collection_name: str) -> bool:
+    """
+    删除集合并移除其缓存的向量存储实例（无需为待删除的集合构造实例）
+    
+    Args:
+        collection_name: 集合名称
+        
+    Returns:
+        删除是否成功
+    """
+    evict_vectorstore(collection_name)
+    try:
+        _get_chroma_client().delete_collection(name=collection_name)
+        _bump_collection_version(collection_name)
+        logger.info(f"成功删除集合: {collection_name}")
+        return True
+    except Exception as e:
+        logger.error(f"删除集合失败: {str(e)}")
+        return False
@@ -3,12 +3,66 @@ LLM服务 - 支持多种LLM提供商
 """
 from typing import List, Dict, Any, Optional, AsyncGenerator
 import httpx
+import orjson
 from app.models.llm_config import LLMConfig, LLMProvider
 from app.utils.crypto import decrypt_text
 from app.core.logging import setup_logging
+from app.utils.cache import llm_service_cache
 
 logger = setup_logging()
 
+# OpenAI 兼容接口的默认地址（支持 stream=True 的 SSE 流式输出）
+_OPENAI_COMPATIBLE_URLS = {
+    LLMProvider.OPENAI: "https://api.openai.com/v1/chat/completions",
+    LLMProvider.DEEPSEEK: "https://api.deepseek.com/v1/chat/completions",
+    LLMProvider.ALIBABA_QWEN: "https://dashscope.aliyuncs.com/compatible-mode/v1/chat/completions",
+    LLMProvider.ZHIPU_AI: "https://open.bigmodel.cn/api/paas/v4/chat/completions",
+    LLMProvider.MOONSHOT: "https://api.moonshot.cn/v1/chat/completions",
+}
+
+# 出站请求超时（秒），本地 Ollama 推理较慢单独放宽
+_DEFAULT_TIMEOUT = 60.0
+_OLLAMA_TIMEOUT = 120.0
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    """获取进程内共享的HTTP客户端（复用连接池，避免每次调用重新建立TCP/TLS连接）"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=_DEFAULT_TIMEOUT,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """关闭共享的HTTP客户端（应用关闭时调用）"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def get_llm_service(llm_config: LLMConfig) -> "LLMService":
+    """
+    获取LLM服务实例（按配置ID与更新时间缓存，配置修改后自动失效）
+    
+    Args:
+        llm_config: LLM配置对象
+        
+    Returns:
+        LLM服务实例
+    """
+    key = (llm_config.id, llm_config.updated_at)
+    llm_service = llm_service_cache.get(key)
+    if llm_service is None:
+        llm_service = LLMService(llm_config)
+        llm_service_cache.set(key, llm_service)
+    return llm_service
+
 
 class LLMService:
     """LLM服务类"""
@@ -21,7 +75,8 @@ class LLMService:
             llm_config: LLM配置对象
         """
         self.config = llm_config
-        self.provider = llm_config.provider
+        # 数据库中存储的是提供商取值，构造时转换一次枚举
+        self.provider = LLMProvider(llm_config.provider)
         self.model_name = llm_config.model_name
         self.api_key = decrypt_text(llm_config.api_key) if llm_config.api_key else ""
         self.api_base = llm_config.api_base or ""
@@ -74,93 +129,220 @@ class LLMService:
             logger.error(f"LLM调用失败: {e}")
             raise
     
+    async def chat_stream(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: Optional[str] = None
+    ) -> AsyncGenerator[str, None]:
+        """
+        流式发送聊天消息
+        
+        Args:
+            messages: 消息列表，格式: [{"role": "user", "content": "..."}]
+            system_prompt: 系统提示词
+            
+        Yields:
+            AI回复内容分片
+        """
+        chat_messages = []
+        if system_prompt:
+            chat_messages.append({"role": "system", "content": system_prompt})
+        chat_messages.extend(messages)
+        
+        if self.provider == LLMProvider.OLLAMA:
+            stream = self._stream_ollama(chat_messages)
+        else:
+            url = self._openai_compatible_url()
+            if url is None:
+                # 不支持流式的接口（如通义千问旧版API），退化为一次性返回
+                yield await self.chat(messages, system_prompt)
+                return
+            stream = self._stream_openai_compatible(url, chat_messages)
+        
+        async for chunk in stream:
+            yield chunk
+    
+    def _openai_compatible_url(self) -> Optional[str]:
+        """获取OpenAI兼容接口地址，不兼容时返回None"""
+        if self.provider == LLMProvider.CUSTOM:
+            if not self.api_base:
+                raise ValueError("自定义LLM需要配置api_base")
+            return f"{self.api_base.rstrip('/')}/chat/completions"
+        if self.provider not in _OPENAI_COMPATIBLE_URLS:
+            return None
+        if self.provider == LLMProvider.ALIBABA_QWEN and self.api_base and "compatible-mode" not in self.api_base:
+            return None
+        if self.api_base:
+            return f"{self.api_base.rstrip('/')}/chat/completions"
+        return _OPENAI_COMPATIBLE_URLS[self.provider]
+    
+    async def _stream_openai_compatible(
+        self,
+        url: str,
+        messages: List[Dict[str, str]]
+    ) -> AsyncGenerator[str, None]:
+        """以SSE方式调用OpenAI兼容接口"""
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        
+        if self.provider == LLMProvider.CUSTOM:
+            payload = self.extra_config.copy()
+            if "headers" in self.extra_config:
+                headers.update(self.extra_config["headers"])
+        else:
+            payload = {}
+        payload.update({
+            "model": self.model_name,
+            "messages": messages,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "stream": True
+        })
+        
+        client = _get_http_client()
+        async with client.stream("POST", url, headers=headers, json=payload) as response:
+            if response.status_code >= 400:
+                body = (await response.aread()).decode("utf-8", errors="ignore")
+                raise ValueError(f"API调用失败（{response.status_code}）: {body[:200]}")
+            
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    choices = orjson.loads(data).get("choices") or []
+                except orjson.JSONDecodeError:
+                    continue
+                if choices:
+                    content = (choices[0].get("delta") or {}).get("content")
+                    if content:
+                        yield content
+    
+    async def _stream_ollama(self, messages: List[Dict[str, str]]) -> AsyncGenerator[str, None]:
+        """以流式方式调用Ollama本地API（逐行JSON）"""
+        url = f"{self.api_base.rstrip('/')}/api/chat" if self.api_base else "http://localhost:11434/api/chat"
+        ollama_messages = [
+            {"role": msg["role"], "content": msg["content"]}
+            for msg in messages
+            if msg["role"] != "system"  # Ollama不支持system角色
+        ]
+        
+        client = _get_http_client()
+        async with client.stream(
+            "POST",
+            url,
+            json={
+                "model": self.model_name,
+                "messages": ollama_messages,
+                "stream": True,
+                "options": {
+                    "temperature": self.temperature,
+                    "num_predict": self.max_tokens
+                }
+            },
+            timeout=_OLLAMA_TIMEOUT
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                result = orjson.loads(line)
+                content = (result.get("message") or {}).get("content")
+                if content:
+                    yield content
+                if result.get("done"):
+                    break
+    
     async def _call_openai(self, messages: List[Dict[str, str]]) -> str:
         """调用OpenAI API"""
         url = f"{self.api_base.rstrip('/')}/chat/completions" if self.api_base else "https://api.openai.com/v1/chat/completions"
         
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            try:
-                response = await client.post(
-                    url,
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": self.model_name,
-                        "messages": messages,
-                        "temperature": self.temperature,
-                        "max_tokens": self.max_tokens
-                    }
+        client = _get_http_client()
+        try:
+            response = await client.post(
+                url,
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "model": self.model_name,
+                    "messages": messages,
+                    "temperature": self.temperature,
+                    "max_tokens": self.max_tokens
+                }
+            )
+            response.raise_for_status()
+            result = response.json()
+            return result["choices"][0]["message"]["content"]
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 401:
+                raise ValueError(
+                    f"API密钥认证失败（401 Unauthorized）。"
+                    f"请检查：\n"
+                    f"1. API密钥是否正确（格式：sk-xxx）\n"
+                    f"2. API密钥是否已激活\n"
+                    f"3. API密钥是否有访问此模型的权限"
                 )
-                response.raise_for_status()
-                result = response.json()
-                return result["choices"][0]["message"]["content"]
-            except httpx.HTTPStatusError as e:
-                if e.response.status_code == 401:
-                    raise ValueError(
-                        f"API密钥认证失败（401 Unauthorized）。"
-                        f"请检查：\n"
-                        f"1. API密钥是否正确（格式：sk-xxx）\n"
-                        f"2. API密钥是否已激活\n"
-                        f"3. API密钥是否有访问此模型的权限"
-                    )
-                elif e.response.status_code == 429:
-                    raise ValueError(
-                        f"请求频率过高（429 Too Many Requests）。"
-                        f"请稍后重试或检查：\n"
-                        f"1. API调用频率限制\n"
-                        f"2. 账户余额是否充足"
-                    )
-                else:
-                    error_detail = ""
-                    try:
-                        error_body = e.response.json()
-                        error_detail = error_body.get("error", {}).get("message", str(error_body))
-                    except:
-                        error_detail = e.response.text[:200]
-                    raise ValueError(f"API调用失败（{e.response.status_code}）: {error_detail}")
-            except httpx.RequestError as e:
-                raise ValueError(f"网络请求失败: {str(e)}。请检查网络连接。")
+            elif e.response.status_code == 429:
+                raise ValueError(
+                    f"请求频率过高（429 Too Many Requests）。"
+                    f"请稍后重试或检查：\n"
+                    f"1. API调用频率限制\n"
+                    f"2. 账户余额是否充足"
+                )
+            else:
+                error_detail = ""
+                try:
+                    error_body = e.response.json()
+                    error_detail = error_body.get("error", {}).get("message", str(error_body))
+                except:
+                    error_detail = e.response.text[:200]
+                raise ValueError(f"API调用失败（{e.response.status_code}）: {error_detail}")
+        except httpx.RequestError as e:
+            raise ValueError(f"网络请求失败: {str(e)}。请检查网络连接。")
     
     async def _call_deepseek(self, messages: List[Dict[str, str]]) -> str:
         """调用DeepSeek API"""
         url = f"{self.api_base.rstrip('/')}/chat/completions" if self.api_base else "https://api.deepseek.com/v1/chat/completions"
         
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            try:
-                response = await client.post(
-                    url,
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": self.model_name,
-                        "messages": messages,
-                        "temperature": self.temperature,
-                        "max_tokens": self.max_tokens
-                    }
+        client = _get_http_client()
+        try:
+            response = await client.post(
+                url,
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "model": self.model_name,
+                    "messages": messages,
+                    "temperature": self.temperature,
+                    "max_tokens": self.max_tokens
+                }
+            )
+            response.raise_for_status()
+            result = response.json()
+            return result["choices"][0]["message"]["content"]
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 401:
+                raise ValueError(
+                    f"API密钥认证失败（401 Unauthorized）。"
+                    f"请检查API密钥是否正确。"
                 )
-                response.raise_for_status()
-                result = response.json()
-                return result["choices"][0]["message"]["content"]
-            except httpx.HTTPStatusError as e:
-                if e.response.status_code == 401:
-                    raise ValueError(
-                        f"API密钥认证失败（401 Unauthorized）。"
-                        f"请检查API密钥是否正确。"
-                    )
-                else:
-                    error_detail = ""
-                    try:
-                        error_body = e.response.json()
-                        error_detail = error_body.get("message", error_body.get("error", ""))
-                    except:
-                        error_detail = e.response.text[:200]
-                    raise ValueError(f"API调用失败（{e.response.status_code}）: {error_detail}")
-            except httpx.RequestError as e:
-                raise ValueError(f"网络请求失败: {str(e)}。请检查网络连接。")
+            else:
+                error_detail = ""
+                try:
+                    error_body = e.response.json()
+                    error_detail = error_body.get("message", error_body.get("error", ""))
+                except:
+                    error_detail = e.response.text[:200]
+                raise ValueError(f"API调用失败（{e.response.status_code}）: {error_detail}")
+        except httpx.RequestError as e:
+            raise ValueError(f"网络请求失败: {str(e)}。请检查网络连接。")
     
     async def _call_alibaba_qwen(self, messages: List[Dict[str, str]]) -> str:
         """调用阿里云通义千问API"""
@@ -208,105 +390,105 @@ class LLMService:
                 "max_tokens": self.max_tokens
             }
         
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            try:
-                response = await client.post(
-                    url,
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json=request_data
-                )
-                response.raise_for_status()
-                result = response.json()
-                
-                # 兼容模式返回格式
-                if "choices" in result:
-                    return result["choices"][0]["message"]["content"]
-                # 旧版API返回格式
-                elif "output" in result and "choices" in result["output"]:
-                    return result["output"]["choices"][0]["message"]["content"]
-                else:
-                    raise ValueError(f"未知的响应格式: {result}")
-            except httpx.HTTPStatusError as e:
-                if e.response.status_code == 401:
-                    raise ValueError(
-                        f"API密钥认证失败（401 Unauthorized）。"
-                        f"请检查：\n"
-                        f"1. API密钥是否正确（格式：sk-xxx）\n"
-                        f"2. API密钥是否已激活\n"
-                        f"3. API密钥是否有足够的权限"
-                    )
-                elif e.response.status_code == 403:
-                    raise ValueError(
-                        f"API访问被拒绝（403 Forbidden）。"
-                        f"请检查：\n"
-                        f"1. API密钥是否有访问此模型的权限\n"
-                        f"2. 账户余额是否充足"
-                    )
-                else:
-                    error_detail = ""
-                    try:
-                        error_body = e.response.json()
-                        error_detail = error_body.get("message", error_body.get("error", ""))
-                    except:
-                        error_detail = e.response.text[:200]
-                    
-                    raise ValueError(
-                        f"API调用失败（{e.response.status_code}）: {error_detail}"
-                    )
-            except httpx.RequestError as e:
-                raise ValueError(
-                    f"网络请求失败: {str(e)}。"
-                    f"请检查：\n"
-                    f"1. 网络连接是否正常\n"
-                    f"2. API服务地址是否正确"
-                )
-    
-    async def _call_zhipu_ai(self, messages: List[Dict[str, str]]) -> str:
-        """调用智谱AI API"""
-        url = f"{self.api_base.rstrip('/')}/chat/completions" if self.api_base else "https://open.bigmodel.cn/api/paas/v4/chat/completions"
-        
-        async with httpx.AsyncClient(timeout=60.0) as client:
+        client = _get_http_client()
+        try:
             response = await client.post(
                 url,
                 headers={
                     "Authorization": f"Bearer {self.api_key}",
                     "Content-Type": "application/json"
                 },
-                json={
-                    "model": self.model_name,
-                    "messages": messages,
-                    "temperature": self.temperature,
-                    "max_tokens": self.max_tokens
-                }
+                json=request_data
             )
             response.raise_for_status()
             result = response.json()
-            return result["choices"][0]["message"]["content"]
+            
+            # 兼容模式返回格式
+            if "choices" in result:
+                return result["choices"][0]["message"]["content"]
+            # 旧版API返回格式
+            elif "output" in result and "choices" in result["output"]:
+                return result["output"]["choices"][0]["message"]["content"]
+            else:
+                raise ValueError(f"未知的响应格式: {result}")
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 401:
+                raise ValueError(
+                    f"API密钥认证失败（401 Unauthorized）。"
+                    f"请检查：\n"
+                    f"1. API密钥是否正确（格式：sk-xxx）\n"
+                    f"2. API密钥是否已激活\n"
+                    f"3. API密钥是否有足够的权限"
+                )
+            elif e.response.status_code == 403:
+                raise ValueError(
+                    f"API访问被拒绝（403 Forbidden）。"
+                    f"请检查：\n"
+                    f"1. API密钥是否有访问此模型的权限\n"
+                    f"2. 账户余额是否充足"
+                )
+            else:
+                error_detail = ""
+                try:
+                    error_body = e.response.json()
+                    error_detail = error_body.get("message", error_body.get("error", ""))
+                except:
+                    error_detail = e.response.text[:200]
+                
+                raise ValueError(
+                    f"API调用失败（{e.response.status_code}）: {error_detail}"
+                )
+        except httpx.RequestError as e:
+            raise ValueError(
+                f"网络请求失败: {str(e)}。"
+                f"请检查：\n"
+                f"1. 网络连接是否正常\n"
+                f"2. API服务地址是否正确"
+            )
+    
+    async def _call_zhipu_ai(self, messages: List[Dict[str, str]]) -> str:
+        """调用智谱AI API"""
+        url = f"{self.api_base.rstrip('/')}/chat/completions" if self.api_base else "https://open.bigmodel.cn/api/paas/v4/chat/completions"
+        
+        client = _get_http_client()
+        response = await client.post(
+            url,
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json"
+            },
+            json={
+                "model": self.model_name,
+                "messages": messages,
+                "temperature": self.temperature,
+                "max_tokens": self.max_tokens
+            }
+        )
+        response.raise_for_status()
+        result = response.json()
+        return result["choices"][0]["message"]["content"]
     
     async def _call_moonshot(self, messages: List[Dict[str, str]]) -> str:
         """调用月之暗面Kimi API"""
         url = f"{self.api_base.rstrip('/')}/chat/completions" if self.api_base else "https://api.moonshot.cn/v1/chat/completions"
         
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
-                url,
-                headers={
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": self.model_name,
-                    "messages": messages,
-                    "temperature": self.temperature,
-                    "max_tokens": self.max_tokens
-                }
-            )
-            response.raise_for_status()
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
+        client = _get_http_client()
+        response = await client.post(
+            url,
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json"
+            },
+            json={
+                "model": self.model_name,
+                "messages": messages,
+                "temperature": self.temperature,
+                "max_tokens": self.max_tokens
+            }
+        )
+        response.raise_for_status()
+        result = response.json()
+        return result["choices"][0]["message"]["content"]
     
     async def _call_ollama(self, messages: List[Dict[str, str]]) -> str:
         """调用Ollama本地API"""
@@ -321,22 +503,23 @@ class LLMService:
                     "content": msg["content"]
                 })
         
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            response = await client.post(
-                url,
-                json={
-                    "model": self.model_name,
-                    "messages": ollama_messages,
-                    "stream": False,
-                    "options": {
-                        "temperature": self.temperature,
-                        "num_predict": self.max_tokens
-                    }
+        client = _get_http_client()
+        response = await client.post(
+            url,
+            json={
+                "model": self.model_name,
+                "messages": ollama_messages,
+                "stream": False,
+                "options": {
+                    "temperature": self.temperature,
+                    "num_predict": self.max_tokens
                 }
-            )
-            response.raise_for_status()
-            result = response.json()
-            return result["message"]["content"]
+            },
+            timeout=_OLLAMA_TIMEOUT
+        )
+        response.raise_for_status()
+        result = response.json()
+        return result["message"]["content"]
     
     async def _call_custom(self, messages: List[Dict[str, str]]) -> str:
         """调用自定义API"""
@@ -362,22 +545,22 @@ class LLMService:
         if "headers" in self.extra_config:
             headers.update(self.extra_config["headers"])
         
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
-                url,
-                headers=headers,
-                json=custom_config
-            )
-            response.raise_for_status()
-            result = response.json()
-            
-            # 尝试多种响应格式
-            if "choices" in result and len(result["choices"]) > 0:
-                return result["choices"][0]["message"]["content"]
-            elif "content" in result:
-                return result["content"]
-            elif "text" in result:
-                return result["text"]
-            else:
-                return str(result)
+        client = _get_http_client()
+        response = await client.post(
+            url,
+            headers=headers,
+            json=custom_config
+        )
+        response.raise_for_status()
+        result = response.json()
+        
+        # 尝试多种响应格式
+        if "choices" in result and len(result["choices"]) > 0:
+            return result["choices"][0]["message"]["content"]
+        elif "content" in result:
+            return result["content"]
+        elif "text" in result:
+            return result["text"]
+        else:
+            return str(result)
 
@@ -0,0 +1,73 @@
+"""
+进程内 LRU + TTL 缓存
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """带过期时间的简单 LRU 缓存（仅用于单进程内读多写少的数据）"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        """
+        初始化缓存
+
+        Args:
+            maxsize: 最大条目数，超出时淘汰最久未使用的条目
+            ttl: 条目存活时间（秒）
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """获取缓存值，不存在或已过期时返回 default"""
+        item = self._data.get(key)
+        if item is None:
+            return default
+
+        value, expires_at = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return default
+
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """写入缓存值"""
+        self._data[key] = (value, time.monotonic() + (ttl if ttl is not None else self.ttl))
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        """删除缓存值"""
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# 对话归属校验缓存：(conversation_id, user_id) -> True
+conversation_owner_cache = TTLCache(maxsize=4096, ttl=30)
+
+# 知识库元信息缓存：kb_id -> (collection_name, embedding_model)
+knowledge_base_cache = TTLCache(maxsize=512, ttl=300)
+
+# LLM服务实例缓存：(llm_config_id, updated_at) -> LLMService
+llm_service_cache = TTLCache(maxsize=64, ttl=600)
+
+# 向量检索结果缓存：(collection_name, embedding_model, 知识库版本, 进程内集合版本, 查询摘要, top_k) -> 检索结果
+retrieval_cache = TTLCache(maxsize=256, ttl=300)
+
+# 助手可用服务列表缓存：(助手配置id, updated_at, 服务类型, 服务id元组) -> 服务描述列表
+assistant_services_cache = TTLCache(maxsize=1024, ttl=60)
+
+# 查询路由结果缓存：(规范化问题, 助手配置签名) -> 路由结果
+route_cache = TTLCache(maxsize=1024, ttl=300)
@@ -31,8 +31,9 @@ def encrypt_text(plain_text: str) -> str:
     return token.decode()
 
 
+@lru_cache(maxsize=256)
 def decrypt_text(token: str) -> str:
-    """解密Fernet密文"""
+    """解密Fernet密文（按密文缓存结果，同一密文解密结果恒定）"""
     if not token:
         return ""
     cipher = _get_cipher()
@@ -1,18 +1,73 @@
 """
 文件解析工具
 """
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
+import asyncio
+import multiprocessing
+import os
 import aiofiles
 from loguru import logger
 
 
+# 纯文本类文件直接异步读取，其余格式的解析是CPU密集的同步代码，放到进程池中执行
+_TEXT_SUFFIXES = frozenset((".txt", ".md"))
+
+
+@lru_cache(maxsize=1)
+def _get_process_pool() -> ProcessPoolExecutor:
+    """获取文件解析进程池（首次使用时创建）"""
+    # 使用 spawn 启动子进程，避免 fork 已加载嵌入模型和线程的主进程
+    return ProcessPoolExecutor(
+        max_workers=min(4, os.cpu_count() or 1),
+        mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def shutdown_parser_pool() -> None:
+    """关闭文件解析进程池（应用关闭时调用）"""
+    if _get_process_pool.cache_info().currsize:
+        _get_process_pool().shutdown(wait=False, cancel_futures=True)
+        _get_process_pool.cache_clear()
+
+
+def _parse_file_in_worker(file_path: str) -> Optional[str]:
+    """在子进程中解析文件（模块级函数以便进程池序列化）"""
+    return FileParser().parse_file_sync(file_path)
+
+
 class FileParser:
     """文件解析器"""
     
     async def parse_file(self, file_path: str) -> Optional[str]:
         """
-        解析文件内容
+        解析文件内容（CPU密集的格式在进程池中解析，不阻塞事件循环）
+        
+        Args:
+            file_path: 文件路径
+            
+        Returns:
+            文件内容文本
+        """
+        suffix = Path(file_path).suffix.lower()
+        
+        try:
+            if suffix in _TEXT_SUFFIXES:
+                # Markdown作为文本处理
+                async with aiofiles.open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+                    return await f.read()
+            
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(_get_process_pool(), _parse_file_in_worker, file_path)
+        except Exception as e:
+            logger.error(f"解析文件失败 {file_path}: {str(e)}")
+            return None
+    
+    def parse_file_sync(self, file_path: str) -> Optional[str]:
+        """
+        同步解析文件内容
         
         Args:
             file_path: 文件路径
@@ -25,17 +80,17 @@ class FileParser:
         
         try:
             if suffix == ".txt":
-                return await self._parse_txt(file_path)
+                return self._parse_txt(file_path)
             elif suffix == ".pdf":
-                return await self._parse_pdf(file_path)
+                return self._parse_pdf(file_path)
             elif suffix == ".docx":
-                return await self._parse_docx(file_path)
+                return self._parse_docx(file_path)
             elif suffix == ".xlsx":
-                return await self._parse_xlsx(file_path)
+                return self._parse_xlsx(file_path)
             elif suffix == ".csv":
-                return await self._parse_csv(file_path)
+                return self._parse_csv(file_path)
             elif suffix == ".md":
-                return await self._parse_txt(file_path)  # Markdown作为文本处理
+                return self._parse_txt(file_path)  # Markdown作为文本处理
             else:
                 logger.warning(f"不支持的文件类型: {suffix}")
                 return None
@@ -43,13 +98,12 @@ class FileParser:
             logger.error(f"解析文件失败 {file_path}: {str(e)}")
             return None
     
-    async def _parse_txt(self, file_path: str) -> str:
+    def _parse_txt(self, file_path: str) -> str:
         """解析文本文件"""
-        async with aiofiles.open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-            content = await f.read()
-        return content
+        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+            return f.read()
     
-    async def _parse_pdf(self, file_path: str) -> str:
+    def _parse_pdf(self, file_path: str) -> str:
         """解析PDF文件"""
         try:
             from pypdf import PdfReader
@@ -67,7 +121,7 @@ class FileParser:
             logger.error(f"解析PDF失败: {str(e)}")
             return ""
     
-    async def _parse_docx(self, file_path: str) -> str:
+    def _parse_docx(self, file_path: str) -> str:
         """解析Word文档"""
         try:
             from docx import Document
@@ -84,7 +138,7 @@ class FileParser:
             logger.error(f"解析DOCX失败: {str(e)}")
             return ""
     
-    async def _parse_xlsx(self, file_path: str) -> str:
+    def _parse_xlsx(self, file_path: str) -> str:
         """解析Excel文件"""
         try:
             import pandas as pd
@@ -104,7 +158,7 @@ class FileParser:
             logger.error(f"解析XLSX失败: {str(e)}")
             return ""
     
-    async def _parse_csv(self, file_path: str) -> str:
+    def _parse_csv(self, file_path: str) -> str:
         """解析CSV文件"""
         try:
             import pandas as pd
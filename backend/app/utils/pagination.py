@@ -0,0 +1,29 @@
+"""
+键集分页游标工具
+"""
+from datetime import datetime
+from typing import Tuple
+import base64
+import uuid
+
+from fastapi import HTTPException, status
+
+
+def encode_cursor(created_at: datetime, row_id: uuid.UUID) -> str:
+    """把 (created_at, id) 编码为分页游标"""
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    """解析分页游标，格式错误时抛出 HTTP 400"""
+    try:
+        # binascii.Error 与 UnicodeError 均为 ValueError 的子类
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, _, row_id = raw.partition("|")
+        return datetime.fromisoformat(created_at), uuid.UUID(row_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="无效的分页游标"
+        )
@@ -0,0 +1,66 @@
+"""
+SSE（Server-Sent Events）流式输出工具
+"""
+from typing import AsyncIterator, List, Optional
+import asyncio
+
+# SSE 事件的固定字节片段，避免逐块格式化与编码
+DATA_PREFIX = b"data: "
+SSE_SEP = b"\n\n"
+DONE_EVENT = b'data: {"done":true}\n\n'
+
+# 流式分片合并阈值：累计字符数达到上限或等待超过间隔即推送一次
+STREAM_FLUSH_CHARS = 256
+STREAM_FLUSH_INTERVAL = 0.02  # 秒
+
+
+async def coalesce_chunks(
+    source: AsyncIterator[str],
+    max_chars: int = STREAM_FLUSH_CHARS,
+    max_delay: float = STREAM_FLUSH_INTERVAL
+) -> AsyncIterator[str]:
+    """将短时间内到达的多个分片合并为一个，减少SSE事件数量"""
+    iterator = source.__aiter__()
+    loop = asyncio.get_running_loop()
+    buffer: List[str] = []
+    size = 0
+    deadline = 0.0
+    pending: Optional[asyncio.Future] = None
+    
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            
+            # 缓冲为空时一直等待下一个分片；否则最多等到本批的截止时间
+            timeout = max(0.0, deadline - loop.time()) if buffer else None
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            
+            if not done:
+                yield "".join(buffer)
+                buffer.clear()
+                size = 0
+                continue
+            
+            try:
+                chunk = pending.result()
+            except StopAsyncIteration:
+                pending = None
+                break
+            pending = None
+            
+            if not buffer:
+                deadline = loop.time() + max_delay
+            buffer.append(chunk)
+            size += len(chunk)
+            
+            if size >= max_chars:
+                yield "".join(buffer)
+                buffer.clear()
+                size = 0
+        
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        if pending is not None:
+            pending.cancel()
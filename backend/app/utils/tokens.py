@@ -0,0 +1,51 @@
+"""
+Token 计数工具
+"""
+from functools import lru_cache
+from typing import Optional
+
+from loguru import logger
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# 非 OpenAI 模型无对应编码时使用的通用编码
+_DEFAULT_ENCODING = "cl100k_base"
+
+
+@lru_cache(maxsize=8)
+def _get_encoding(model: Optional[str]):
+    """按模型名获取并缓存 tiktoken 编码器，失败时返回 None"""
+    if tiktoken is None:
+        return None
+    try:
+        if model:
+            return tiktoken.encoding_for_model(model)
+    except KeyError:
+        pass
+    try:
+        return tiktoken.get_encoding(_DEFAULT_ENCODING)
+    except Exception as e:
+        logger.warning(f"加载 tiktoken 编码失败，退化为按字符计数: {e}")
+        return None
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """
+    计算文本的 token 数量
+
+    Args:
+        text: 文本内容
+        model: 模型名称，用于选择对应的编码
+
+    Returns:
+        token 数量（tiktoken 不可用时退化为字符数）
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return len(text)
+    return len(encoding.encode(text, disallowed_special=()))
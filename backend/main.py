@@ -12,6 +12,7 @@ sys.path.append(str(Path(__file__).parent))
 os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
 
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 from contextlib import asynccontextmanager
@@ -19,7 +20,10 @@ from contextlib import asynccontextmanager
 from app.core.config import settings
 from app.core.logging import setup_logging
 from app.core.database import engine, init_db
+from app.core.redis import redis_client
 from app.api import api_router
+from app.services.llm_service import close_http_client
+from app.utils.file_parser import shutdown_parser_pool
 
 # 设置日志
 logger = setup_logging()
@@ -35,16 +39,19 @@ async def lifespan(app: FastAPI):
     await init_db()
     logger.info("✅ 数据库初始化完成")
     
+    # 创建Redis客户端（连接池按需建立连接）
+    await redis_client.connect()
+    
     # 预加载嵌入模型（避免首次使用时延迟）
     logger.info("📦 正在预加载嵌入模型...")
     try:
         import asyncio
-        from app.services.knowledge.embeddings import EmbeddingService
+        from app.services.knowledge.embeddings import get_embedding_service
         
         # 在后台线程中加载模型（避免阻塞）
         def preload_model():
             try:
-                embedding_service = EmbeddingService()
+                embedding_service = get_embedding_service()
                 # 测试模型是否可用
                 test_text = "测试"
                 import asyncio
@@ -70,7 +77,12 @@ async def lifespan(app: FastAPI):
     
     # 关闭时执行
     logger.info("🛑 CoreMind正在关闭...")
+    await close_http_client()
+    await redis_client.disconnect()
+    shutdown_parser_pool()
     await engine.dispose()
+    # 等待队列中的日志写出
+    await logger.complete()
 
 
 # 创建FastAPI应用
@@ -81,6 +93,8 @@ app = FastAPI(
     docs_url="/docs",
     redoc_url="/redoc",
     lifespan=lifespan,
+    # 全局默认使用 orjson 序列化响应
+    default_response_class=ORJSONResponse,
 )
 
 # 添加CORS中间件
@@ -90,6 +104,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # 消息分页游标与总数通过响应头返回，需要暴露给浏览器
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],
 )
 
 # 添加Gzip压缩
@@ -0,0 +1,11 @@
+-- 为助手关联的数据源/接口ID数组添加 GIN 索引
+-- 这个脚本用于升级已有数据库，新建库由 init_db 自动创建
+-- 注意：CREATE INDEX CONCURRENTLY 不能在事务中执行
+
+-- 删除数据源时按 datasource_ids @> ARRAY[:id] 反查并清理引用它的助手
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_assistant_configs_datasource_ids
+ON assistant_configs USING GIN (datasource_ids);
+
+-- 删除接口时按 interface_ids @> ARRAY[:id] 反查并清理引用它的助手
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_assistant_configs_interface_ids
+ON assistant_configs USING GIN (interface_ids);
@@ -0,0 +1,7 @@
+-- 为助手关联的知识库ID数组添加 GIN 索引
+-- 这个脚本用于升级已有数据库，新建库由 init_db 自动创建
+-- 注意：CREATE INDEX CONCURRENTLY 不能在事务中执行
+
+-- 删除知识库时按 knowledge_base_ids @> ARRAY[:kb_id] 反查引用它的助手
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_assistant_configs_knowledge_base_ids
+ON assistant_configs USING GIN (knowledge_base_ids);
@@ -0,0 +1,21 @@
+-- 为热点查询添加复合索引
+-- 这个脚本用于升级已有数据库，新建库由 init_db 自动创建
+-- 注意：CREATE INDEX CONCURRENTLY 不能在事务中执行，请逐条运行（如 psql 默认的自动提交模式）
+
+-- v2 对话列表：按用户过滤，按创建时间倒序游标分页
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_conversations_user_created
+ON conversations(user_id, created_at DESC);
+
+-- 对话历史：按会话过滤，按创建时间取最近 N 条（add_list_indexes.sql 中已创建时会跳过）
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_messages_conversation_created
+ON messages(conversation_id, created_at);
+
+-- 按用户过滤的配置类表（旧库若由早期版本建表可能缺少这些索引）
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_assistant_configs_user_id
+ON assistant_configs(user_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_datasources_user_id
+ON datasources(user_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_custom_interfaces_user_id
+ON custom_interfaces(user_id);
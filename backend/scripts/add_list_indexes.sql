@@ -0,0 +1,14 @@
+-- 为列表查询添加复合索引
+-- 这个脚本用于升级已有数据库，新建库由 init_db 自动创建
+
+-- 助手列表：按用户过滤，默认助手优先、按创建时间倒序
+CREATE INDEX IF NOT EXISTS ix_assistant_configs_user_default_created
+ON assistant_configs(user_id, is_default DESC, created_at DESC);
+
+-- 对话列表：按用户过滤，按更新时间倒序
+CREATE INDEX IF NOT EXISTS ix_conversations_user_updated
+ON conversations(user_id, updated_at DESC);
+
+-- 对话消息：按会话过滤，按创建时间排序
+CREATE INDEX IF NOT EXISTS ix_messages_conversation_created
+ON messages(conversation_id, created_at);
@@ -0,0 +1,15 @@
+-- 用带 INCLUDE 的覆盖索引替换 messages 的 (conversation_id, created_at) 复合索引
+-- 这个脚本用于升级已有数据库，新建库由 init_db 自动创建
+-- 注意：CREATE/DROP INDEX CONCURRENTLY 与 VACUUM 不能在事务中执行，请逐条运行（如 psql 默认的自动提交模式）
+
+-- 键集分页按 (created_at, id) 排序；role/tokens 放入 INCLUDE，content 过宽不放入
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_messages_conversation_covering
+ON messages(conversation_id, created_at, id) INCLUDE (role, tokens);
+
+-- 新索引的前缀列已覆盖旧索引
+DROP INDEX CONCURRENTLY IF EXISTS ix_messages_conversation_created;
+
+-- 消息表写入频繁，调低自动清理阈值以保持可见性映射更新，仅索引扫描才能生效
+ALTER TABLE messages SET (autovacuum_vacuum_scale_factor = 0.02);
+
+VACUUM (ANALYZE) messages;
@@ -0,0 +1,9 @@
+-- 为 messages.msg_metadata 添加部分 GIN 索引
+-- 这个脚本用于升级已有数据库，新建库由 init_db 自动创建
+-- 请先执行 convert_message_metadata_to_jsonb.sql
+-- 注意：CREATE INDEX CONCURRENTLY 不能在事务中执行
+
+-- 只收录带元数据的消息（引用了知识库的助手回复），支撑 msg_metadata @> '{...}' 包含查询
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_messages_msg_metadata
+ON messages USING GIN (msg_metadata jsonb_path_ops)
+WHERE msg_metadata IS NOT NULL;
@@ -0,0 +1,39 @@
+-- 约束每个用户至多一个默认助手、一个默认LLM配置
+-- 这个脚本用于升级已有数据库，新建库由 init_db 自动创建
+-- 约束延迟到提交时检查：接口在同一条语句中设置新默认并通过 CTE 取消旧默认，
+-- 两者的执行先后不确定，立即检查的唯一索引会误报冲突
+
+BEGIN;
+
+-- 清理历史数据中的重复默认：每个用户只保留最近更新的一条
+UPDATE assistant_configs a
+SET is_default = FALSE
+WHERE a.is_default
+  AND EXISTS (
+      SELECT 1 FROM assistant_configs b
+      WHERE b.user_id = a.user_id
+        AND b.is_default
+        AND (b.updated_at, b.id) > (a.updated_at, a.id)
+  );
+
+UPDATE llm_configs a
+SET is_default = FALSE
+WHERE a.is_default
+  AND EXISTS (
+      SELECT 1 FROM llm_configs b
+      WHERE b.user_id = a.user_id
+        AND b.is_default
+        AND (b.updated_at, b.id) > (a.updated_at, a.id)
+  );
+
+ALTER TABLE assistant_configs
+ADD CONSTRAINT ex_assistant_configs_one_default_per_user
+EXCLUDE USING btree (user_id WITH =) WHERE (is_default)
+DEFERRABLE INITIALLY DEFERRED;
+
+ALTER TABLE llm_configs
+ADD CONSTRAINT ex_llm_configs_one_default_per_user
+EXCLUDE USING btree (user_id WITH =) WHERE (is_default)
+DEFERRABLE INITIALLY DEFERRED;
+
+COMMIT;
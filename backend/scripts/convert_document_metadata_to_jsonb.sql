@@ -0,0 +1,13 @@
+-- 将 documents.doc_metadata 从 JSON 字符串（TEXT）转为 JSONB，并添加 GIN 索引
+-- 这个脚本用于升级已有数据库，新建库由 init_db 自动创建
+-- 注意：ALTER COLUMN TYPE 会重写整张表并持有排他锁，请在低峰期执行
+-- 注意：CREATE INDEX CONCURRENTLY 不能在事务中执行，请单独执行第二条语句
+
+-- 空字符串视为无元数据
+ALTER TABLE documents
+ALTER COLUMN doc_metadata TYPE JSONB
+USING NULLIF(doc_metadata, '')::jsonb;
+
+-- 按元数据键值包含查询（doc_metadata @> '{...}'）
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_documents_doc_metadata
+ON documents USING GIN (doc_metadata jsonb_path_ops);
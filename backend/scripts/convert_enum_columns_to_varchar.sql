@@ -0,0 +1,24 @@
+-- 将 datasources.type / custom_interfaces.type / llm_configs.provider 从 PostgreSQL 原生枚举转为 VARCHAR(32)
+-- 这个脚本用于升级已有数据库，新建库由 init_db 自动创建
+-- 注意：ALTER COLUMN TYPE 会重写整张表并持有排他锁，请在低峰期执行
+
+-- 原生枚举中存储的是枚举成员名（如 LOCAL_FILE），转为小写即为代码中的枚举取值（如 local_file）
+BEGIN;
+
+ALTER TABLE datasources
+ALTER COLUMN type TYPE VARCHAR(32)
+USING lower(type::text);
+
+ALTER TABLE custom_interfaces
+ALTER COLUMN type TYPE VARCHAR(32)
+USING lower(type::text);
+
+ALTER TABLE llm_configs
+ALTER COLUMN provider TYPE VARCHAR(32)
+USING lower(provider::text);
+
+DROP TYPE IF EXISTS datasourcetype;
+DROP TYPE IF EXISTS interfacetype;
+DROP TYPE IF EXISTS llmprovider;
+
+COMMIT;
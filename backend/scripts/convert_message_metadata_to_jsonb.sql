@@ -0,0 +1,7 @@
+-- 将 messages.msg_metadata 从 JSON 转为 JSONB
+-- 这个脚本用于升级已有数据库，新建库由 init_db 自动创建
+-- 注意：ALTER COLUMN TYPE 会重写整张表并持有排他锁，请在低峰期执行
+
+ALTER TABLE messages
+ALTER COLUMN msg_metadata TYPE JSONB
+USING msg_metadata::jsonb;
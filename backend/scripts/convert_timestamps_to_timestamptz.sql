@@ -0,0 +1,67 @@
+-- 将时间列转为 TIMESTAMP WITH TIME ZONE，并由数据库生成创建/更新时间
+-- 这个脚本用于升级已有数据库，新建库由 init_db 自动创建
+-- 注意：ALTER COLUMN TYPE 会重写整张表并持有排他锁，请在低峰期执行
+-- 原有时间均为应用写入的 UTC 时间（不带时区），按 UTC 解释转换
+
+BEGIN;
+
+ALTER TABLE users
+    ALTER COLUMN created_at TYPE TIMESTAMPTZ USING created_at AT TIME ZONE 'UTC',
+    ALTER COLUMN created_at SET DEFAULT now(),
+    ALTER COLUMN updated_at TYPE TIMESTAMPTZ USING updated_at AT TIME ZONE 'UTC',
+    ALTER COLUMN updated_at SET DEFAULT now();
+
+ALTER TABLE conversations
+    ALTER COLUMN created_at TYPE TIMESTAMPTZ USING created_at AT TIME ZONE 'UTC',
+    ALTER COLUMN created_at SET DEFAULT now(),
+    ALTER COLUMN updated_at TYPE TIMESTAMPTZ USING updated_at AT TIME ZONE 'UTC',
+    ALTER COLUMN updated_at SET DEFAULT now();
+
+ALTER TABLE knowledge_bases
+    ALTER COLUMN created_at TYPE TIMESTAMPTZ USING created_at AT TIME ZONE 'UTC',
+    ALTER COLUMN created_at SET DEFAULT now(),
+    ALTER COLUMN updated_at TYPE TIMESTAMPTZ USING updated_at AT TIME ZONE 'UTC',
+    ALTER COLUMN updated_at SET DEFAULT now();
+
+ALTER TABLE documents
+    ALTER COLUMN created_at TYPE TIMESTAMPTZ USING created_at AT TIME ZONE 'UTC',
+    ALTER COLUMN created_at SET DEFAULT now(),
+    ALTER COLUMN updated_at TYPE TIMESTAMPTZ USING updated_at AT TIME ZONE 'UTC',
+    ALTER COLUMN updated_at SET DEFAULT now();
+
+ALTER TABLE datasources
+    ALTER COLUMN last_sync_at TYPE TIMESTAMPTZ USING last_sync_at AT TIME ZONE 'UTC',
+    ALTER COLUMN created_at TYPE TIMESTAMPTZ USING created_at AT TIME ZONE 'UTC',
+    ALTER COLUMN created_at SET DEFAULT now(),
+    ALTER COLUMN updated_at TYPE TIMESTAMPTZ USING updated_at AT TIME ZONE 'UTC',
+    ALTER COLUMN updated_at SET DEFAULT now();
+
+ALTER TABLE custom_interfaces
+    ALTER COLUMN last_executed_at TYPE TIMESTAMPTZ USING last_executed_at AT TIME ZONE 'UTC',
+    ALTER COLUMN created_at TYPE TIMESTAMPTZ USING created_at AT TIME ZONE 'UTC',
+    ALTER COLUMN created_at SET DEFAULT now(),
+    ALTER COLUMN updated_at TYPE TIMESTAMPTZ USING updated_at AT TIME ZONE 'UTC',
+    ALTER COLUMN updated_at SET DEFAULT now();
+
+ALTER TABLE assistant_configs
+    ALTER COLUMN created_at TYPE TIMESTAMPTZ USING created_at AT TIME ZONE 'UTC',
+    ALTER COLUMN created_at SET DEFAULT now(),
+    ALTER COLUMN updated_at TYPE TIMESTAMPTZ USING updated_at AT TIME ZONE 'UTC',
+    ALTER COLUMN updated_at SET DEFAULT now();
+
+ALTER TABLE llm_configs
+    ALTER COLUMN created_at TYPE TIMESTAMPTZ USING created_at AT TIME ZONE 'UTC',
+    ALTER COLUMN created_at SET DEFAULT now(),
+    ALTER COLUMN updated_at TYPE TIMESTAMPTZ USING updated_at AT TIME ZONE 'UTC',
+    ALTER COLUMN updated_at SET DEFAULT now();
+
+ALTER TABLE document_chunks
+    ALTER COLUMN created_at TYPE TIMESTAMPTZ USING created_at AT TIME ZONE 'UTC',
+    ALTER COLUMN created_at SET DEFAULT now();
+
+-- 同一事务内写入的多条消息需按写入先后排序，使用逐行求值的 clock_timestamp()
+ALTER TABLE messages
+    ALTER COLUMN created_at TYPE TIMESTAMPTZ USING created_at AT TIME ZONE 'UTC',
+    ALTER COLUMN created_at SET DEFAULT clock_timestamp();
+
+COMMIT;
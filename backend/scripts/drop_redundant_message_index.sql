@@ -0,0 +1,7 @@
+-- 删除 messages.conversation_id 上的单列索引
+-- 这个脚本用于升级已有数据库，新建库由 init_db 自动创建
+-- 按会话过滤的查询均可由复合索引 (conversation_id, created_at) 的前缀列满足，
+-- 单列索引只会增加写入开销。请先确认 add_list_indexes.sql 已执行。
+-- 注意：DROP INDEX CONCURRENTLY 不能在事务中执行
+
+DROP INDEX CONCURRENTLY IF EXISTS ix_messages_conversation_id;
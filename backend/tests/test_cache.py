@@ -0,0 +1,120 @@
+"""
+进程内 LRU + TTL 缓存测试
+"""
+import pytest
+
+from app.utils import cache as cache_module
+from app.utils.cache import TTLCache
+
+
+class _Clock:
+    """可手动推进的 time.monotonic 替身"""
+    
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(cache_module.time, "monotonic", clock)
+    return clock
+
+
+def test_get_missing_returns_default():
+    cache = TTLCache()
+    
+    assert cache.get("missing") is None
+    assert cache.get("missing", "default") == "default"
+
+
+def test_set_and_get():
+    cache = TTLCache()
+    cache.set("key", {"value": 1})
+    
+    assert cache.get("key") == {"value": 1}
+    assert len(cache) == 1
+
+
+def test_entry_expires_after_ttl(clock):
+    cache = TTLCache(ttl=10)
+    cache.set("key", "value")
+    
+    clock.now += 9.9
+    assert cache.get("key") == "value"
+    
+    clock.now += 0.2
+    assert cache.get("key") is None
+    # 过期条目在读取时被删除
+    assert len(cache) == 0
+
+
+def test_per_entry_ttl_overrides_default(clock):
+    cache = TTLCache(ttl=10)
+    cache.set("short", 1, ttl=1)
+    cache.set("long", 2)
+    
+    clock.now += 2
+    assert cache.get("short") is None
+    assert cache.get("long") == 2
+
+
+def test_set_refreshes_expiry(clock):
+    cache = TTLCache(ttl=10)
+    cache.set("key", 1)
+    clock.now += 8
+    cache.set("key", 2)
+    clock.now += 8
+    
+    assert cache.get("key") == 2
+
+
+def test_evicts_least_recently_set():
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("c", 3)
+    
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_get_marks_entry_as_recently_used():
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    
+    # 读取 a 后，最久未使用的是 b
+    cache.get("a")
+    cache.set("c", 3)
+    
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_falsy_values_are_cached():
+    """缓存值为空列表等假值时也能命中（调用方用 is None 判断未命中）"""
+    cache = TTLCache()
+    cache.set("empty", [])
+    
+    assert cache.get("empty") == []
+
+
+def test_pop_and_clear():
+    cache = TTLCache()
+    cache.set("a", 1)
+    cache.set("b", 2)
+    
+    cache.pop("a")
+    cache.pop("missing")
+    assert cache.get("a") is None
+    assert len(cache) == 1
+    
+    cache.clear()
+    assert len(cache) == 0
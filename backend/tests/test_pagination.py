@@ -0,0 +1,54 @@
+"""
+分页游标测试
+"""
+import base64
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app.utils.pagination import decode_cursor, encode_cursor
+
+
+def _b64(raw: str) -> str:
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def test_cursor_roundtrip():
+    """编码后再解析得到相同的 (created_at, id)"""
+    created_at = datetime(2024, 5, 1, 8, 30, 15, 123456, tzinfo=timezone.utc)
+    row_id = uuid.uuid4()
+    
+    assert decode_cursor(encode_cursor(created_at, row_id)) == (created_at, row_id)
+
+
+def test_cursor_is_url_safe():
+    """游标可以直接放在查询参数中"""
+    cursor = encode_cursor(datetime.now(timezone.utc), uuid.uuid4())
+    
+    assert all(c.isalnum() or c in "-_=" for c in cursor)
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "",
+        "!!!not-base64!!!",
+        "abc",                                      # 填充不正确
+        _b64("garbage"),                            # 缺少分隔符
+        _b64("2024-05-01T08:30:15+00:00|"),         # 缺少 id
+        _b64(f"|{uuid.uuid4()}"),                   # 缺少时间
+        _b64(f"not-a-date|{uuid.uuid4()}"),
+        _b64("2024-05-01T08:30:15+00:00|not-a-uuid"),
+        base64.urlsafe_b64encode(b"\xff\xfe").decode(),  # 非 UTF-8 内容
+        "游标",                                      # 非 ASCII
+    ],
+)
+def test_malformed_cursor_is_400(cursor):
+    """格式错误的游标返回 400，而不是 500"""
+    with pytest.raises(HTTPException) as exc_info:
+        decode_cursor(cursor)
+    
+    assert exc_info.value.status_code == 400
+    assert exc_info.value.detail == "无效的分页游标"
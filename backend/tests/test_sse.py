@@ -0,0 +1,85 @@
+"""
+SSE 分片合并测试
+"""
+import asyncio
+from typing import List
+
+from app.utils.sse import coalesce_chunks
+
+
+async def _source(items):
+    """按给定的 (延迟秒数, 分片) 依次产出分片"""
+    for delay, chunk in items:
+        if delay:
+            await asyncio.sleep(delay)
+        yield chunk
+
+
+async def _collect(iterator) -> List[str]:
+    return [chunk async for chunk in iterator]
+
+
+async def test_empty_source_yields_nothing():
+    assert await _collect(coalesce_chunks(_source([]))) == []
+
+
+async def test_burst_is_merged_into_one_event():
+    """同时到达的分片在截止时间内合并为一个"""
+    source = _source([(0, "a"), (0, "b"), (0, "c")])
+    
+    assert await _collect(coalesce_chunks(source, max_chars=100, max_delay=1.0)) == ["abc"]
+
+
+async def test_flush_on_size():
+    """累计字符数达到上限立即推送，不等截止时间"""
+    source = _source([(0, "abc"), (0, "de"), (0, "fgh"), (0, "i")])
+    
+    result = await _collect(coalesce_chunks(source, max_chars=5, max_delay=10.0))
+    
+    assert result == ["abcde", "fghi"]
+
+
+async def test_flush_on_deadline():
+    """下一个分片迟迟不到时，截止时间一到就推送已缓冲的内容"""
+    source = _source([(0, "a"), (0, "b"), (0.2, "c")])
+    
+    result = await _collect(coalesce_chunks(source, max_chars=100, max_delay=0.02))
+    
+    assert result == ["ab", "c"]
+
+
+async def test_content_is_preserved():
+    """合并方式不影响拼接后的完整内容"""
+    chunks = [str(i) * (i % 4 + 1) for i in range(50)]
+    source = _source([(0.001 if i % 7 == 0 else 0, chunk) for i, chunk in enumerate(chunks)])
+    
+    result = await _collect(coalesce_chunks(source, max_chars=16, max_delay=0.005))
+    
+    assert "".join(result) == "".join(chunks)
+    assert all(result)
+
+
+async def test_closing_early_cancels_pending_read():
+    """消费方提前关闭时取消尚未完成的上游读取"""
+    cancelled = asyncio.Event()
+    
+    async def slow_source():
+        yield "first"
+        try:
+            await asyncio.sleep(10)
+            yield "never"
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+    
+    stream = coalesce_chunks(slow_source(), max_chars=1, max_delay=10.0)
+    assert await stream.__anext__() == "first"
+    
+    # 第二次读取挂起在上游，取消该读取后关闭生成器
+    pending_read = asyncio.ensure_future(stream.__anext__())
+    await asyncio.sleep(0.01)
+    pending_read.cancel()
+    await asyncio.gather(pending_read, return_exceptions=True)
+    await stream.aclose()
+    
+    await asyncio.wait_for(cancelled.wait(), timeout=1.0)